@@ -1,43 +1,217 @@
+"""
+Aggregate the OptimoRoute `.xls` exports under raw_data/ into one CSV (or Parquet).
+
+Workbooks are parsed in a process pool and each parsed frame is cached as
+Parquet under cache/, keyed by the workbook's path, size and mtime, so only
+new or changed exports are re-parsed. The header report is built from the
+cached Parquet schemas.
+
+The output is written in two passes: the unified column set and one dtype per
+column are worked out from the cached schemas, then each file's rows are
+streamed into the output with those columns and dtypes, so only one file is
+in memory at a time.
+
+Usage:
+    python data_aggregate/agg_data.py
+    python data_aggregate/agg_data.py --format parquet
+"""
+
+import argparse
+import hashlib
 import os
-import pandas as pd
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-def main():
-    raw_data_dir = os.path.join(os.path.dirname(__file__), 'raw_data')
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.types as pat
+except Exception:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+    pat = None
+
+SCRIPT_DIR = os.path.dirname(__file__)
+RAW_DATA_DIR = os.path.join(SCRIPT_DIR, 'raw_data')
+CACHE_DIR = os.path.join(SCRIPT_DIR, 'cache')
+NUM_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def find_xls_files(raw_data_dir):
     xls_files = []
     for root, _, files in os.walk(raw_data_dir):
         for f in files:
             if f.endswith('.xls'):
                 xls_files.append(os.path.join(root, f))
+    return sorted(xls_files)
+
+
+def cache_path_for(xls_path):
+    """Parquet cache file for a workbook; the name changes when the file does."""
+    stat = os.stat(xls_path)
+    key = f'{os.path.abspath(xls_path)}|{stat.st_size}|{stat.st_mtime_ns}'
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(xls_path))[0].replace(' ', '_')
+    return os.path.join(CACHE_DIR, f'{stem}-{digest}.parquet')
+
+
+def _parquet_safe(df):
+    """String column names, and mixed-type object columns as strings (Parquet needs one type)."""
+    df = df.rename(columns=str)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype('string')
+    return df
+
+
+def parse_to_cache(xls_path):
+    """Worker: parse one workbook into its Parquet cache unless it is current.
+
+    Returns (xls_path, cache_path or None, parsed, error).
+    """
+    try:
+        cache_path = cache_path_for(xls_path)
+        if os.path.exists(cache_path):
+            return xls_path, cache_path, False, None
+        df = _parquet_safe(pd.read_excel(xls_path))
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        return xls_path, cache_path, True, None
+    except Exception as e:
+        return xls_path, None, False, str(e)
+
+
+def prune_cache(keep_paths):
+    """Drop cache files of workbooks that changed or disappeared."""
+    keep = {os.path.abspath(p) for p in keep_paths}
+    removed = 0
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.abspath(os.path.join(CACHE_DIR, name))
+        if name.endswith('.parquet') and path not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def cached_columns(cache_path):
+    return list(pq.read_schema(cache_path).names)
+
+
+def _column_dtype(types, present_everywhere):
+    """One pandas dtype for a column from its per-file Arrow types (like pd.concat)."""
+    types = [t for t in types if not pat.is_null(t)]
+    if not types:
+        return 'string'
+    if all(pat.is_integer(t) for t in types):
+        return 'int64' if present_everywhere else 'float64'
+    if all(pat.is_integer(t) or pat.is_floating(t) for t in types):
+        return 'float64'
+    if all(pat.is_timestamp(t) for t in types):
+        return 'datetime64[ns]'
+    if all(pat.is_boolean(t) for t in types):
+        return 'bool' if present_everywhere else 'boolean'
+    return 'string'
+
+
+def unified_schema(cache_paths):
+    """Pass 1: (column, dtype) pairs in first-appearance order, from schemas only."""
+    column_types = {}
+    for cache_path in cache_paths:
+        schema = pq.read_schema(cache_path)
+        for name in schema.names:
+            column_types.setdefault(name, []).append(schema.field(name).type)
+    return [
+        (name, _column_dtype(types, len(types) == len(cache_paths)))
+        for name, types in column_types.items()
+    ]
+
+
+def iter_unified_frames(cache_paths, schema):
+    """Pass 2: each file's rows with the unified columns and dtypes, one file at a time."""
+    columns = [name for name, _ in schema]
+    dtypes = dict(schema)
+    for cache_path in cache_paths:
+        yield pd.read_parquet(cache_path).reindex(columns=columns).astype(dtypes)
+
+
+def write_csv(frames, output_path):
+    tmp_path = f'{output_path}.tmp'
+    rows = 0
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as handle:
+        for i, df in enumerate(frames):
+            df.to_csv(handle, index=False, header=(i == 0))
+            rows += len(df)
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def write_parquet(frames, output_path):
+    tmp_path = f'{output_path}.tmp'
+    rows = 0
+    writer = None
+    try:
+        for df in frames:
+            if writer is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate raw_data/ workbooks.')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--output', default=None,
+                        help='Output path (default: clean_data/agg_data.<format>)')
+    args = parser.parse_args()
+
+    if pq is None:
+        raise RuntimeError('pyarrow is required for the agg_data Parquet cache.')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    xls_files = find_xls_files(RAW_DATA_DIR)
+
+    cached = {}
+    parsed = 0
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        for xls, cache_path, was_parsed, error in executor.map(parse_to_cache, xls_files):
+            if error is not None:
+                print(f"Error reading {xls}: {error}")
+                continue
+            cached[xls] = cache_path
+            parsed += int(was_parsed)
+    removed = prune_cache(cached.values())
+    print(f"Workbooks: {len(xls_files)} ({parsed} parsed, {len(cached) - parsed} from cache, "
+          f"{removed} stale cache files removed)")
+
     header_counts = Counter()
     file_headers = defaultdict(list)
-    all_dfs = []
-
-    for xls in xls_files:
-        file_path = os.path.join(raw_data_dir, xls)
-        try:
-            df = pd.read_excel(file_path)
-            all_dfs.append(df)
-            for col in df.columns:
-                header_counts[col] += 1
-                file_headers[col].append(xls)
-        except Exception as e:
-            print(f"Error reading {xls}: {e}")
+    for xls, cache_path in cached.items():
+        for col in cached_columns(cache_path):
+            header_counts[col] += 1
+            file_headers[col].append(xls)
 
     # Save header counts report
-    report_path = os.path.join(os.path.dirname(__file__), '../clean_data/agg_data_report.txt')
+    report_path = os.path.join(SCRIPT_DIR, '../clean_data/agg_data_report.txt')
     with open(report_path, 'w') as f:
         for header, count in header_counts.most_common():
             f.write(f'Header: {header} | Count: {count}\n')
             f.write(f'  Files: {file_headers[header]}\n')
     print(f"Report written to {report_path}")
 
-    # Concatenate all dataframes (with different headers) and save as CSV
-    if all_dfs:
-        all_data = pd.concat(all_dfs, ignore_index=True, sort=False)
-        agg_csv_path = os.path.join(os.path.dirname(__file__), '../clean_data/agg_data.csv')
-        all_data.to_csv(agg_csv_path, index=False)
-        print(f"Aggregated data saved to {agg_csv_path}")
+    # Stream all files (with different headers) into one output with unified columns
+    if cached:
+        cache_paths = list(cached.values())
+        schema = unified_schema(cache_paths)
+        output_path = args.output or os.path.join(SCRIPT_DIR, f'../clean_data/agg_data.{args.format}')
+        writer = write_parquet if args.format == 'parquet' else write_csv
+        rows = writer(iter_unified_frames(cache_paths, schema), output_path)
+        print(f"Aggregated data saved to {output_path} ({rows} rows, {len(schema)} columns)")
     else:
         print("No dataframes to aggregate.")
 
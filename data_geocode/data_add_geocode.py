@@ -1,28 +1,63 @@
 """
 Geocode stop addresses from `agg_data.csv` and produce:
 - `data_geocode.csv` (row-level geocode output),
-- `addresses_not_found.csv` (rows without usable coordinates), and
-- `geocode_report.txt` (summary).
+- `addresses_not_found.csv` (rows without usable coordinates),
+- `geocode_report.txt` (summary), and
+- `geocode_run_stats.json` (per-strategy/parse/DB/HTTP/queue-wait latency
+  percentiles, throughput over time and cache hit ratios).
+
+With GEOCODE_TRACE=1, per-address spans (parse, strategy attempts, SQL,
+HTTP) are also written to `geocode_trace.jsonl` by a background thread;
+inspect or convert them with geocode_trace.py.
 
 Cache strategy:
-- Load cache once at startup into memory.
-- Pass in-memory cache to NominatimSearch for lookups.
+- Load a slim offset index of the cache once at startup (key -> coordinates,
+  method, byte offset); metadata JSON stays on disk until a cache hit reads it.
+- Pass the index to NominatimSearch for lookups.
 - Disable class-level cache saves.
 - Append one cache row per new geocode result from this script.
+
+Before the main pass, the distinct (repaired) ZIPs of uncached addresses are
+prefetched in parallel: road-name candidates and all TIGER segments per ZIP
+are loaded into NominatimSearch's shared caches. Addresses with neither a
+state nor a ZIP stop after parsing when their state-disambiguation lookup (by
+street and city) is not cached; those lookups are fetched together in
+parallel batches and the searches resumed in the thread pool.
+
+With GEOCODE_PROCESSES=N (N > 1), unique addresses are split into N shards by
+key hash and geocoded in N processes, each writing its own segment files under
+`latest/shards/`. The segments are then merged in input order into the files
+above, new cache rows are appended in key order, and the merge is checked and
+summarized in `shard_merge_report.txt`.
 """
 
 import csv
 import json
+import multiprocessing
 import os
+import queue
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import pandas as pd
 from tqdm import tqdm
 
+from nominatim_helpers.address_cache_index import (
+    CACHE_FIELDS,
+    AddressCacheIndex,
+    normalize_cache_key,
+)
+from nominatim_helpers.openaddress_index import OpenAddressIndex
+from nominatim_helpers.run_stats import GeocodeRunStats
+from nominatim_helpers.shard_merge import merge_shards, shard_for_key, shard_paths, verify_merge
+from nominatim_helpers.trace_export import TraceWriter
+from nominatim_helpers.zip_reapir import repair_zip_ri_ma
 from nominatim_search import NominatimSearch
-from zip_mismatch_report import generate_zip_mismatch_report
+from search_strategy_planner import SearchStrategyPlanner
+from zip_mismatch_report import ZipStatsSidecar, classify_cache_row
 
 NOMINATIM_URL = "http://localhost:8080/search"
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -31,41 +66,36 @@ CACHE_FILE = os.path.join(LATEST_DIR, "geocode_address_cache.csv")
 AGG_FILE = os.path.join(SCRIPT_DIR, "agg_data.csv")
 OUTPUT_FILE = os.path.join(LATEST_DIR, "data_geocode.csv")
 REPORT_FILE = os.path.join(LATEST_DIR, "geocode_report.txt")
+RUN_STATS_FILE = os.path.join(LATEST_DIR, "geocode_run_stats.json")
+TRACE_FILE = os.path.join(LATEST_DIR, "geocode_trace.jsonl")
+TRACE_ENABLED = os.getenv("GEOCODE_TRACE", "") not in ("", "0")
+SHARD_DIR = os.path.join(LATEST_DIR, "shards")
+SHARD_MERGE_REPORT_FILE = os.path.join(LATEST_DIR, "shard_merge_report.txt")
+NUM_PROCESSES = int(os.getenv("GEOCODE_PROCESSES", "1"))
 NOT_FOUND_FILE = os.path.join(LATEST_DIR, "addresses_not_found.csv")
 ZIP_MISMATCH_REPORT_FILE = os.path.join(LATEST_DIR, "zip_mismatch_report.txt")
+# Built by search_strategy_planner.py; used to order HTTP searches when present.
+STRATEGY_PLAN_FILE = os.path.join(LATEST_DIR, "strategy_plan.json")
+# Built by openaddress/openaddress_build_index.py; first-tier lookup when present.
+OPENADDRESS_INDEX_FILE = os.path.join(
+    SCRIPT_DIR, "..", "openaddress", "us", "ri", "openaddress_index.sqlite"
+)
 NUM_THREADS = 4
 TQDM_MIN_INTERVAL = 10
 HTTP_TIMEOUT_SECONDS = 20
 DB_STATEMENT_TIMEOUT_MS = 30000
 DB_CONNECT_TIMEOUT_SECONDS = 10
-
-CACHE_FIELDS = [
-    "address_raw",
-    "address_geocode",
-    "address_nominatim",
-    "latitude",
-    "longitude",
-    "method",
-    "error",
-    "result_metadata",
-    "tag_metadata",
-    "search_metadata",
-    "process_metadata",
-]
+ZIP_REPORT_WORKERS = 4
+TIGER_BATCH_SIZE = 200
+PREFETCH_WORKERS = 4
+PREFETCH_ZIP_CHUNK = 25
+STATE_BATCH_SIZE = 100
 
 
 def log(msg: str) -> None:
     tqdm.write(msg)
 
 
-def _normalize_cache_key(value: str) -> str:
-    if value is None:
-        return ""
-    normalized = str(value).strip().casefold()
-    normalized = " ".join(normalized.split())
-    return normalized.strip(" ,")
-
-
 def _detect_address_column(df: pd.DataFrame) -> str:
     for col in df.columns:
         if "address" in col.lower():
@@ -76,47 +106,100 @@ def _detect_address_column(df: pd.DataFrame) -> str:
     )
 
 
-def _load_cache_map(cache_path: str) -> dict[str, dict[str, str]]:
-    lookup: dict[str, dict[str, str]] = {}
-    if not os.path.exists(cache_path):
-        return lookup
-    with open(cache_path, newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            row_clean = {
-                str(k): (v.strip() if isinstance(v, str) else "")
-                for k, v in row.items()
-                if k is not None
-            }
-            raw = row_clean.get("address_raw", "")
-            if not raw:
-                continue
-            lookup[_normalize_cache_key(raw)] = row_clean
-    return lookup
-
-
-def _open_cache_append_writer(cache_path: str) -> tuple[object, csv.DictWriter]:
+def _prepare_cache_file(cache_path: str) -> None:
+    """Rewrite the cache in place (streaming) if its header differs from CACHE_FIELDS."""
     cache_dir = os.path.dirname(cache_path)
     if cache_dir:
         os.makedirs(cache_dir, exist_ok=True)
-    file_exists = os.path.exists(cache_path)
-    file_has_data = file_exists and os.path.getsize(cache_path) > 0
-    if file_has_data:
-        with open(cache_path, newline="", encoding="utf-8") as read_handle:
-            reader = csv.DictReader(read_handle)
-            existing_fields = reader.fieldnames or []
-            existing_rows = list(reader)
-        if existing_fields != CACHE_FIELDS:
-            with open(cache_path, "w", newline="", encoding="utf-8") as rewrite_handle:
-                writer = csv.DictWriter(rewrite_handle, fieldnames=CACHE_FIELDS)
-                writer.writeheader()
-                for row in existing_rows:
-                    writer.writerow({k: row.get(k, "") for k in CACHE_FIELDS})
-    handle = open(cache_path, "a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(handle, fieldnames=CACHE_FIELDS)
-    if not file_has_data:
+    if not os.path.exists(cache_path) or os.path.getsize(cache_path) == 0:
+        return
+    with open(cache_path, newline="", encoding="utf-8") as read_handle:
+        existing_fields = csv.DictReader(read_handle).fieldnames or []
+    if existing_fields == CACHE_FIELDS:
+        return
+    tmp_path = f"{cache_path}.tmp"
+    with open(cache_path, newline="", encoding="utf-8") as read_handle, open(
+        tmp_path, "w", newline="", encoding="utf-8"
+    ) as rewrite_handle:
+        reader = csv.DictReader(read_handle)
+        writer = csv.DictWriter(rewrite_handle, fieldnames=CACHE_FIELDS)
         writer.writeheader()
-    return handle, writer
+        for row in reader:
+            writer.writerow({k: row.get(k, "") for k in CACHE_FIELDS})
+    os.replace(tmp_path, cache_path)
+
+
+def _collect_prefetch_zips(addresses: list[str], cache_lookup: AddressCacheIndex) -> list[str]:
+    """Distinct repaired ZIPs of addresses that will not be served from the cache."""
+    zips: set[str] = set()
+    for raw_addr in addresses:
+        raw_addr = (raw_addr or "").strip()
+        if not raw_addr or normalize_cache_key(raw_addr) in cache_lookup:
+            continue
+        try:
+            zip5 = repair_zip_ri_ma(raw_addr).zip5
+        except Exception:
+            continue
+        if zip5:
+            zips.add(zip5)
+    return sorted(zips)
+
+
+def _prefetch_zip_caches(zips: list[str], searcher: NominatimSearch) -> tuple[int, int]:
+    """
+    Warm NominatimSearch's shared road-candidate and TIGER caches for `zips`.
+
+    Chunks run in parallel so the per-address pass finds DB results in memory.
+    Returns (road candidates loaded, TIGER segments loaded).
+    """
+    chunks = [zips[i:i + PREFETCH_ZIP_CHUNK] for i in range(0, len(zips), PREFETCH_ZIP_CHUNK)]
+
+    def fetch(chunk: list[str]) -> tuple[int, int]:
+        candidates = searcher.fetch_postcode_candidates_batch(chunk)
+        segments = searcher.fetch_tiger_zip_rows_batch(chunk)
+        return sum(len(v) for v in candidates.values()), sum(segments.values())
+
+    roads = 0
+    segments = 0
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+        futures = [executor.submit(fetch, chunk) for chunk in chunks]
+        for f in as_completed(futures):
+            try:
+                chunk_roads, chunk_segments = f.result()
+            except Exception as exc:
+                log(f"ZIP prefetch chunk failed; those ZIPs use per-address queries: {exc}")
+                continue
+            roads += chunk_roads
+            segments += chunk_segments
+    return roads, segments
+
+
+def _prefetch_reverse_states(lookups: list[tuple[str, str]]) -> int:
+    """
+    Resolve (street, city) state lookups into NominatimSearch's shared cache.
+
+    Chunks run in parallel, each on its own searcher.
+    """
+    chunks = [lookups[i:i + PREFETCH_ZIP_CHUNK] for i in range(0, len(lookups), PREFETCH_ZIP_CHUNK)]
+
+    def fetch(chunk: list[tuple[str, str]]) -> int:
+        searcher = NominatimSearch(
+            base_url=NOMINATIM_URL,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            use_address_cache=False,
+            save_address_cache=False,
+        )
+        return searcher.fetch_reverse_states_batch(chunk)
+
+    fetched = 0
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+        futures = [executor.submit(fetch, chunk) for chunk in chunks]
+        for f in as_completed(futures):
+            try:
+                fetched += f.result()
+            except Exception as exc:
+                log(f"State lookup batch chunk failed; those addresses query inline: {exc}")
+    return fetched
 
 
 def _build_cache_row(searcher: NominatimSearch) -> dict[str, str]:
@@ -156,30 +239,61 @@ def _search_method(searcher: NominatimSearch) -> str:
     return searcher.method or ""
 
 
-def main() -> None:
-    os.makedirs(LATEST_DIR, exist_ok=True)
-    df = pd.read_csv(AGG_FILE, dtype=str).fillna("")
-    address_col = _detect_address_column(df)
-
-    cache_lookup = _load_cache_map(CACHE_FILE)
+def _load_search_aids() -> tuple[SearchStrategyPlanner | None, OpenAddressIndex | None]:
+    strategy_planner = None
+    if os.path.exists(STRATEGY_PLAN_FILE):
+        strategy_planner = SearchStrategyPlanner.load(Path(STRATEGY_PLAN_FILE))
+    openaddress_index = None
+    if os.path.exists(OPENADDRESS_INDEX_FILE):
+        openaddress_index = OpenAddressIndex(OPENADDRESS_INDEX_FILE)
+    log(f"Strategy plan: {STRATEGY_PLAN_FILE if strategy_planner else 'default order'}")
+    log(f"OpenAddresses index: {OPENADDRESS_INDEX_FILE if openaddress_index else 'not built'}")
+    return strategy_planner, openaddress_index
+
+
+def _geocode_frame(
+    df: pd.DataFrame,
+    address_col: str,
+    cache_lookup: AddressCacheIndex,
+    output_path: str,
+    not_found_path: str,
+    trace_path: str | None = None,
+    zip_sidecar: ZipStatsSidecar | None = None,
+    progress_desc: str | None = None,
+) -> tuple[int, list[dict[str, str]], int, GeocodeRunStats]:
+    """
+    Geocode every row of `df`, writing row outputs and appending new cache rows.
+
+    Returns (rows found, not-found entries, cache rows appended, run stats).
+    `cache_lookup` is closed on return.
+    """
     cache_lock = threading.RLock()
-    starting_cache_size = len(cache_lookup)
-
-    total = len(df)
+    strategy_planner, openaddress_index = _load_search_aids()
     found = 0
     not_found = []
     cache_appends = 0
 
-    log(f"Processing {total} rows with {NUM_THREADS} threads...")
-    log(f"Using address column: {address_col}")
-    log(
-        "Timeout config:"
-        f" http={HTTP_TIMEOUT_SECONDS}s"
-        f" db_statement={DB_STATEMENT_TIMEOUT_MS}ms"
-        f" db_connect={DB_CONNECT_TIMEOUT_SECONDS}s"
+    prefetch_started = time.perf_counter()
+    prefetch_searcher = NominatimSearch(
+        base_url=NOMINATIM_URL,
+        timeout=HTTP_TIMEOUT_SECONDS,
+        db_statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+        db_connect_timeout=DB_CONNECT_TIMEOUT_SECONDS,
+        use_address_cache=False,
+        save_address_cache=False,
     )
-    log(f"Address cache path: {CACHE_FILE}")
-    log(f"Loaded cache rows (deduped in-memory): {starting_cache_size}")
+    prefetch_zips = _collect_prefetch_zips(df[address_col].tolist(), cache_lookup)
+    if prefetch_zips:
+        roads, segments = _prefetch_zip_caches(prefetch_zips, prefetch_searcher)
+        log(
+            f"Prefetched {len(prefetch_zips)} ZIPs: {roads} road candidates,"
+            f" {segments} TIGER segments in {time.perf_counter() - prefetch_started:.1f}s"
+        )
+
+    # Started after the prefetch so throughput covers the geocode pass only.
+    run_stats = GeocodeRunStats()
+    trace_writer = TraceWriter(trace_path) if trace_path else None
+    log(f"Trace export: {trace_path if trace_writer else 'off (set GEOCODE_TRACE=1)'}")
 
     output_columns = list(df.columns) + [
         "osm_id",
@@ -188,38 +302,10 @@ def main() -> None:
         "longitude",
     ]
 
-    def process_row(
-        idx: int, row: dict[str, str]
-    ) -> tuple[int, dict[str, str], dict[str, str] | None, dict[str, str] | None]:
-        raw_addr = (row.get(address_col) or "").strip()
-        if not raw_addr:
-            result_row = {
-                **row,
-                "osm_id": "",
-                "display_name": "",
-                "latitude": "",
-                "longitude": "",
-            }
-            return idx, result_row, {
-                "raw_address": "",
-                "method": "",
-                "query": "",
-                "error": "Empty address",
-            }, None
-
-        searcher = NominatimSearch(
-            base_url=NOMINATIM_URL,
-            timeout=HTTP_TIMEOUT_SECONDS,
-            db_statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
-            db_connect_timeout=DB_CONNECT_TIMEOUT_SECONDS,
-            use_address_cache=True,
-            save_address_cache=False,
-            address_cache_path=CACHE_FILE,
-            address_cache_data=cache_lookup,
-            address_cache_lock=cache_lock,
-        )
-        searcher.search(raw_addr)
+    RowOutputs = tuple[dict[str, str], dict[str, str] | None, dict[str, str] | None, Counter | None]
 
+    def finish_row(row: dict[str, str], searcher: NominatimSearch) -> RowOutputs:
+        raw_addr = (row.get(address_col) or "").strip()
         osm_id = ""
         if isinstance(searcher.result_metadata, dict):
             osm_id = str(searcher.result_metadata.get("osm_id") or "")
@@ -244,13 +330,90 @@ def main() -> None:
             }
 
         cache_row = None
+        zip_stats = None
         if not searcher.search_metadata.get("address_cache_used") and searcher.raw_address:
             cache_row = _build_cache_row(searcher)
+            zip_stats = classify_cache_row(cache_row)
 
-        return idx, result_row, not_found_row, cache_row
+        return result_row, not_found_row, cache_row, zip_stats
 
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as output_handle, open(
-        NOT_FOUND_FILE, "w", newline="", encoding="utf-8"
+    def failed_row(row: dict[str, str], exc: Exception) -> RowOutputs:
+        raw_addr = (row.get(address_col) or "").strip()
+        result_row = {
+            **row,
+            "osm_id": "",
+            "display_name": "",
+            "latitude": "",
+            "longitude": "",
+        }
+        not_found_row = {
+            "raw_address": raw_addr,
+            "method": "",
+            "query": "",
+            "error": f"exception: {exc}",
+        }
+        return result_row, not_found_row, None, None
+
+    def process_row(
+        idx: int, row: dict[str, str], submitted_at: float
+    ) -> tuple[int, dict[str, str], NominatimSearch | None, RowOutputs | None]:
+        """Search one row; outputs are None when its state or TIGER lookup was deferred."""
+        run_stats.record_queue_wait((time.perf_counter() - submitted_at) * 1000)
+        raw_addr = (row.get(address_col) or "").strip()
+        if not raw_addr:
+            result_row = {
+                **row,
+                "osm_id": "",
+                "display_name": "",
+                "latitude": "",
+                "longitude": "",
+            }
+            return idx, row, None, (result_row, {
+                "raw_address": "",
+                "method": "",
+                "query": "",
+                "error": "Empty address",
+            }, None, None)
+
+        searcher = NominatimSearch(
+            base_url=NOMINATIM_URL,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            db_statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+            db_connect_timeout=DB_CONNECT_TIMEOUT_SECONDS,
+            use_address_cache=True,
+            save_address_cache=False,
+            address_cache_path=CACHE_FILE,
+            address_cache_data=cache_lookup,
+            address_cache_lock=cache_lock,
+            strategy_planner=strategy_planner,
+            defer_tiger=True,
+            defer_reverse_state=True,
+            openaddress_index=openaddress_index,
+            trace_writer=trace_writer,
+        )
+        searcher.search(raw_addr)
+        if searcher.pending_reverse_state is not None or searcher.pending_tiger is not None:
+            return idx, row, searcher, None
+        return idx, row, searcher, finish_row(row, searcher)
+
+    def resume_row(
+        idx: int, row: dict[str, str], searcher: NominatimSearch
+    ) -> tuple[int, dict[str, str], NominatimSearch | None, RowOutputs | None]:
+        """Continue a row after its state lookup was fetched in a batch."""
+        searcher.resume_reverse_state()
+        if searcher.pending_tiger is not None:
+            return idx, row, searcher, None
+        return idx, row, searcher, finish_row(row, searcher)
+
+    def resume_tiger_row(
+        idx: int, row: dict[str, str], searcher: NominatimSearch
+    ) -> tuple[int, dict[str, str], NominatimSearch, RowOutputs]:
+        """Finish a row after its TIGER rows were fetched in a batch."""
+        searcher.resume_tiger()
+        return idx, row, searcher, finish_row(row, searcher)
+
+    with open(output_path, "w", newline="", encoding="utf-8") as output_handle, open(
+        not_found_path, "w", newline="", encoding="utf-8"
     ) as not_found_handle:
         output_writer = csv.DictWriter(output_handle, fieldnames=output_columns)
         output_writer.writeheader()
@@ -261,84 +424,332 @@ def main() -> None:
         )
         not_found_writer.writeheader()
 
-        cache_handle, cache_writer = _open_cache_append_writer(CACHE_FILE)
+        def consume(outputs: RowOutputs) -> None:
+            nonlocal found, cache_appends
+            result_row, not_found_row, cache_row, zip_stats = outputs
+            output_writer.writerow({k: result_row.get(k, "") for k in output_columns})
+
+            if cache_row is not None:
+                with cache_lock:
+                    row_start, row_end = cache_lookup.append(cache_row)
+                if zip_stats is not None and zip_sidecar is not None:
+                    zip_sidecar.record(row_start, row_end, zip_stats)
+                cache_appends += 1
+
+            if result_row.get("latitude") and result_row.get("longitude"):
+                found += 1
+            else:
+                if not_found_row is None:
+                    not_found_row = {
+                        "raw_address": (result_row.get(address_col) or "").strip(),
+                        "method": "",
+                        "query": "",
+                        "error": "Missing latitude/longitude",
+                    }
+                not_found_writer.writerow(not_found_row)
+                not_found.append(
+                    {
+                        "address": not_found_row.get("raw_address", ""),
+                        "error": not_found_row.get("error", ""),
+                    }
+                )
+
+        # Rows stopped before their state lookup or TIGER fallback; the
+        # lookups are fetched together, then the rows go back to the pool.
+        pending_states: list[tuple[int, dict[str, str], NominatimSearch]] = []
+        pending_tiger: list[tuple[int, dict[str, str], NominatimSearch]] = []
+
         try:
             with ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
-                futures = {
-                    executor.submit(process_row, idx, row.to_dict()): idx
-                    for idx, row in df.iterrows()
-                }
-                for f in tqdm(
-                    as_completed(futures),
-                    total=total,
-                    mininterval=TQDM_MIN_INTERVAL,
-                    maxinterval=TQDM_MIN_INTERVAL,
-                ):
-                    idx = futures[f]
+                futures: dict = {}
+                done_queue: queue.Queue = queue.Queue()
+
+                def submit(fn, idx: int, *args) -> None:
+                    future = executor.submit(fn, idx, *args)
+                    futures[future] = idx
+                    future.add_done_callback(done_queue.put)
+
+                def flush_pending_states() -> None:
+                    fetched = _prefetch_reverse_states(
+                        [searcher.pending_reverse_state for _, _, searcher in pending_states]
+                    )
+                    log(f"Fetched {fetched} state lookups for {len(pending_states)} rows")
+                    for idx, row, searcher in pending_states:
+                        submit(resume_row, idx, row, searcher)
+                    pending_states.clear()
+
+                def flush_pending_tiger() -> None:
+                    batch = [
+                        (
+                            searcher.pending_tiger["zip_code"],
+                            searcher.pending_tiger["fuzzy_street_name"],
+                            searcher.pending_tiger["address_number"],
+                        )
+                        for _, _, searcher in pending_tiger
+                    ]
                     try:
-                        _, result_row, not_found_row, cache_row = f.result()
+                        pending_tiger[0][2].fetch_tiger_rows_batch(batch)
                     except Exception as exc:
-                        row = df.iloc[idx].to_dict()
-                        raw_addr = (row.get(address_col) or "").strip()
-                        result_row = {
-                            **row,
-                            "osm_id": "",
-                            "display_name": "",
-                            "latitude": "",
-                            "longitude": "",
-                        }
-                        not_found_row = {
-                            "raw_address": raw_addr,
-                            "method": "",
-                            "query": "",
-                            "error": f"exception: {exc}",
-                        }
-                        cache_row = None
-
-                    output_writer.writerow({k: result_row.get(k, "") for k in output_columns})
-
-                    if cache_row is not None:
-                        cache_writer.writerow({k: cache_row.get(k, "") for k in CACHE_FIELDS})
-                        with cache_lock:
-                            cache_lookup[_normalize_cache_key(cache_row["address_raw"])] = cache_row
-                        cache_appends += 1
-
-                    if result_row.get("latitude") and result_row.get("longitude"):
-                        found += 1
-                    else:
-                        if not_found_row is None:
-                            not_found_row = {
-                                "raw_address": (result_row.get(address_col) or "").strip(),
-                                "method": "",
-                                "query": "",
-                                "error": "Missing latitude/longitude",
-                            }
-                        not_found_writer.writerow(not_found_row)
-                        not_found.append(
-                            {
-                                "address": not_found_row.get("raw_address", ""),
-                                "error": not_found_row.get("error", ""),
-                            }
-                        )
+                        log(f"TIGER batch query failed, falling back to per-address queries: {exc}")
+                    for idx, row, searcher in pending_tiger:
+                        submit(resume_tiger_row, idx, row, searcher)
+                    pending_tiger.clear()
+
+                for idx, row in df.iterrows():
+                    submit(process_row, idx, row.to_dict(), time.perf_counter())
+                with tqdm(
+                    total=len(futures),
+                    desc=progress_desc,
+                    mininterval=TQDM_MIN_INTERVAL,
+                    maxinterval=TQDM_MIN_INTERVAL,
+                ) as progress:
+                    while futures:
+                        f = done_queue.get()
+                        idx = futures.pop(f)
+                        try:
+                            _, row, searcher, outputs = f.result()
+                        except Exception as exc:
+                            outputs = failed_row(df.iloc[idx].to_dict(), exc)
+                            searcher = None
+                        if searcher is not None and searcher.pending_reverse_state is not None:
+                            pending_states.append((idx, row, searcher))
+                        elif outputs is None:
+                            pending_tiger.append((idx, row, searcher))
+                        else:
+                            progress.update(1)
+                            if searcher is not None:
+                                run_stats.record_search(searcher.search_metadata)
+                            consume(outputs)
+                        # Flush when the batch is full or the pool is running dry.
+                        if pending_states and (
+                            len(pending_states) >= STATE_BATCH_SIZE or len(futures) < NUM_THREADS
+                        ):
+                            flush_pending_states()
+                        if pending_tiger and (
+                            len(pending_tiger) >= TIGER_BATCH_SIZE or len(futures) < NUM_THREADS
+                        ):
+                            flush_pending_tiger()
         finally:
-            cache_handle.close()
+            cache_lookup.close()
+            run_stats.finish()
+            if trace_writer is not None:
+                trace_writer.close()
+                log(f"Trace spans written: {trace_writer.written} (dropped {trace_writer.dropped})")
+
+    return found, not_found, cache_appends, run_stats
+
+
+def _geocode_shard(shard_no: int, shards: int, addresses: list[str], address_col: str) -> dict:
+    """Worker process: geocode one shard into its own segment files."""
+    paths = shard_paths(SHARD_DIR, shard_no, shards)
+    for path in paths.files():
+        if os.path.exists(path):
+            os.remove(path)
+    # Lookups hit the canonical cache (entries read from its file); new rows
+    # go only to this shard's segment.
+    segment = AddressCacheIndex(paths.cache)
+    segment.update(AddressCacheIndex.load(CACHE_FILE))
+    df = pd.DataFrame({address_col: addresses})
+    found, _, cache_appends, run_stats = _geocode_frame(
+        df,
+        address_col,
+        segment,
+        paths.output,
+        paths.not_found,
+        trace_path=paths.trace if TRACE_ENABLED else None,
+        progress_desc=f"shard {shard_no}",
+    )
+    summary = {"shard": shard_no, "threads": NUM_THREADS}
+    run_stats.write_json(paths.stats, extra=summary)
+    return {**summary, "found": found, "cache_appends": cache_appends, **run_stats.to_dict()}
+
+
+def run_sharded(
+    df: pd.DataFrame,
+    address_col: str,
+    cache_lookup: AddressCacheIndex,
+    zip_sidecar: ZipStatsSidecar,
+    shards: int,
+) -> tuple[int, list[dict[str, str]], int, list[str]]:
+    """
+    Geocode unique addresses in `shards` processes, then merge the segments.
+
+    Returns (rows found, not-found entries, cache rows appended, report lines).
+    """
+    by_shard: list[list[str]] = [[] for _ in range(shards)]
+    expected_keys: set[str] = set()
+    for raw_addr in df[address_col].tolist():
+        raw_addr = (raw_addr or "").strip()
+        key = normalize_cache_key(raw_addr)
+        if not key or key in expected_keys:
+            continue
+        expected_keys.add(key)
+        by_shard[shard_for_key(key, shards)].append(raw_addr)
+    log("Shard sizes (unique addresses): " + ", ".join(str(len(s)) for s in by_shard))
+
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=shards, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(_geocode_shard, shard_no, shards, by_shard[shard_no], address_col)
+            for shard_no in range(shards)
+        ]
+        shard_summaries = [f.result() for f in futures]
+    wall_s = time.perf_counter() - started
+
+    paths = [shard_paths(SHARD_DIR, shard_no, shards) for shard_no in range(shards)]
+    merge = merge_shards(paths, address_col)
+    cache_appends = 0
+    try:
+        for cache_row in merge.cache_rows:
+            row_start, row_end = cache_lookup.append(cache_row)
+            zip_sidecar.record(row_start, row_end, classify_cache_row(cache_row))
+            cache_appends += 1
+    finally:
+        cache_lookup.close()
+
+    result_columns = ["osm_id", "display_name", "latitude", "longitude"]
+    output_columns = list(df.columns) + result_columns
+    found = 0
+    not_found = []
+    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as output_handle, open(
+        NOT_FOUND_FILE, "w", newline="", encoding="utf-8"
+    ) as not_found_handle:
+        output_writer = csv.DictWriter(output_handle, fieldnames=output_columns)
+        output_writer.writeheader()
+        not_found_writer = csv.DictWriter(
+            not_found_handle,
+            fieldnames=["raw_address", "method", "query", "error"],
+        )
+        not_found_writer.writeheader()
+        for row in df.to_dict("records"):
+            raw_addr = (row.get(address_col) or "").strip()
+            key = normalize_cache_key(raw_addr)
+            result = merge.results.get(key, {})
+            result_row = {**row, **{k: result.get(k, "") for k in result_columns}}
+            output_writer.writerow({k: result_row.get(k, "") for k in output_columns})
+            if result_row["latitude"] and result_row["longitude"]:
+                found += 1
+                continue
+            if not raw_addr:
+                error = "Empty address"
+            elif key not in merge.results:
+                error = "No shard result"
+            else:
+                error = "Missing latitude/longitude"
+            not_found_row = {"method": "", "query": "", "error": error, **merge.not_found.get(key, {})}
+            not_found_row["raw_address"] = raw_addr
+            not_found_writer.writerow(not_found_row)
+            not_found.append({"address": raw_addr, "error": not_found_row["error"]})
+
+    ok, verify_lines = verify_merge(merge, expected_keys, shards, AddressCacheIndex.load(CACHE_FILE))
+    report_lines = [
+        f"Shards: {shards} processes x {NUM_THREADS} threads, wall {wall_s:.1f}s",
+        f"Unique address keys: {len(expected_keys)}",
+    ]
+    for summary in shard_summaries:
+        report_lines.append(
+            f"  shard {summary['shard']}: {summary['addresses']} addresses,"
+            f" {summary['found']} found, {summary['cache_appends']} new cache rows,"
+            f" {summary['addresses_per_s'] or 0:.2f} addresses/s,"
+            f" {merge.shard_rows.get(summary['shard'], 0)} output rows"
+        )
+    report_lines.append(f"Conflicting keys across shards: {len(merge.conflicts)}")
+    report_lines.extend(
+        f"  {kind} {key}: kept shard {kept}, dropped shard {dropped}"
+        for kind, key, kept, dropped in merge.conflicts[:50]
+    )
+    report_lines.append(f"Cache rows appended (key order): {cache_appends}")
+    report_lines.extend(verify_lines)
+    with open(SHARD_MERGE_REPORT_FILE, "w", encoding="utf-8") as handle:
+        handle.writelines(f"{line}\n" for line in report_lines)
+    log(f"Shard merge report written to {SHARD_MERGE_REPORT_FILE} ({'OK' if ok else 'FAILED'})")
+
+    with open(RUN_STATS_FILE, "w", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "input_file": AGG_FILE,
+                "processes": shards,
+                "threads": NUM_THREADS,
+                "wall_s": round(wall_s, 3),
+                "addresses_per_s": round(len(expected_keys) / wall_s, 3) if wall_s else None,
+                "shards": shard_summaries,
+            },
+            handle,
+            indent=2,
+        )
+        handle.write("\n")
+    return found, not_found, cache_appends, report_lines
+
+
+def main() -> None:
+    os.makedirs(LATEST_DIR, exist_ok=True)
+    df = pd.read_csv(AGG_FILE, dtype=str).fillna("")
+    address_col = _detect_address_column(df)
+
+    _prepare_cache_file(CACHE_FILE)
+    cache_lookup = AddressCacheIndex.load(CACHE_FILE)
+    starting_cache_size = len(cache_lookup)
+
+    # ZIP report stats are kept per cache row in a sidecar; bring it up to date
+    # with the existing cache now, then record each row as it is appended.
+    zip_sidecar = ZipStatsSidecar(Path(CACHE_FILE))
+    if os.path.exists(CACHE_FILE):
+        zip_sidecar.sync(workers=ZIP_REPORT_WORKERS)
+
+    total = len(df)
+    if NUM_PROCESSES > 1:
+        log(f"Processing {total} rows with {NUM_PROCESSES} shard processes x {NUM_THREADS} threads...")
+    else:
+        log(f"Processing {total} rows with {NUM_THREADS} threads...")
+    log(f"Using address column: {address_col}")
+    log(
+        "Timeout config:"
+        f" http={HTTP_TIMEOUT_SECONDS}s"
+        f" db_statement={DB_STATEMENT_TIMEOUT_MS}ms"
+        f" db_connect={DB_CONNECT_TIMEOUT_SECONDS}s"
+    )
+    log(f"Address cache path: {CACHE_FILE}")
+    log(f"Loaded cache rows (deduped in-memory): {starting_cache_size}")
+
+    if NUM_PROCESSES > 1:
+        found, not_found, cache_appends, stats_lines = run_sharded(
+            df, address_col, cache_lookup, zip_sidecar, NUM_PROCESSES
+        )
+    else:
+        found, not_found, cache_appends, run_stats = _geocode_frame(
+            df,
+            address_col,
+            cache_lookup,
+            OUTPUT_FILE,
+            NOT_FOUND_FILE,
+            trace_path=TRACE_FILE if TRACE_ENABLED else None,
+            zip_sidecar=zip_sidecar,
+        )
+        run_stats.write_json(RUN_STATS_FILE, extra={"input_file": AGG_FILE, "threads": NUM_THREADS})
+        stats_lines = run_stats.summary_lines(histograms=False)
 
     log(f"Done. Output written to {OUTPUT_FILE}")
+    log(f"Run stats written to {RUN_STATS_FILE}")
     with open(REPORT_FILE, "w", encoding="utf-8") as handle:
         handle.write(f"Total addresses processed: {total}\n")
         handle.write(f"Addresses geocoded: {found}\n")
         handle.write(f"Addresses not geocoded: {len(not_found)}\n")
         handle.write(f"Cache rows appended this run: {cache_appends}\n\n")
+        handle.write("Run stats (details in geocode_run_stats.json):\n")
+        for line in stats_lines:
+            handle.write(f"  {line}\n")
+        handle.write("\n")
         if not_found:
             handle.write("Addresses not found:\n")
             for nf in not_found:
                 handle.write(f"  {nf['address']} | Error: {nf['error']}\n")
     log(f"Geocode report written to {REPORT_FILE}")
 
-    zip_report_path, _ = generate_zip_mismatch_report(
-        cache_path=Path(CACHE_FILE),
-        report_path=Path(ZIP_MISMATCH_REPORT_FILE),
-    )
+    zip_sidecar.sync(workers=ZIP_REPORT_WORKERS)
+    zip_report_path = zip_sidecar.write_report(Path(ZIP_MISMATCH_REPORT_FILE))
     log(f"ZIP mismatch report written to {zip_report_path}")
 
 
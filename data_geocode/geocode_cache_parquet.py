@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Columnar (Parquet) serialization of `geocode_address_cache.csv`.
+
+The CSV cache stores four JSON blobs per row. This converter writes the same
+rows to Parquet, keeping the blobs as compressed string columns for a
+lossless round trip and promoting the fields reports query most often
+(accepted strategy, ZIP match, result ZIP, elapsed times, per-attempt
+strategy timings) to typed columns so they can be scanned without JSON parsing.
+
+Usage:
+    python geocode_cache_parquet.py to-parquet --cache latest/geocode_address_cache.csv
+    python geocode_cache_parquet.py to-csv --parquet latest/geocode_address_cache.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+from nominatim_helpers.address_cache_index import CACHE_FIELDS
+from zip_mismatch_report import extract_raw_zip, extract_result_zip, parse_json_obj
+
+BATCH_ROWS = 5000
+
+PROMOTED_COLUMNS = [
+    "search_method_accepted",
+    "search_successful",
+    "raw_zip",
+    "result_zip",
+    "checker_zip_match",
+    "checker_expected_zip5",
+    "checker_result_zip5",
+    "elapsed_ms",
+    "street_match_in_zip_elapsed_ms",
+    "tiger_mode",
+    "tiger_elapsed_ms",
+    "attempt_search_names",
+    "attempt_elapsed_ms",
+    "attempt_accepted",
+    "bad_result_metadata_json",
+    "bad_process_metadata_json",
+]
+
+
+def _require_pyarrow() -> None:
+    if pa is None or pq is None:
+        raise RuntimeError("pyarrow is required for the Parquet geocode cache.")
+
+
+def _schema() -> "pa.Schema":
+    _require_pyarrow()
+    fields = [pa.field(name, pa.string()) for name in CACHE_FIELDS]
+    fields += [
+        pa.field("search_method_accepted", pa.string()),
+        pa.field("search_successful", pa.bool_()),
+        pa.field("raw_zip", pa.string()),
+        pa.field("result_zip", pa.string()),
+        pa.field("checker_zip_match", pa.bool_()),
+        pa.field("checker_expected_zip5", pa.string()),
+        pa.field("checker_result_zip5", pa.string()),
+        pa.field("elapsed_ms", pa.int32()),
+        pa.field("street_match_in_zip_elapsed_ms", pa.int32()),
+        pa.field("tiger_mode", pa.string()),
+        pa.field("tiger_elapsed_ms", pa.int32()),
+        pa.field("attempt_search_names", pa.list_(pa.string())),
+        pa.field("attempt_elapsed_ms", pa.list_(pa.int32())),
+        pa.field("attempt_accepted", pa.list_(pa.bool_())),
+        pa.field("bad_result_metadata_json", pa.bool_()),
+        pa.field("bad_process_metadata_json", pa.bool_()),
+    ]
+    return pa.schema(fields)
+
+
+def _as_int(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+TRUE_STRINGS = {"true", "1", "yes", "t", "y"}
+FALSE_STRINGS = {"false", "0", "no", "f", "n"}
+
+
+def _as_bool(value: Any) -> bool | None:
+    """Booleans from JSON or CSV text ("False" must not become True)."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return None if value != value else bool(value)  # NaN -> null
+    text = str(value).strip().lower()
+    if text in TRUE_STRINGS:
+        return True
+    if text in FALSE_STRINGS:
+        return False
+    return None
+
+
+def _as_text(value: Any) -> str | None:
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def promote_row(row: dict[str, str]) -> dict[str, Any]:
+    """Parse one cache row's JSON once and return its typed promoted columns."""
+    stats: Counter[str] = Counter()
+    result_meta = parse_json_obj(row.get("result_metadata", ""), stats, "bad_result_metadata_json")
+    search_meta = parse_json_obj(row.get("search_metadata", ""), stats, "bad_search_metadata_json")
+    process_meta = parse_json_obj(row.get("process_metadata", ""), stats, "bad_process_metadata_json")
+    if not search_meta and isinstance(process_meta.get("search_metadata"), dict):
+        search_meta = process_meta["search_metadata"]
+
+    tiger_meta = search_meta.get("tiger_extrapolate_snap")
+    if not isinstance(tiger_meta, dict):
+        tiger_meta = {}
+    attempts = search_meta.get("search_attempts")
+    if not isinstance(attempts, list):
+        attempts = []
+    attempts = [a for a in attempts if isinstance(a, dict)]
+
+    return {
+        "search_method_accepted": _as_text(search_meta.get("search_method_accepted")),
+        "search_successful": _as_bool(search_meta.get("search_successful")),
+        "raw_zip": extract_raw_zip(process_meta),
+        "result_zip": extract_result_zip(row, result_meta),
+        "checker_zip_match": _as_bool(result_meta.get("checker_zip_match")),
+        "checker_expected_zip5": _as_text(result_meta.get("checker_expected_zip5")),
+        "checker_result_zip5": _as_text(result_meta.get("checker_result_zip5")),
+        "elapsed_ms": _as_int(search_meta.get("elapsed_ms")),
+        "street_match_in_zip_elapsed_ms": _as_int(search_meta.get("street_match_in_zip_elapsed_ms")),
+        "tiger_mode": _as_text(tiger_meta.get("mode")),
+        "tiger_elapsed_ms": _as_int(tiger_meta.get("elapsed_ms")),
+        "attempt_search_names": [str(a.get("search_name") or "") for a in attempts],
+        "attempt_elapsed_ms": [_as_int(a.get("elapsed_ms")) for a in attempts],
+        "attempt_accepted": [a.get("result_check") == "accepted" for a in attempts],
+        "bad_result_metadata_json": bool(stats["bad_result_metadata_json"]),
+        "bad_process_metadata_json": bool(stats["bad_process_metadata_json"]),
+    }
+
+
+def _iter_cache_rows(cache_path: Path) -> Iterator[dict[str, str]]:
+    with cache_path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            yield {k: (row.get(k) or "") for k in CACHE_FIELDS}
+
+
+def write_cache_parquet(cache_path: Path, parquet_path: Path | None = None) -> tuple[Path, int]:
+    """Stream the CSV cache into a Parquet file in row batches."""
+    _require_pyarrow()
+    if not cache_path.exists():
+        raise FileNotFoundError(f"Cache file not found: {cache_path}")
+    final_path = parquet_path or cache_path.with_suffix(".parquet")
+    schema = _schema()
+    rows_written = 0
+    batch: list[dict[str, Any]] = []
+    with pq.ParquetWriter(str(final_path), schema, compression="zstd") as writer:
+        for row in _iter_cache_rows(cache_path):
+            batch.append({**row, **promote_row(row)})
+            if len(batch) >= BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                rows_written += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            rows_written += len(batch)
+    return final_path, rows_written
+
+
+def read_cache_columns(parquet_path: Path, columns: list[str]) -> "pa.Table":
+    """Read only the requested columns (typed) from a Parquet cache."""
+    _require_pyarrow()
+    return pq.read_table(str(parquet_path), columns=columns)
+
+
+def iter_parquet_cache_rows(parquet_path: Path) -> Iterator[dict[str, str]]:
+    """Yield rows in the CSV cache layout from a Parquet cache."""
+    _require_pyarrow()
+    parquet_file = pq.ParquetFile(str(parquet_path))
+    for record_batch in parquet_file.iter_batches(batch_size=BATCH_ROWS, columns=CACHE_FIELDS):
+        for row in record_batch.to_pylist():
+            yield {k: (row.get(k) or "") for k in CACHE_FIELDS}
+
+
+def write_cache_csv(parquet_path: Path, cache_path: Path) -> tuple[Path, int]:
+    rows_written = 0
+    with cache_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=CACHE_FIELDS)
+        writer.writeheader()
+        for row in iter_parquet_cache_rows(parquet_path):
+            writer.writerow(row)
+            rows_written += 1
+    return cache_path, rows_written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert the geocode cache between CSV and Parquet.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    to_parquet = sub.add_parser("to-parquet", help="CSV cache -> Parquet with promoted columns")
+    to_parquet.add_argument("--cache", type=Path, required=True, help="Path to geocode_address_cache.csv")
+    to_parquet.add_argument("--parquet", type=Path, default=None, help="Output path (default: <cache>.parquet)")
+
+    to_csv = sub.add_parser("to-csv", help="Parquet cache -> CSV cache")
+    to_csv.add_argument("--parquet", type=Path, required=True, help="Path to geocode_address_cache.parquet")
+    to_csv.add_argument("--cache", type=Path, required=True, help="Output CSV path")
+
+    args = parser.parse_args()
+    if args.command == "to-parquet":
+        path, count = write_cache_parquet(args.cache, args.parquet)
+    else:
+        path, count = write_cache_csv(args.parquet, args.cache)
+    print(f"rows_written: {count}")
+    print(f"output_file: {path}")
+
+
+if __name__ == "__main__":
+    main()
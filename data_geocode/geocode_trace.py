@@ -0,0 +1,70 @@
+"""
+Inspect a geocode trace written by data_add_geocode (GEOCODE_TRACE=1).
+
+Prints the slowest addresses and where their time went (SQL, HTTP, strategy
+spans), and optionally converts the JSONL spans to a Chrome trace file that
+can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+Usage:
+    python geocode_trace.py latest/geocode_trace.jsonl --top 20
+    python geocode_trace.py latest/geocode_trace.jsonl --chrome latest/geocode_trace.chrome.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from collections import defaultdict
+
+from nominatim_helpers.trace_export import load_spans, to_chrome_trace
+
+SCRIPT_DIR = os.path.dirname(__file__)
+DEFAULT_TRACE_FILE = os.path.join(SCRIPT_DIR, "latest", "geocode_trace.jsonl")
+
+
+def print_slowest(spans: list[dict], top: int) -> None:
+    by_trace: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    addresses = []
+    for span in spans:
+        if span["kind"] == "address":
+            addresses.append(span)
+        else:
+            by_trace[span["trace_id"]][span["kind"]] += float(span["duration_ms"])
+    addresses.sort(key=lambda span: span["duration_ms"], reverse=True)
+
+    print(f"{'total_ms':>9} {'db_ms':>8} {'http_ms':>8}  outcome     address")
+    for span in addresses[:top]:
+        parts = by_trace.get(span["trace_id"], {})
+        print(
+            f"{span['duration_ms']:>9.1f} {parts.get('db', 0):>8.1f} {parts.get('http', 0):>8.1f}"
+            f"  {span['outcome']:<11} {span['attrs'].get('raw_address', '')}"
+        )
+
+    totals: dict[str, list[float]] = defaultdict(list)
+    for span in spans:
+        if span["kind"] in ("db", "http"):
+            totals[f"{span['kind']}: {span['name']}"].append(float(span["duration_ms"]))
+    print(f"\n{'count':>7} {'total_ms':>10} {'max_ms':>8}  statement")
+    for name, values in sorted(totals.items(), key=lambda item: sum(item[1]), reverse=True)[:top]:
+        print(f"{len(values):>7} {sum(values):>10.1f} {max(values):>8.1f}  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize or convert a geocode trace.")
+    parser.add_argument("trace", nargs="?", default=DEFAULT_TRACE_FILE, help="Span JSONL file")
+    parser.add_argument("--top", type=int, default=20, help="Rows to show per table")
+    parser.add_argument("--chrome", default=None, help="Write a Chrome trace JSON file")
+    args = parser.parse_args()
+
+    spans = list(load_spans(args.trace))
+    print(f"Loaded {len(spans)} spans from {args.trace}")
+    print_slowest(spans, args.top)
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as handle:
+            json.dump(to_chrome_trace(spans), handle)
+        print(f"chrome_trace_file: {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Create, inspect and benchmark the supporting indexes for the geocoder's
+Nominatim DB fallback queries.
+
+The postcode-candidate and TIGER extrapolate/snap lookups filter TIGER rows by
+postcode, match road names with an unanchored ILIKE and scan highways within
+a radius through a geography cast. None of those are covered by Nominatim's
+own indexes. This script adds them (see nominatim_helpers/db_indexes.py) and
+reports EXPLAIN ANALYZE timings of the geocoder's queries before and after.
+
+Index creation needs a role that owns `placex` / `location_property_tiger`
+(or a superuser); pass it with --db-user / NOM_DB_ADMIN_USER.
+
+Usage:
+    python nominatim_db_indexes.py status
+    python nominatim_db_indexes.py benchmark --zip 02886 --street "Post Rd"
+    python nominatim_db_indexes.py create --benchmark --zip 02886 --street "Post Rd"
+    python nominatim_db_indexes.py drop
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any
+
+try:
+    import psycopg
+except Exception:  # pragma: no cover - optional dependency
+    psycopg = None
+
+from nominatim_helpers.db_indexes import (
+    ANALYZE_TABLES,
+    FALLBACK_INDEXES,
+    REQUIRED_EXTENSIONS,
+    highway_radius_predicate,
+)
+
+TIGER_STREET_SQL = """
+    SELECT t.place_id, p.name::text
+    FROM location_property_tiger t
+    JOIN placex p ON p.place_id = t.parent_place_id
+    WHERE t.postcode = %(zip)s
+      AND p.name::text ILIKE '%%' || %(street)s || '%%'
+"""
+
+POSTCODE_ROADS_SQL = """
+    SELECT DISTINCT NULLIF(BTRIM(p.name::text), '')
+    FROM location_property_tiger t
+    JOIN placex p ON p.place_id = t.parent_place_id
+    WHERE t.postcode = %(zip)s
+"""
+
+STREET_NAME_SQL = """
+    SELECT p.place_id
+    FROM placex p
+    WHERE p.class = 'highway'
+      AND p.name::text ILIKE '%%' || %(street)s || '%%'
+    LIMIT 50
+"""
+
+HIGHWAY_RADIUS_SQL = """
+    WITH z AS (
+      SELECT {geom_col}::geometry AS g
+      FROM location_postcode
+      WHERE country_code = %(country)s AND postcode = %(zip)s
+      LIMIT 1
+    )
+    SELECT p.place_id
+    FROM placex p, z
+    WHERE p.class = 'highway'
+      AND p.geometry IS NOT NULL
+      AND {radius_pred}
+"""
+
+
+def _dsn(args: argparse.Namespace) -> str:
+    return (
+        f"host={args.db_host} port={args.db_port} dbname={args.db_name} "
+        f"user={args.db_user} password={args.db_pass}"
+    )
+
+
+def _connect(args: argparse.Namespace):
+    if psycopg is None:
+        raise RuntimeError("psycopg is required: pip install 'psycopg[binary]'")
+    return psycopg.connect(_dsn(args), connect_timeout=args.connect_timeout, autocommit=True)
+
+
+def postcode_geom_column(conn) -> str:
+    """`centroid` or `geometry`, whichever location_postcode has (as the geocoder picks it)."""
+    sql = """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = 'location_postcode'
+          AND column_name IN ('centroid', 'geometry')
+        ORDER BY CASE column_name WHEN 'centroid' THEN 1 ELSE 2 END
+        LIMIT 1
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        row = cur.fetchone()
+    if not row:
+        raise RuntimeError("location_postcode has neither centroid nor geometry column.")
+    return row[0]
+
+
+def index_status(conn) -> dict[str, dict[str, Any]]:
+    """name -> {present, size, valid} for each fallback index."""
+    sql = """
+        SELECT c.relname, pg_size_pretty(pg_relation_size(c.oid)), i.indisvalid
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = ANY(%s)
+    """
+    status = {name: {"present": False, "size": "", "valid": False} for name in FALLBACK_INDEXES}
+    with conn.cursor() as cur:
+        cur.execute(sql, (list(FALLBACK_INDEXES),))
+        for name, size, valid in cur.fetchall():
+            status[name] = {"present": True, "size": size, "valid": bool(valid)}
+    return status
+
+
+def create_indexes(conn, names: list[str]) -> None:
+    with conn.cursor() as cur:
+        for statement in REQUIRED_EXTENSIONS:
+            cur.execute(statement)
+        for name in names:
+            print(f"creating {name} ...", flush=True)
+            started = time.perf_counter()
+            # An interrupted CONCURRENTLY build leaves an invalid index that
+            # IF NOT EXISTS would keep; drop it first.
+            cur.execute(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = %s AND NOT i.indisvalid",
+                (name,),
+            )
+            if cur.fetchone():
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            cur.execute(FALLBACK_INDEXES[name])
+            print(f"  done in {time.perf_counter() - started:.1f}s")
+        for table in ANALYZE_TABLES:
+            cur.execute(f"ANALYZE {table}")
+
+
+def drop_indexes(conn, names: list[str]) -> None:
+    with conn.cursor() as cur:
+        for name in names:
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            print(f"dropped {name}")
+
+
+def _explain(conn, sql: str, params: dict[str, Any], statement_timeout_ms: int) -> dict[str, Any]:
+    with conn.cursor() as cur:
+        cur.execute(f"SET statement_timeout = {int(statement_timeout_ms)}")
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+        except Exception as exc:
+            return {"error": str(exc).strip().splitlines()[0]}
+        finally:
+            cur.execute("RESET statement_timeout")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]
+    return {
+        "planning_ms": float(top.get("Planning Time", 0.0)),
+        "execution_ms": float(top.get("Execution Time", 0.0)),
+        "rows": int(top["Plan"].get("Actual Rows", 0)),
+        "index_names": sorted(_plan_index_names(top["Plan"])),
+    }
+
+
+def _plan_index_names(node: dict[str, Any]) -> set[str]:
+    names = {node["Index Name"]} if node.get("Index Name") else set()
+    for child in node.get("Plans", []) or []:
+        names |= _plan_index_names(child)
+    return names
+
+
+def run_benchmark(conn, args: argparse.Namespace) -> list[tuple[str, dict[str, Any]]]:
+    """EXPLAIN ANALYZE each fallback query (best of --repeat runs)."""
+    present = frozenset(n for n, s in index_status(conn).items() if s["present"] and s["valid"])
+    radius_pred = highway_radius_predicate(present, args.radius_m).replace(
+        "%s", "%(radius)s"
+    )
+    params = {
+        "zip": args.zip,
+        "street": args.street,
+        "country": args.country,
+        "radius": args.radius_m,
+    }
+    queries = [
+        ("tiger_street", TIGER_STREET_SQL),
+        ("postcode_roads", POSTCODE_ROADS_SQL),
+        ("street_name_trgm", STREET_NAME_SQL),
+        (
+            "highway_radius",
+            HIGHWAY_RADIUS_SQL.format(
+                geom_col=postcode_geom_column(conn), radius_pred=radius_pred
+            ),
+        ),
+    ]
+    results = []
+    for label, sql in queries:
+        best: dict[str, Any] | None = None
+        for _ in range(max(1, args.repeat)):
+            result = _explain(conn, sql, params, args.statement_timeout_ms)
+            if "error" in result:
+                best = result
+                break
+            if best is None or result["execution_ms"] < best["execution_ms"]:
+                best = result
+        results.append((label, best or {}))
+    return results
+
+
+def print_benchmark(title: str, results: list[tuple[str, dict[str, Any]]]) -> None:
+    print(title)
+    for label, result in results:
+        if "error" in result:
+            print(f"  {label:<18} error: {result['error']}")
+            continue
+        print(
+            f"  {label:<18} plan={result['planning_ms']:8.2f}ms "
+            f"exec={result['execution_ms']:10.2f}ms rows={result['rows']:<6} "
+            f"indexes={','.join(result['index_names']) or '-'}"
+        )
+
+
+def print_comparison(
+    before: list[tuple[str, dict[str, Any]]], after: list[tuple[str, dict[str, Any]]]
+) -> None:
+    print("speedup (execution, before/after):")
+    after_map = dict(after)
+    for label, old in before:
+        new = after_map.get(label, {})
+        if "error" in old or "error" in new or not new.get("execution_ms"):
+            print(f"  {label:<18} n/a")
+            continue
+        print(f"  {label:<18} {old['execution_ms'] / new['execution_ms']:8.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Manage supporting indexes for the geocoder's Nominatim DB fallback queries."
+    )
+    parser.add_argument("command", choices=["status", "create", "drop", "benchmark"])
+    parser.add_argument("--db-host", default=os.getenv("NOM_DB_HOST", "localhost"))
+    parser.add_argument("--db-port", type=int, default=int(os.getenv("NOM_DB_PORT", "5433")))
+    parser.add_argument("--db-name", default=os.getenv("NOM_DB_NAME", "nominatim"))
+    parser.add_argument(
+        "--db-user",
+        default=os.getenv("NOM_DB_ADMIN_USER", os.getenv("NOM_DB_USER", "nominatim")),
+    )
+    parser.add_argument(
+        "--db-pass",
+        default=os.getenv("NOM_DB_ADMIN_PASS", os.getenv("NOM_DB_PASS", "qaIACxO6wMR3")),
+    )
+    parser.add_argument("--connect-timeout", type=int, default=5)
+    parser.add_argument(
+        "--index",
+        action="append",
+        choices=sorted(FALLBACK_INDEXES),
+        help="Limit create/drop to these indexes (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="With create: run the query benchmark before and after building",
+    )
+    parser.add_argument("--zip", default="02886", help="Benchmark postcode")
+    parser.add_argument("--street", default="Post", help="Benchmark street fragment")
+    parser.add_argument("--country", default=os.getenv("NOM_DB_COUNTRY", "us").lower())
+    parser.add_argument(
+        "--radius-m", type=int, default=int(os.getenv("NOM_DB_RADIUS_M", "5000"))
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Benchmark runs per query (best kept)")
+    parser.add_argument("--statement-timeout-ms", type=int, default=120000)
+    args = parser.parse_args()
+
+    names = args.index or list(FALLBACK_INDEXES)
+    with _connect(args) as conn:
+        if args.command == "status":
+            for name, status in index_status(conn).items():
+                state = "valid" if status["valid"] else "INVALID" if status["present"] else "missing"
+                print(f"{name:<34} {state:<8} {status['size']}")
+        elif args.command == "create":
+            before = run_benchmark(conn, args) if args.benchmark else None
+            if before is not None:
+                print_benchmark("before:", before)
+            create_indexes(conn, names)
+            if before is not None:
+                after = run_benchmark(conn, args)
+                print_benchmark("after:", after)
+                print_comparison(before, after)
+        elif args.command == "drop":
+            drop_indexes(conn, names)
+        else:
+            print_benchmark("benchmark:", run_benchmark(conn, args))
+
+
+if __name__ == "__main__":
+    main()
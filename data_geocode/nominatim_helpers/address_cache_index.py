@@ -0,0 +1,215 @@
+"""
+address_cache_index.py
+
+Slim, offset-indexed view of `geocode_address_cache.csv`.
+
+Only the fields needed for a cache lookup (coordinates, display name, method,
+error) are kept in memory. The large JSON metadata columns stay on disk and
+are read back from the row's byte offset when a caller asks for them.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+from typing import Any, Iterator
+
+CACHE_FIELDS = [
+    "address_raw",
+    "address_geocode",
+    "address_nominatim",
+    "latitude",
+    "longitude",
+    "method",
+    "error",
+    "result_metadata",
+    "tag_metadata",
+    "search_metadata",
+    "process_metadata",
+]
+
+# Columns held in memory for every entry; everything else is read lazily.
+SLIM_FIELDS = (
+    "address_raw",
+    "address_geocode",
+    "address_nominatim",
+    "latitude",
+    "longitude",
+    "method",
+    "error",
+)
+
+METADATA_FIELDS = tuple(f for f in CACHE_FIELDS if f not in SLIM_FIELDS)
+
+
+def normalize_cache_key(value: str) -> str:
+    if value is None:
+        return ""
+    normalized = str(value).strip().casefold()
+    normalized = " ".join(normalized.split())
+    return normalized.strip(" ,")
+
+
+def iter_csv_records(handle, start: int = 0, end: int | None = None) -> Iterator[tuple[int, int, list[str]]]:
+    """
+    Yield (offset, end_offset, fields) for each CSV record in a binary handle.
+
+    Quoted fields may contain newlines, so physical lines are joined until the
+    quote count is balanced. `start` must sit on a record boundary; records
+    that begin at or after `end` are not yielded.
+    """
+    handle.seek(start)
+    offset = start
+    pending: list[bytes] = []
+    record_start = offset
+    quote_count = 0
+    for line in iter(handle.readline, b""):
+        if not pending:
+            record_start = offset
+            if end is not None and record_start >= end:
+                return
+        offset += len(line)
+        pending.append(line)
+        quote_count += line.count(b'"')
+        if quote_count % 2:
+            continue
+        text = b"".join(pending).decode("utf-8")
+        pending = []
+        quote_count = 0
+        if not text.strip():
+            continue
+        fields = next(csv.reader(io.StringIO(text)), [])
+        yield record_start, offset, fields
+    if pending:
+        text = b"".join(pending).decode("utf-8")
+        fields = next(csv.reader(io.StringIO(text)), [])
+        yield record_start, offset, fields
+
+
+def _clean_row(header: list[str], fields: list[str]) -> dict[str, str]:
+    return {
+        name: (fields[i].strip() if i < len(fields) else "")
+        for i, name in enumerate(header)
+    }
+
+
+class AddressCacheEntry:
+    """In-memory slim cache row; metadata columns are loaded on demand."""
+
+    __slots__ = ("index", "offset", *SLIM_FIELDS)
+
+    def __init__(self, index: "AddressCacheIndex", offset: int, row: dict[str, str]) -> None:
+        self.index = index
+        self.offset = offset
+        for name in SLIM_FIELDS:
+            setattr(self, name, row.get(name, "") or "")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in SLIM_FIELDS:
+            return getattr(self, key)
+        return self.load_row().get(key, default)
+
+    def __getitem__(self, key: str) -> str:
+        if key in SLIM_FIELDS:
+            return getattr(self, key)
+        return self.load_row()[key]
+
+    def load_row(self) -> dict[str, str]:
+        """Read the full cache row (including metadata JSON) from disk."""
+        return self.index.read_row(self.offset)
+
+
+class AddressCacheIndex(dict):
+    """
+    Mapping of normalized address key -> AddressCacheEntry for one cache file.
+
+    Later rows win on duplicate keys, matching the previous full-row loader.
+    Plain dict rows may also be assigned; they are kept in memory as-is.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        super().__init__()
+        self.cache_path = os.path.abspath(cache_path)
+        self.header: list[str] = list(CACHE_FIELDS)
+        self._write_lock = threading.RLock()
+        self._append_handle = None
+
+    @classmethod
+    def load(cls, cache_path: str) -> "AddressCacheIndex":
+        index = cls(cache_path)
+        index.reload()
+        return index
+
+    def reload(self) -> None:
+        self.clear()
+        if not os.path.exists(self.cache_path):
+            return
+        with open(self.cache_path, "rb") as handle:
+            records = iter_csv_records(handle)
+            first = next(records, None)
+            if first is None:
+                return
+            self.header = [name.strip() for name in first[2]]
+            for offset, _, fields in records:
+                row = _clean_row(self.header, fields)
+                raw = row.get("address_raw", "")
+                if not raw:
+                    continue
+                super().__setitem__(normalize_cache_key(raw), AddressCacheEntry(self, offset, row))
+
+    def read_row(self, offset: int) -> dict[str, str]:
+        with self._write_lock:
+            if self._append_handle is not None:
+                self._append_handle.flush()
+        with open(self.cache_path, "rb") as handle:
+            record = next(iter_csv_records(handle, start=offset), None)
+        if record is None:
+            return {}
+        return _clean_row(self.header, record[2])
+
+    def full_row(self, key: str) -> dict[str, str] | None:
+        value = self.get(key)
+        if value is None:
+            return None
+        if isinstance(value, AddressCacheEntry):
+            return value.load_row()
+        return dict(value)
+
+    def append(self, row: dict[str, str]) -> tuple[int, int]:
+        """
+        Append one row to the cache file and index it by its byte offset.
+
+        Returns the (start, end) byte span of the written row.
+        """
+        raw = (row.get("address_raw") or "").strip()
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.header, extrasaction="ignore")
+        with self._write_lock:
+            if self._append_handle is None:
+                cache_dir = os.path.dirname(self.cache_path)
+                if cache_dir:
+                    os.makedirs(cache_dir, exist_ok=True)
+                self._append_handle = open(self.cache_path, "ab")
+            if self._append_handle.tell() == 0:
+                writer.writeheader()
+            header_len = len(buffer.getvalue().encode("utf-8"))
+            writer.writerow({k: row.get(k, "") for k in self.header})
+            payload = buffer.getvalue().encode("utf-8")
+            offset = self._append_handle.tell() + header_len
+            self._append_handle.write(payload)
+            self._append_handle.flush()
+            end_offset = self._append_handle.tell()
+            if raw:
+                entry = AddressCacheEntry(
+                    self, offset, {k: str(row.get(k, "") or "").strip() for k in SLIM_FIELDS}
+                )
+                super().__setitem__(normalize_cache_key(raw), entry)
+            return offset, end_offset
+
+    def close(self) -> None:
+        with self._write_lock:
+            if self._append_handle is not None:
+                self._append_handle.close()
+                self._append_handle = None
@@ -0,0 +1,95 @@
+"""
+db_indexes.py
+
+Supporting indexes for the geocoder's DB fallback queries (postcode road
+candidates and TIGER extrapolate/snap), and detection of which are present.
+
+Created by `nominatim_db_indexes.py`; NominatimSearch reads
+`detect_fallback_indexes()` to pick query variants that can use them.
+"""
+
+from __future__ import annotations
+
+import threading
+
+TRGM_NAME_INDEX = "bbbs_placex_name_trgm"
+TIGER_POSTCODE_INDEX = "bbbs_tiger_postcode"
+HIGHWAY_GEOGRAPHY_INDEX = "bbbs_placex_highway_geography"
+
+# name -> CREATE statement. CONCURRENTLY keeps the live geocoder usable while
+# the indexes build; it requires autocommit.
+FALLBACK_INDEXES: dict[str, str] = {
+    # Unanchored `p.name::text ILIKE '%street%'` in the TIGER query.
+    TRGM_NAME_INDEX: (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TRGM_NAME_INDEX} "
+        "ON placex USING gin ((name::text) gin_trgm_ops)"
+    ),
+    # `t.postcode = %s` in both the TIGER and postcode-candidate queries.
+    TIGER_POSTCODE_INDEX: (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TIGER_POSTCODE_INDEX} "
+        "ON location_property_tiger (postcode)"
+    ),
+    # `ST_DWithin(p.geometry::geography, ...)` over highways; the cast defeats
+    # Nominatim's own geometry index, so index the cast expression itself.
+    HIGHWAY_GEOGRAPHY_INDEX: (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {HIGHWAY_GEOGRAPHY_INDEX} "
+        "ON placex USING gist ((geometry::geography)) WHERE class = 'highway'"
+    ),
+}
+
+REQUIRED_EXTENSIONS = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+
+ANALYZE_TABLES = ["placex", "location_property_tiger"]
+
+# Degrees that safely cover a metre radius for a bounding-box prefilter
+# (longitude degrees shrink with latitude; 50 km/degree holds below ~63N).
+METRES_PER_DEGREE_FLOOR = 50000.0
+
+_detect_lock = threading.Lock()
+_detected: dict[str, frozenset[str]] = {}
+
+
+# Only valid indexes count: an interrupted CONCURRENTLY build leaves an
+# invalid one behind that the planner never uses.
+DETECT_INDEXES_SQL = """
+    SELECT c.relname
+    FROM pg_class c
+    JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE c.relname = ANY(%s) AND i.indisvalid
+"""
+
+
+def detect_fallback_indexes(fetch_rows, cache_key: str = "") -> frozenset[str]:
+    """
+    Return the names of FALLBACK_INDEXES present and valid in the DB (cached per key).
+
+    `fetch_rows(sql, params)` runs one query and returns its rows.
+    """
+    with _detect_lock:
+        if cache_key in _detected:
+            return _detected[cache_key]
+    rows = fetch_rows(DETECT_INDEXES_SQL, (list(FALLBACK_INDEXES),))
+    found = frozenset(row[0] for row in rows)
+    with _detect_lock:
+        _detected[cache_key] = found
+    return found
+
+
+def reset_detected_indexes() -> None:
+    with _detect_lock:
+        _detected.clear()
+
+
+def highway_radius_predicate(indexes: frozenset[str], radius_m: float) -> str:
+    """
+    SQL predicate for "highway p within radius of z.g"; takes one %s (radius metres).
+
+    With the geography expression index the original form is indexable as-is.
+    Without it, a bounding-box prefilter on the raw geometry lets Nominatim's
+    geometry GiST index narrow rows before the exact geography distance test.
+    """
+    exact = "ST_DWithin(p.geometry::geography, z.g::geography, %s)"
+    if HIGHWAY_GEOGRAPHY_INDEX in indexes:
+        return exact
+    degrees = float(radius_m) / METRES_PER_DEGREE_FLOOR
+    return f"p.geometry && ST_Expand(z.g, {degrees:.6f}) AND {exact}"
@@ -0,0 +1,120 @@
+"""
+db_pool.py
+
+Shared Postgres connections for the geocoder's DB fallback queries.
+
+Connections are long-lived so server-side prepared statements (psycopg
+`prepare=True`) survive between addresses. `psycopg_pool.ConnectionPool` is
+used when installed; otherwise each thread keeps one persistent connection.
+The statement timeout is set once per connection through libpq `options`.
+"""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import psycopg
+except Exception:  # pragma: no cover - optional dependency
+    psycopg = None
+
+try:
+    from psycopg_pool import ConnectionPool
+except Exception:  # pragma: no cover - optional dependency
+    ConnectionPool = None
+
+DEFAULT_POOL_SIZE = 8
+
+
+class NominatimDbPool:
+    """Connection source for one (DSN, timeouts) combination."""
+
+    def __init__(
+        self,
+        dsn: str,
+        connect_timeout: int = 5,
+        statement_timeout_ms: int = 8000,
+        max_size: int = DEFAULT_POOL_SIZE,
+    ) -> None:
+        if psycopg is None:
+            raise RuntimeError("psycopg is not available.")
+        self.dsn = dsn
+        self.connect_kwargs = {
+            "connect_timeout": int(connect_timeout),
+            "options": f"-c statement_timeout={int(statement_timeout_ms)}",
+        }
+        self._local = threading.local()
+        self._conns_lock = threading.Lock()
+        self._conns: list["psycopg.Connection"] = []
+        self._pool = None
+        if ConnectionPool is not None:
+            self._pool = ConnectionPool(
+                dsn,
+                kwargs=self.connect_kwargs,
+                min_size=1,
+                max_size=max(1, int(max_size)),
+                timeout=float(connect_timeout) * 2,
+                open=True,
+            )
+
+    @contextmanager
+    def connection(self) -> Iterator["psycopg.Connection"]:
+        """Borrow a connection; the transaction is committed or rolled back on exit."""
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+            return
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed or conn.broken:
+            conn = psycopg.connect(self.dsn, **self.connect_kwargs)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns = [c for c in self._conns if not c.closed]
+                self._conns.append(conn)
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed and not conn.broken:
+                conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close(self) -> None:
+        """Close the pool, or every per-thread connection opened without one."""
+        if self._pool is not None:
+            self._pool.close()
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            if not conn.closed:
+                conn.close()
+
+
+_pools_lock = threading.Lock()
+_pools: dict[tuple[str, int, int], NominatimDbPool] = {}
+
+
+def get_db_pool(
+    dsn: str,
+    connect_timeout: int = 5,
+    statement_timeout_ms: int = 8000,
+    max_size: int = DEFAULT_POOL_SIZE,
+) -> NominatimDbPool:
+    """Return the process-wide pool for these settings, creating it on first use."""
+    key = (dsn, int(connect_timeout), int(statement_timeout_ms))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = NominatimDbPool(dsn, connect_timeout, statement_timeout_ms, max_size)
+            _pools[key] = pool
+        return pool
+
+
+def close_db_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
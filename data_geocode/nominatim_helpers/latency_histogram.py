@@ -0,0 +1,125 @@
+"""
+latency_histogram.py
+
+Streaming latency histograms for geocode runs and benchmarks.
+
+Values are counted in log-spaced buckets (about 5% wide), so memory stays
+constant however many samples are recorded and percentiles are accurate to
+the bucket width. Histograms can be merged (e.g. across threads or shards).
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any
+
+BUCKET_GROWTH = 1.05
+MIN_TRACKED_MS = 0.01
+
+# Coarse display buckets (upper bounds, ms) for text reports.
+DISPLAY_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of millisecond values."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: float | None = None
+        self.max_ms: float | None = None
+        self.zero_count = 0
+        self.buckets: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(value_ms: float) -> int:
+        return int(math.floor(math.log(value_ms / MIN_TRACKED_MS, BUCKET_GROWTH)))
+
+    @staticmethod
+    def _bucket_mid(index: int) -> float:
+        low = MIN_TRACKED_MS * BUCKET_GROWTH ** index
+        return low * (1 + BUCKET_GROWTH) / 2
+
+    def record(self, value_ms: float | int | None) -> None:
+        if value_ms is None:
+            return
+        value = max(0.0, float(value_ms))
+        with self._lock:
+            self.count += 1
+            self.total_ms += value
+            self.min_ms = value if self.min_ms is None else min(self.min_ms, value)
+            self.max_ms = value if self.max_ms is None else max(self.max_ms, value)
+            if value < MIN_TRACKED_MS:
+                self.zero_count += 1
+            else:
+                index = self._bucket(value)
+                self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        with self._lock:
+            self.count += other.count
+            self.total_ms += other.total_ms
+            for attr, pick in (("min_ms", min), ("max_ms", max)):
+                mine, theirs = getattr(self, attr), getattr(other, attr)
+                if theirs is not None:
+                    setattr(self, attr, theirs if mine is None else pick(mine, theirs))
+            self.zero_count += other.zero_count
+            for index, n in other.buckets.items():
+                self.buckets[index] = self.buckets.get(index, 0) + n
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * pct / 100.0))
+        seen = self.zero_count
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = self._bucket_mid(index)
+                return min(max(value, self.min_ms or 0.0), self.max_ms or value)
+        return self.max_ms
+
+    @property
+    def mean_ms(self) -> float | None:
+        return self.total_ms / self.count if self.count else None
+
+    def display_counts(self) -> list[tuple[str, int]]:
+        """Counts per DISPLAY_BOUNDS_MS bucket, for text histograms."""
+        counts = [0] * (len(DISPLAY_BOUNDS_MS) + 1)
+        counts[0] += self.zero_count
+        for index, n in self.buckets.items():
+            value = self._bucket_mid(index)
+            slot = next(
+                (i for i, bound in enumerate(DISPLAY_BOUNDS_MS) if value <= bound),
+                len(DISPLAY_BOUNDS_MS),
+            )
+            counts[slot] += n
+        labels = [f"<={bound}ms" for bound in DISPLAY_BOUNDS_MS] + [f">{DISPLAY_BOUNDS_MS[-1]}ms"]
+        return list(zip(labels, counts))
+
+    def format_bars(self, width: int = 40) -> list[str]:
+        rows = [(label, n) for label, n in self.display_counts() if n]
+        peak = max((n for _, n in rows), default=0)
+        return [
+            f"{label:>10} {n:>7} {'#' * max(1, round(width * n / peak))}"
+            for label, n in rows
+        ]
+
+    def to_dict(self) -> dict[str, Any]:
+        def _round(value: float | None) -> float | None:
+            return None if value is None else round(value, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": _round(self.mean_ms),
+            "min_ms": _round(self.min_ms),
+            "max_ms": _round(self.max_ms),
+            "p50_ms": _round(self.percentile(50)),
+            "p95_ms": _round(self.percentile(95)),
+            "p99_ms": _round(self.percentile(99)),
+            "histogram": {label: n for label, n in self.display_counts() if n},
+        }
@@ -0,0 +1,186 @@
+"""
+openaddress_index.py
+
+Compact SQLite index of OpenAddresses points keyed by normalized
+(house number, street, ZIP / city), used as a first-tier local geocoder.
+
+Built by `openaddress/openaddress_build_index.py`; NominatimSearch consults
+`OpenAddressIndex.lookup()` before any HTTP search when an index is given.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Iterable
+
+from expand_abbreviations_in_road import expand_abbreviations_in_road
+
+BUILD_BATCH_ROWS = 50000
+
+_SCHEMA = """
+    CREATE TABLE addresses (
+        number TEXT NOT NULL,
+        street TEXT NOT NULL,
+        zip TEXT NOT NULL,
+        city TEXT NOT NULL,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL,
+        street_raw TEXT,
+        source_id TEXT,
+        UNIQUE (number, street, zip, city)
+    );
+"""
+
+# The UNIQUE constraint's index serves (number, street[, zip]) lookups,
+# including street prefix ranges; the second covers ZIP-less addresses.
+_INDEXES = [
+    "CREATE INDEX addresses_city ON addresses (number, street, city)",
+]
+
+
+def normalize_number(value: Any) -> str:
+    text = re.sub(r"\s+", "", str(value or "")).upper()
+    return text.lstrip("0") or text
+
+
+def normalize_street(value: Any) -> str:
+    return " ".join(expand_abbreviations_in_road(str(value or "")).casefold().split())
+
+
+def normalize_zip(value: Any) -> str:
+    match = re.search(r"\d{5}", str(value or ""))
+    return match.group(0) if match else ""
+
+
+def normalize_city(value: Any) -> str:
+    return " ".join(re.sub(r"[^A-Za-z0-9]+", " ", str(value or "")).casefold().split())
+
+
+def build_openaddress_index(records: Iterable[dict[str, Any]], index_path: str) -> int:
+    """
+    Write records (number, street, postcode, city, lat, lon[, id]) to a new index.
+
+    The file is built next to `index_path` and swapped in when complete.
+    Duplicate keys (e.g. several units at one address) keep the first point.
+    Returns the number of indexed addresses.
+    """
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(_SCHEMA)
+        batch: list[tuple[Any, ...]] = []
+        insert = "INSERT OR IGNORE INTO addresses VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        for record in records:
+            number = normalize_number(record.get("number"))
+            street = normalize_street(record.get("street"))
+            lat = record.get("lat")
+            lon = record.get("lon")
+            if not number or not street or lat is None or lon is None:
+                continue
+            try:
+                lat = float(lat)
+                lon = float(lon)
+            except (TypeError, ValueError):
+                continue
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            batch.append((
+                number,
+                street,
+                normalize_zip(record.get("postcode")),
+                normalize_city(record.get("city")),
+                lat,
+                lon,
+                str(record.get("street") or ""),
+                str(record.get("id") or ""),
+            ))
+            if len(batch) >= BUILD_BATCH_ROWS:
+                conn.executemany(insert, batch)
+                batch = []
+        if batch:
+            conn.executemany(insert, batch)
+        for statement in _INDEXES:
+            conn.execute(statement)
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+    return int(count)
+
+
+class OpenAddressIndex:
+    """Read-only lookups against an index built by `build_openaddress_index`."""
+
+    _COLUMNS = "number, street, zip, city, lat, lon, street_raw, source_id"
+
+    def __init__(self, index_path: str) -> None:
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"OpenAddresses index not found: {index_path}")
+        self.index_path = os.path.abspath(index_path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _query(self, where: str, params: tuple[Any, ...]) -> list[dict[str, Any]]:
+        sql = f"SELECT {self._COLUMNS} FROM addresses WHERE {where} LIMIT 20"
+        names = [c.strip() for c in self._COLUMNS.split(",")]
+        return [dict(zip(names, row)) for row in self._conn().execute(sql, params)]
+
+    def lookup(self, number: str, street: str, zip_code: str = "", city: str = "") -> dict[str, Any] | None:
+        """
+        Return the indexed point for an address, or None.
+
+        Exact street match is tried first (by ZIP, then city). Otherwise the
+        street is treated as a prefix ("main" -> "main street") and accepted
+        only when exactly one indexed street matches.
+        """
+        number = normalize_number(number)
+        street = normalize_street(street)
+        zip_code = normalize_zip(zip_code)
+        city = normalize_city(city)
+        if not number or not street or not (zip_code or city):
+            return None
+
+        scopes = []
+        if zip_code:
+            scopes.append(("zip", "zip = ?", zip_code))
+        if city:
+            scopes.append(("city", "city = ?", city))
+
+        for scope, clause, value in scopes:
+            rows = self._query(f"number = ? AND street = ? AND {clause}", (number, street, value))
+            if rows:
+                return {**rows[0], "match": f"exact_{scope}"}
+
+        prefix = f"{street} "
+        for scope, clause, value in scopes:
+            rows = self._query(
+                f"number = ? AND street >= ? AND street < ? AND {clause}",
+                (number, prefix, prefix + "\uffff", value),
+            )
+            if len({row["street"] for row in rows}) == 1:
+                return {**rows[0], "match": f"prefix_{scope}"}
+        return None
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
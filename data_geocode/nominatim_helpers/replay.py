@@ -0,0 +1,212 @@
+"""
+replay.py
+
+Record and replay NominatimSearch I/O so the geocoder can be benchmarked
+without the Nominatim container and Postgres.
+
+- RecordingTransport wraps the live /search and SQL calls and appends every
+  response to a JSONL fixture file.
+- ReplayHttpServer is a local stand-in for Nominatim's /search endpoint that
+  serves recorded responses.
+- ReplayDbShim answers SQL from the fixtures; HTTP still goes through
+  `base_url`, so point that at the stand-in server.
+
+Install a transport with `NominatimSearch.transport = ...`. Latency is either
+fixed per call or the recorded latency times a scale factor.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+
+def http_key(params: dict[str, Any]) -> str:
+    return json.dumps({str(k): str(v) for k, v in (params or {}).items()}, sort_keys=True)
+
+
+def sql_key(sql: str, params: Any) -> str:
+    return " ".join(sql.split()) + "\n" + json.dumps(params, sort_keys=True, default=str)
+
+
+class FixtureStore:
+    """Recorded responses keyed by request; later records win."""
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(path)
+        self.http: dict[str, dict[str, Any]] = {}
+        self.sql: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._handle = None
+
+    @classmethod
+    def load(cls, path: str) -> "FixtureStore":
+        store = cls(path)
+        with open(store.path, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                target = store.http if record.get("kind") == "http" else store.sql
+                target[record["key"]] = record
+        return store
+
+    def _append(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            target = self.http if record["kind"] == "http" else self.sql
+            target[record["key"]] = record
+            if self._handle is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._handle = open(self.path, "a", encoding="utf-8")
+            self._handle.write(json.dumps(record, default=str) + "\n")
+            self._handle.flush()
+
+    def add_http(self, params: dict[str, Any], data: Any, elapsed_ms: float) -> None:
+        self._append({
+            "kind": "http",
+            "key": http_key(params),
+            "elapsed_ms": round(elapsed_ms, 3),
+            "response": data,
+        })
+
+    def add_sql(
+        self, sql: str, params: Any, columns: list[str], rows: list[Any], elapsed_ms: float
+    ) -> None:
+        self._append({
+            "kind": "sql",
+            "key": sql_key(sql, params),
+            "elapsed_ms": round(elapsed_ms, 3),
+            "columns": list(columns),
+            "rows": [list(row) for row in rows],
+        })
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+def _replay_delay(record: dict[str, Any], latency_ms: float | None, latency_scale: float) -> None:
+    delay_ms = latency_ms if latency_ms is not None else float(record.get("elapsed_ms") or 0) * latency_scale
+    if delay_ms > 0:
+        time.sleep(delay_ms / 1000.0)
+
+
+class RecordingTransport:
+    """Pass calls through to the live services and record the responses."""
+
+    def __init__(self, store: FixtureStore) -> None:
+        self.store = store
+
+    def http_get(self, searcher, params: dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        data = searcher._live_http_get(params)
+        self.store.add_http(params, data, (time.perf_counter() - started) * 1000)
+        return data
+
+    def db_fetch(self, searcher, sql: str, params: Any = None):
+        started = time.perf_counter()
+        columns, rows = searcher._live_db_fetch(sql, params)
+        self.store.add_sql(sql, params, columns, rows, (time.perf_counter() - started) * 1000)
+        return columns, rows
+
+
+class ReplayDbShim:
+    """Answer geocoder SQL from fixtures; HTTP goes to the searcher's base_url."""
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        latency_ms: float | None = None,
+        latency_scale: float = 1.0,
+    ) -> None:
+        self.store = store
+        self.latency_ms = latency_ms
+        self.latency_scale = float(latency_scale)
+        self.stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def http_get(self, searcher, params: dict[str, Any]) -> Any:
+        return searcher._live_http_get(params)
+
+    def db_fetch(self, searcher, sql: str, params: Any = None):
+        record = self.store.sql.get(sql_key(sql, params))
+        with self._lock:
+            self.stats["hits" if record is not None else "misses"] += 1
+        if record is None:
+            raise LookupError("no recorded SQL result for this query")
+        _replay_delay(record, self.latency_ms, self.latency_scale)
+        return list(record["columns"]), [tuple(row) for row in record["rows"]]
+
+
+class ReplayHttpServer:
+    """Threaded local HTTP server replaying recorded /search responses."""
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float | None = None,
+        latency_scale: float = 1.0,
+    ) -> None:
+        self.store = store
+        self.latency_ms = latency_ms
+        self.latency_scale = float(latency_scale)
+        self.stats: Counter[str] = Counter()
+        self._stats_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+                record = server.store.http.get(http_key(params)) if parts.path == "/search" else None
+                with server._stats_lock:
+                    server.stats["hits" if record is not None else "misses"] += 1
+                if record is None:
+                    self._send(404, {"error": "no recorded response"})
+                    return
+                _replay_delay(record, server.latency_ms, server.latency_scale)
+                self._send(200, record["response"])
+
+            def _send(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def start(self) -> "ReplayHttpServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
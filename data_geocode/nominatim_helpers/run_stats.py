@@ -0,0 +1,175 @@
+"""
+run_stats.py
+
+Aggregate timing and cache statistics over the searches of one geocode run.
+
+Fed with finished NominatimSearch instances (or their search_metadata); keeps
+one LatencyHistogram per strategy plus whole-address, parse, DB, HTTP and
+queue-wait latency, a per-interval throughput timeline and cache hit
+counters, so memory does not grow with the number of addresses.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from nominatim_helpers.latency_histogram import LatencyHistogram
+
+THROUGHPUT_INTERVAL_S = 10.0
+
+# search_metadata timing fields recorded for addresses that were not cache hits.
+COMPONENT_FIELDS = {
+    "parse": "parse_elapsed_ms",
+    "db": "db_elapsed_ms",
+    "http": "http_elapsed_ms",
+}
+
+
+class GeocodeRunStats:
+    """Per-strategy latency histograms, throughput and cache hit rates."""
+
+    def __init__(self, throughput_interval_s: float = THROUGHPUT_INTERVAL_S) -> None:
+        self.started_at = time.perf_counter()
+        self.finished_at: float | None = None
+        self.address_ms = LatencyHistogram()
+        self.strategy_ms: dict[str, LatencyHistogram] = {}
+        self.component_ms = {name: LatencyHistogram() for name in COMPONENT_FIELDS}
+        self.queue_wait_ms = LatencyHistogram()
+        self.throughput_interval_s = float(throughput_interval_s)
+        self.completed_by_interval: Counter[int] = Counter()
+        self.counters: Counter[str] = Counter()
+        self.accepted_by_strategy: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _strategy(self, name: str) -> LatencyHistogram:
+        with self._lock:
+            hist = self.strategy_ms.get(name)
+            if hist is None:
+                hist = self.strategy_ms[name] = LatencyHistogram()
+            return hist
+
+    def record_search(self, search_metadata: dict[str, Any]) -> None:
+        """Count one finished address from its search_metadata."""
+        search_metadata = search_metadata or {}
+        cache_hit = bool(search_metadata.get("address_cache_used"))
+        tiger = search_metadata.get("tiger_extrapolate_snap") or {}
+        interval = int((time.perf_counter() - self.started_at) // self.throughput_interval_s)
+        with self._lock:
+            self.counters["addresses"] += 1
+            self.completed_by_interval[interval] += 1
+            self.counters["found"] += int(bool(search_metadata.get("search_successful")))
+            self.counters["address_cache_hits"] += int(cache_hit)
+            if isinstance(tiger, dict) and tiger.get("attempted"):
+                self.counters["tiger_lookups"] += 1
+                self.counters["tiger_cache_hits"] += int(bool(tiger.get("cached")))
+            accepted = search_metadata.get("search_method_accepted")
+            if accepted and accepted != "none":
+                self.accepted_by_strategy[str(accepted)] += 1
+        self.address_ms.record(search_metadata.get("elapsed_ms"))
+        if cache_hit:
+            return
+        for name, field in COMPONENT_FIELDS.items():
+            self.component_ms[name].record(search_metadata.get(field))
+        for attempt in search_metadata.get("search_attempts") or []:
+            if isinstance(attempt, dict) and attempt.get("attempted"):
+                self._strategy(str(attempt.get("search_name"))).record(attempt.get("elapsed_ms"))
+
+    def record_queue_wait(self, wait_ms: float) -> None:
+        """Time an address spent queued before a worker picked it up."""
+        self.queue_wait_ms.record(wait_ms)
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def wall_s(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def _ratio(self, hits: str, total: str) -> float | None:
+        return self.counters[hits] / self.counters[total] if self.counters[total] else None
+
+    def throughput_timeline(self) -> list[dict[str, Any]]:
+        """Completed addresses and addresses/second per interval since the start."""
+        with self._lock:
+            counts = dict(self.completed_by_interval)
+        if not counts:
+            return []
+        return [
+            {
+                "start_s": round(i * self.throughput_interval_s, 3),
+                "addresses": counts.get(i, 0),
+                "addresses_per_s": round(counts.get(i, 0) / self.throughput_interval_s, 3),
+            }
+            for i in range(max(counts) + 1)
+        ]
+
+    def to_dict(self) -> dict[str, Any]:
+        wall_s = self.wall_s
+        return {
+            "addresses": self.counters["addresses"],
+            "found": self.counters["found"],
+            "wall_s": round(wall_s, 3),
+            "addresses_per_s": round(self.counters["addresses"] / wall_s, 3) if wall_s else None,
+            "address_cache_hit_ratio": self._ratio("address_cache_hits", "addresses"),
+            "tiger_cache_hit_ratio": self._ratio("tiger_cache_hits", "tiger_lookups"),
+            "accepted_by_strategy": dict(self.accepted_by_strategy.most_common()),
+            "address_latency": self.address_ms.to_dict(),
+            "component_latency": {
+                name: hist.to_dict() for name, hist in self.component_ms.items()
+            },
+            "queue_wait": self.queue_wait_ms.to_dict(),
+            "strategy_latency": {
+                name: hist.to_dict() for name, hist in sorted(self.strategy_ms.items())
+            },
+            "throughput_interval_s": self.throughput_interval_s,
+            "throughput": self.throughput_timeline(),
+        }
+
+    def write_json(self, path: str, extra: dict[str, Any] | None = None) -> None:
+        """Write to_dict() (plus `extra` keys) as JSON, replacing the file atomically."""
+        data = {**(extra or {}), **self.to_dict()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+            handle.write("\n")
+        os.replace(tmp_path, path)
+
+    def summary_lines(self, histograms: bool = True) -> list[str]:
+        data = self.to_dict()
+
+        def _pct(value: float | None) -> str:
+            return "n/a" if value is None else f"{value:.1%}"
+
+        lines = [
+            f"addresses: {data['addresses']} (found {data['found']})",
+            f"wall time: {data['wall_s']:.2f}s, addresses/s: {data['addresses_per_s'] or 0:.2f}",
+            f"address cache hit ratio: {_pct(data['address_cache_hit_ratio'])}",
+            f"TIGER cache hit ratio: {_pct(data['tiger_cache_hit_ratio'])}",
+            "",
+            "latency (ms)              count     p50     p95     p99     max",
+        ]
+        rows = (
+            [("address_total", self.address_ms)]
+            + [(f"{name}_total", hist) for name, hist in self.component_ms.items()]
+            + [("queue_wait", self.queue_wait_ms)]
+            + sorted(self.strategy_ms.items())
+        )
+        for name, hist in rows:
+            stats = hist.to_dict()
+            if not stats["count"]:
+                continue
+            lines.append(
+                f"  {name:<22} {stats['count']:>6} {stats['p50_ms']:>7.1f} "
+                f"{stats['p95_ms']:>7.1f} {stats['p99_ms']:>7.1f} {stats['max_ms']:>7.1f}"
+            )
+        if histograms:
+            for name, hist in sorted(self.strategy_ms.items()):
+                lines.append("")
+                lines.append(f"{name}:")
+                lines.extend(f"  {bar}" for bar in hist.format_bars())
+        return lines
@@ -0,0 +1,166 @@
+"""
+shard_merge.py
+
+Sharding and merge helpers for multi-process geocode runs.
+
+Unique address keys are assigned to shards by a stable hash, so the same
+address always lands in the same shard whatever the input order or run.
+Each shard process writes its own output, not-found and cache segment files;
+`merge_shards` combines them deterministically and `verify_merge` checks the
+result against the input keys and the rewritten canonical cache.
+
+Conflict rule (a key reported by more than one shard, e.g. stale segment
+files): a row with coordinates beats one without; otherwise the lower shard
+number wins. Cache rows are appended in key order.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from nominatim_helpers.address_cache_index import CACHE_FIELDS, normalize_cache_key
+
+RESULT_FIELDS = ("osm_id", "display_name", "latitude", "longitude")
+
+
+def shard_for_key(key: str, shards: int) -> int:
+    """Stable shard number for a normalized address key."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+@dataclass(frozen=True)
+class ShardPaths:
+    shard_no: int
+    output: str
+    not_found: str
+    cache: str
+    stats: str
+    trace: str
+
+    def files(self) -> tuple[str, ...]:
+        return (self.output, self.not_found, self.cache, self.stats, self.trace)
+
+
+def shard_paths(shard_dir: str, shard_no: int, shards: int) -> ShardPaths:
+    tag = f"shard-{shard_no:02d}-of-{shards:02d}"
+    return ShardPaths(
+        shard_no=shard_no,
+        output=os.path.join(shard_dir, f"data_geocode.{tag}.csv"),
+        not_found=os.path.join(shard_dir, f"addresses_not_found.{tag}.csv"),
+        cache=os.path.join(shard_dir, f"geocode_address_cache.{tag}.csv"),
+        stats=os.path.join(shard_dir, f"geocode_run_stats.{tag}.json"),
+        trace=os.path.join(shard_dir, f"geocode_trace.{tag}.jsonl"),
+    )
+
+
+@dataclass
+class ShardMerge:
+    results: dict[str, dict[str, str]] = field(default_factory=dict)
+    result_shard: dict[str, int] = field(default_factory=dict)
+    not_found: dict[str, dict[str, str]] = field(default_factory=dict)
+    cache_rows: list[dict[str, str]] = field(default_factory=list)
+    conflicts: list[tuple[str, str, int, int]] = field(default_factory=list)
+    shard_rows: dict[int, int] = field(default_factory=dict)
+
+
+def _has_coordinates(row: dict[str, Any]) -> bool:
+    return bool(row.get("latitude") and row.get("longitude"))
+
+
+def _read_csv(path: str) -> list[dict[str, str]]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def _keep(
+    kind: str,
+    key: str,
+    kept: dict[str, tuple[int, dict[str, str]]],
+    shard_no: int,
+    row: dict[str, str],
+    conflicts: list[tuple[str, str, int, int]],
+) -> None:
+    current = kept.get(key)
+    if current is None:
+        kept[key] = (shard_no, row)
+        return
+    current_shard, current_row = current
+    if current_shard == shard_no:
+        kept[key] = (shard_no, row)
+        return
+    if _has_coordinates(row) and not _has_coordinates(current_row):
+        kept[key] = (shard_no, row)
+        conflicts.append((kind, key, shard_no, current_shard))
+    else:
+        conflicts.append((kind, key, current_shard, shard_no))
+
+
+def merge_shards(paths: list[ShardPaths], address_col: str) -> ShardMerge:
+    """Combine shard segment files in shard order (see module conflict rule)."""
+    merge = ShardMerge()
+    results: dict[str, tuple[int, dict[str, str]]] = {}
+    cache_rows: dict[str, tuple[int, dict[str, str]]] = {}
+    for shard in sorted(paths, key=lambda p: p.shard_no):
+        rows = _read_csv(shard.output)
+        merge.shard_rows[shard.shard_no] = len(rows)
+        for row in rows:
+            key = normalize_cache_key(row.get(address_col, ""))
+            if key:
+                result = {name: row.get(name, "") for name in RESULT_FIELDS}
+                _keep("result", key, results, shard.shard_no, result, merge.conflicts)
+        for row in _read_csv(shard.not_found):
+            key = normalize_cache_key(row.get("raw_address", ""))
+            if key:
+                merge.not_found.setdefault(key, row)
+        for row in _read_csv(shard.cache):
+            key = normalize_cache_key(row.get("address_raw", ""))
+            if key:
+                cache_row = {name: row.get(name, "") for name in CACHE_FIELDS}
+                _keep("cache", key, cache_rows, shard.shard_no, cache_row, merge.conflicts)
+    for key, (shard_no, row) in results.items():
+        merge.results[key] = row
+        merge.result_shard[key] = shard_no
+    merge.cache_rows = [cache_rows[key][1] for key in sorted(cache_rows)]
+    return merge
+
+
+def verify_merge(
+    merge: ShardMerge,
+    expected_keys: set[str],
+    shards: int,
+    cache_index: dict[str, Any],
+) -> tuple[bool, list[str]]:
+    """Check merged results cover the input and the cache holds every merged row."""
+    missing = sorted(expected_keys - merge.results.keys())
+    extra = sorted(merge.results.keys() - expected_keys)
+    misassigned = sorted(
+        key for key, shard_no in merge.result_shard.items() if shard_for_key(key, shards) != shard_no
+    )
+    cache_mismatch = []
+    for row in merge.cache_rows:
+        key = normalize_cache_key(row["address_raw"])
+        entry = cache_index.get(key)
+        if entry is None or (entry.get("latitude", ""), entry.get("longitude", "")) != (
+            row["latitude"].strip(), row["longitude"].strip()
+        ):
+            cache_mismatch.append(key)
+
+    checks = [
+        ("input keys without a shard result", missing),
+        ("shard results not in the input", extra),
+        ("results from a shard that does not own the key", misassigned),
+        ("merged cache rows missing or different in the cache", cache_mismatch),
+    ]
+    ok = not any(keys for _, keys in checks)
+    lines = [f"Verification: {'OK' if ok else 'FAILED'}"]
+    for label, keys in checks:
+        lines.append(f"  {label}: {len(keys)}")
+        lines.extend(f"    {key}" for key in keys[:20])
+    return ok, lines
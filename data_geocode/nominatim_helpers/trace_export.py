@@ -0,0 +1,130 @@
+"""
+trace_export.py
+
+Span-based trace export for NominatimSearch.
+
+NominatimSearch emits one span per address, parse step, strategy attempt,
+SQL statement and /search request when it is given a TraceWriter. Spans are
+queued and written to JSONL by a background thread, so the geocoding threads
+never wait on disk; if the queue is full, spans are dropped and counted.
+
+Each span is a JSON object:
+    {"trace_id", "kind", "name", "start", "end", "duration_ms",
+     "thread_id", "thread_name", "outcome", "attrs"}
+with `start`/`end` in epoch seconds. `to_chrome_trace` converts a span file
+to the Chrome trace event format (chrome://tracing, Perfetto).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+from typing import Any, Iterable, Iterator
+
+DEFAULT_MAX_QUEUE = 50000
+FLUSH_INTERVAL_S = 1.0
+
+_STOP = object()
+
+
+class TraceWriter:
+    """Write spans to a JSONL file from a background thread."""
+
+    def __init__(self, path: str, max_queue: int = DEFAULT_MAX_QUEUE) -> None:
+        self.path = os.path.abspath(path)
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._handle = open(self.path, "w", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, span: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL_S)
+            except queue.Empty:
+                self._handle.flush()
+                continue
+            if item is _STOP:
+                break
+            self._handle.write(json.dumps(item, default=str) + "\n")
+            self.written += 1
+        self._handle.flush()
+
+    def close(self) -> None:
+        """Drain queued spans and close the file."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._handle.close()
+
+
+def make_span(
+    trace_id: str,
+    kind: str,
+    name: str,
+    start: float,
+    end: float,
+    outcome: str,
+    attrs: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    thread = threading.current_thread()
+    return {
+        "trace_id": trace_id,
+        "kind": kind,
+        "name": name,
+        "start": round(start, 6),
+        "end": round(end, 6),
+        "duration_ms": round((end - start) * 1000, 3),
+        "thread_id": threading.get_ident(),
+        "thread_name": thread.name,
+        "outcome": outcome,
+        "attrs": attrs or {},
+    }
+
+
+def load_spans(path: str) -> Iterator[dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def to_chrome_trace(spans: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Chrome trace events ("X" complete events, one track per thread)."""
+    events: list[dict[str, Any]] = []
+    thread_names: dict[int, str] = {}
+    pid = os.getpid()
+    for span in spans:
+        tid = int(span.get("thread_id") or 0)
+        thread_names.setdefault(tid, str(span.get("thread_name") or tid))
+        events.append({
+            "name": span.get("name"),
+            "cat": span.get("kind"),
+            "ph": "X",
+            "ts": round(float(span["start"]) * 1e6, 1),
+            "dur": round(float(span.get("duration_ms") or 0) * 1000, 1),
+            "pid": pid,
+            "tid": tid,
+            "args": {
+                "trace_id": span.get("trace_id"),
+                "outcome": span.get("outcome"),
+                **(span.get("attrs") or {}),
+            },
+        })
+    for tid, name in thread_names.items():
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
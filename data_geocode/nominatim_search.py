@@ -6,6 +6,7 @@ Nominatim queries, and stores results plus debug logs on the instance.
 from __future__ import annotations
 
 import csv
+import itertools
 import json
 import os
 import re
@@ -68,6 +69,10 @@ from postal.parser import parse_address
 from nominatim_helpers.zip_reapir import repair_zip_ri_ma
 from nominatim_helpers.rapidfuzz_scorer import smart_score
 from nominatim_helpers.nominatim_result_check import nominatim_result_check, SimpleCfg
+from nominatim_helpers.address_cache_index import AddressCacheEntry, AddressCacheIndex
+from nominatim_helpers.db_indexes import detect_fallback_indexes, highway_radius_predicate
+from nominatim_helpers.db_pool import get_db_pool
+from nominatim_helpers.trace_export import make_span
 from expand_abbreviations_in_road import expand_abbreviations_in_road
 from uszipcode import SearchEngine
 
@@ -75,7 +80,98 @@ from uszipcode import SearchEngine
 class NominatimSearch:
     _lookup_lock = threading.RLock()
     _bad_address_lookup_map: dict[str, str] | None = None
-    _address_cache_maps: dict[str, dict[str, dict[str, str]]] = {}
+    _address_cache_maps: dict[str, AddressCacheIndex] = {}
+
+    # Optional I/O transport (nominatim_helpers/replay.py) that records or
+    # replays /search responses and SQL results; None talks to live services.
+    transport: Any | None = None
+    # Per-process search counter for trace ids.
+    _trace_ids = itertools.count(1)
+
+    # DB fallback results shared across instances. Filled by single lookups and
+    # by the batch APIs: postcode -> road names, (postcode, street) -> TIGER rows.
+    _db_result_lock = threading.RLock()
+    _postcode_candidates_cache: dict[str, list[str]] = {}
+    _tiger_rows_cache: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    # postcode -> every TIGER segment in it, filled by the ZIP prefetch stage.
+    # Street lookups for a prefetched postcode are answered from here.
+    _tiger_zip_rows_cache: dict[str, list[dict[str, Any]]] = {}
+
+    # State-disambiguation lookups (no state and no ZIP in the address), keyed
+    # by (street, city) without the house number: (result count, [(state,
+    # display_name)]). Filled per address or in bulk by fetch_reverse_states_batch.
+    _reverse_state_lock = threading.RLock()
+    _reverse_state_cache: dict[tuple[str, str], tuple[int, list[tuple[str, str]]]] = {}
+
+    _TIGER_ROW_COLUMNS_SQL = """
+              t.place_id,
+              t.parent_place_id,
+              t.postcode,
+              t.startnumber::text AS startnumber_text,
+              t.endnumber::text   AS endnumber_text,
+              t.step::text        AS step_text,
+              p.name::text AS road_name_text,
+              p.class AS road_class,
+              p.type  AS road_type,
+              ST_X(ST_StartPoint(t.linegeo::geometry)) AS start_lon,
+              ST_Y(ST_StartPoint(t.linegeo::geometry)) AS start_lat,
+              ST_X(ST_EndPoint(t.linegeo::geometry))   AS end_lon,
+              ST_Y(ST_EndPoint(t.linegeo::geometry))   AS end_lat"""
+
+    _TIGER_ROWS_SQL = f"""
+            SELECT{_TIGER_ROW_COLUMNS_SQL}
+            FROM location_property_tiger t
+            JOIN placex p ON p.place_id = t.parent_place_id
+            WHERE t.postcode = %s
+              AND p.name::text ILIKE '%%' || %s || '%%'
+            ORDER BY
+              p.name::text,
+              LEAST(t.startnumber, t.endnumber),
+              GREATEST(t.startnumber, t.endnumber);
+        """
+
+    _TIGER_ZIP_ROWS_BATCH_SQL = f"""
+            SELECT{_TIGER_ROW_COLUMNS_SQL}
+            FROM location_property_tiger t
+            JOIN placex p ON p.place_id = t.parent_place_id
+            WHERE t.postcode = ANY(%s::text[])
+            ORDER BY
+              t.postcode,
+              p.name::text,
+              LEAST(t.startnumber, t.endnumber),
+              GREATEST(t.startnumber, t.endnumber);
+        """
+
+    _TIGER_ROWS_BATCH_SQL = f"""
+            SELECT q.ord,{_TIGER_ROW_COLUMNS_SQL}
+            FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS q(postcode, street_like, ord)
+            JOIN location_property_tiger t ON t.postcode = q.postcode
+            JOIN placex p ON p.place_id = t.parent_place_id
+            WHERE p.name::text ILIKE '%%' || q.street_like || '%%'
+            ORDER BY
+              q.ord,
+              p.name::text,
+              LEAST(t.startnumber, t.endnumber),
+              GREATEST(t.startnumber, t.endnumber);
+        """
+
+    # Schema-dependent postcode SQL, built once per (database, radius). Keeping
+    # the text stable lets psycopg reuse the server-side prepared statement.
+    _db_statements_lock = threading.Lock()
+    _db_statements_cache: dict[tuple[str, int], dict[str, str]] = {}
+
+    # HTTP strategies that may be reordered: search_name -> (query spec, required tags).
+    HTTP_STRATEGY_ORDER = ("address_reapaired", "etags_nsz", "etags_nscs")
+    HTTP_STRATEGY_SPECS: dict[str, tuple[list[str], list[str]]] = {
+        "etags_nsz": (
+            ["AddressNumber", "StreetName", "ZipCode"],
+            ["StreetName", "ZipCode"],
+        ),
+        "etags_nscs": (
+            ["AddressNumber", "StreetName", "PlaceName", "StateName"],
+            ["StreetName", "PlaceName", "StateName"],
+        ),
+    }
 
     def __init__(
         self,
@@ -94,11 +190,17 @@ class NominatimSearch:
         db_radius_m: int | None = None,
         db_connect_timeout: int | None = None,
         db_statement_timeout_ms: int | None = None,
+        db_pool_size: int | None = None,
         use_address_cache: bool = True,
         save_address_cache: bool = True,
         address_cache_path: str | None = None,
-        address_cache_data: dict[str, dict[str, str]] | None = None,
+        address_cache_data: dict[str, dict[str, str] | AddressCacheEntry] | None = None,
         address_cache_lock: threading.RLock | None = None,
+        strategy_planner: Any | None = None,
+        defer_tiger: bool = False,
+        defer_reverse_state: bool = False,
+        openaddress_index: Any | None = None,
+        trace_writer: Any | None = None,
     ) -> None:
         
         self.parser_backend = parser_backend
@@ -113,7 +215,8 @@ class NominatimSearch:
         # db_statement_timeout_ms:
         # This runs SET statement_timeout = ... in Postgres
         # The server cancels any SQL statement that runs too long.
-        # It applies to statements on that connection in _postcode_candidates.
+        # It is set once per pooled connection (nominatim_helpers/db_pool.py) and
+        # applies to every postcode and TIGER fallback statement.
 
         # timeout:
         # This is the HTTP timeout for requests.get(...) to Nominatim’s /search endpoint.
@@ -134,10 +237,27 @@ class NominatimSearch:
         self.db_statement_timeout_ms = (
             int(db_statement_timeout_ms) if db_statement_timeout_ms is not None else 8000
         )
+        # Connections are pooled per process and shared by all instances.
+        self.db_pool_size = int(db_pool_size or os.getenv("NOM_DB_POOL_SIZE", "8"))
         self.use_address_cache = bool(use_address_cache)
         self.save_address_cache = bool(save_address_cache)
         self.address_cache_data = address_cache_data
         self.address_cache_lock = address_cache_lock
+        # Optional SearchStrategyPlanner (search_strategy_planner.py).
+        self.strategy_planner = strategy_planner
+        # When True, search() stops before an uncached TIGER query and sets
+        # pending_tiger so callers can batch it (fetch_tiger_rows_batch).
+        self.defer_tiger = bool(defer_tiger)
+        # When True, search() stops after parsing if the address needs an
+        # uncached state lookup and sets pending_reverse_state so callers can
+        # batch it (fetch_reverse_states_batch).
+        self.defer_reverse_state = bool(defer_reverse_state)
+        # Optional OpenAddressIndex (nominatim_helpers/openaddress_index.py),
+        # consulted before any HTTP search.
+        self.openaddress_index = openaddress_index
+        # Optional TraceWriter (nominatim_helpers/trace_export.py); receives
+        # address, parse, strategy, SQL and HTTP spans.
+        self.trace_writer = trace_writer
         if address_cache_path:
             self.address_cache_path = os.path.abspath(address_cache_path)
         else:
@@ -166,10 +286,35 @@ class NominatimSearch:
         self.tag_metadata: Dict[str, Any] = {}
         self.search_metadata: Dict[str, Any] = {}
         self.process_metadata: Dict[str, Any] = {}
+        self.pending_tiger: Dict[str, Any] | None = None
+        self.pending_reverse_state: tuple[str, str] | None = None
+        self._deferred_elapsed_s: float = 0.0
+        # Time spent waiting on Postgres / Nominatim HTTP for this address.
+        self._db_elapsed_s: float = 0.0
+        self._db_queries: int = 0
+        self._http_elapsed_s: float = 0.0
+        self._http_requests: int = 0
+        self.trace_id: str = ""
 
     def _log(self, message: str) -> None:
         self.log.append(message)
 
+    def _trace(
+        self,
+        kind: str,
+        name: str,
+        elapsed_s: float,
+        outcome: str,
+        attrs: Dict[str, Any] | None = None,
+    ) -> None:
+        """Emit a span that ended now and lasted elapsed_s, if tracing is on."""
+        if self.trace_writer is None:
+            return
+        end = time.time()
+        self.trace_writer.emit(
+            make_span(self.trace_id, kind, name, end - elapsed_s, end, outcome, attrs)
+        )
+
     def _refresh_process_metadata(self) -> None:
         combined: Dict[str, Any] = {}
         combined.update(self.tag_metadata)
@@ -267,26 +412,13 @@ class NominatimSearch:
             return lookup
 
     @classmethod
-    def _load_address_cache_map(cls, cache_path: str) -> dict[str, dict[str, str]]:
+    def _load_address_cache_map(cls, cache_path: str) -> AddressCacheIndex:
         with cls._lookup_lock:
             if cache_path in cls._address_cache_maps:
                 return cls._address_cache_maps[cache_path]
 
-            lookup: dict[str, dict[str, str]] = {}
-            if os.path.exists(cache_path):
-                with open(cache_path, newline="", encoding="utf-8") as handle:
-                    reader = csv.DictReader(handle)
-                    for row in reader:
-                        row_clean = {
-                            str(k): (v.strip() if isinstance(v, str) else "")
-                            for k, v in row.items()
-                            if k is not None
-                        }
-                        raw = row_clean.get("address_raw", "")
-                        if not raw:
-                            continue
-                        lookup[cls._normalize_cache_key(raw)] = row_clean
-
+            # Slim offset index: metadata JSON is read from disk only on a hit.
+            lookup = AddressCacheIndex.load(cache_path)
             cls._address_cache_maps[cache_path] = lookup
             return lookup
 
@@ -294,7 +426,9 @@ class NominatimSearch:
         lookup = self._load_bad_address_lookup_map()
         return lookup.get(self._normalize_cache_key(raw_address))
 
-    def _lookup_address_cache(self, raw_address: str) -> dict[str, str] | None:
+    def _lookup_address_cache(
+        self, raw_address: str
+    ) -> dict[str, str] | AddressCacheEntry | None:
         if self.address_cache_data is not None:
             key = self._normalize_cache_key(raw_address)
             if self.address_cache_lock is not None:
@@ -335,32 +469,9 @@ class NominatimSearch:
                 self.address_cache_data[key] = row
             return
 
-        fieldnames = [
-            "address_raw",
-            "address_geocode",
-            "address_nominatim",
-            "latitude",
-            "longitude",
-            "method",
-            "error",
-            "result_metadata",
-            "tag_metadata",
-            "search_metadata",
-            "process_metadata",
-        ]
-
-        with self._lookup_lock:
-            cache_map = self._load_address_cache_map(self.address_cache_path)
-            cache_map[self._normalize_cache_key(self.raw_address)] = row
-
-            cache_dir = os.path.dirname(self.address_cache_path)
-            if cache_dir:
-                os.makedirs(cache_dir, exist_ok=True)
-            with open(self.address_cache_path, "w", newline="", encoding="utf-8") as handle:
-                writer = csv.DictWriter(handle, fieldnames=fieldnames)
-                writer.writeheader()
-                for cache_row in cache_map.values():
-                    writer.writerow({k: cache_row.get(k, "") for k in fieldnames})
+        # Append-only: a later row for the same key wins when the index is reloaded.
+        cache_map = self._load_address_cache_map(self.address_cache_path)
+        cache_map.append(row)
 
     def _append_search_detail(self, search_detail: Dict[str, Any]) -> None:
         self.search_metadata.setdefault("search_details", []).append(search_detail)
@@ -382,6 +493,14 @@ class NominatimSearch:
         }
         self.search_metadata.setdefault("search_attempts", []).append(search_attempt)
         self._refresh_process_metadata()
+        if search_attempt["attempted"]:
+            self._trace(
+                "strategy",
+                str(search_attempt["search_name"]),
+                (search_attempt["elapsed_ms"] or 0) / 1000.0,
+                str(search_attempt["result_status"] or "unknown"),
+                {"query": search_attempt["query"], "number_results": search_attempt["number_results"]},
+            )
 
     def _build_skipped_search_detail(
         self,
@@ -410,7 +529,10 @@ class NominatimSearch:
             "results": [],
         }
 
-    def _apply_cached_result(self, cached_row: dict[str, str]) -> None:
+    def _apply_cached_result(self, cached_row: dict[str, str] | AddressCacheEntry) -> None:
+        if isinstance(cached_row, AddressCacheEntry):
+            cached_row = cached_row.load_row()
+
         def _parse_dict(value: str) -> Dict[str, Any]:
             if not value:
                 return {}
@@ -524,7 +646,7 @@ class NominatimSearch:
             f"method={self.method!r} lat={self.latitude!r} lon={self.longitude!r}"
         )
 
-    def _parse_address(self, raw_address: str) -> None:
+    def _parse_address(self, raw_address: str, reverse_for_state: bool = True) -> None:
         self.tag_metadata["fix_zip_repair"] = False
         self.tag_metadata["fix_state_abbreviation"] = False
         self.tag_metadata["fix_town_directional"] = False
@@ -680,7 +802,8 @@ class NominatimSearch:
         self.tag_metadata["fix_expand_address_abbreviations_count"] = count
 
         # Try to infer only StateName when both StateName and ZipCode are missing.
-        self._reverse_for_state()
+        if reverse_for_state:
+            self._reverse_for_state()
 
     def expand_address_abbreviations(self, address_tags):
         # Standardize common abbreviations dictionary
@@ -756,13 +879,12 @@ class NominatimSearch:
 
         return query_parts
 
-    def _reverse_for_state(self) -> None:
-        self.tag_metadata["reverse_for_state_searched"] = False
-        self.tag_metadata["reverse_for_state_included"] = False
-        self.tag_metadata["reverse_for_state_number_results"] = 0
-        self.tag_metadata["reverse_for_state_all_results_match"] = None
-        self.tag_metadata["revers_for_state_display_name"] = None
+    @staticmethod
+    def _reverse_state_key(street_value: str, city_value: str) -> tuple[str, str]:
+        return (" ".join(street_value.casefold().split()), " ".join(city_value.casefold().split()))
 
+    def _reverse_state_lookup(self) -> tuple[str, str] | None:
+        """(street, city) for a state lookup, or None when it is not needed or possible."""
         state_value = (self.address_tags_expanded.get("StateName") or "").strip()
         zip_value = (self.address_tags_expanded.get("ZipCode") or "").strip()
         if state_value or zip_value:
@@ -770,7 +892,7 @@ class NominatimSearch:
                 "reverse_for_state skipped: "
                 f"state_present={bool(state_value)}, zip_present={bool(zip_value)}"
             )
-            return
+            return None
 
         house_number = (self.address_tags_expanded.get("AddressNumber") or "").strip()
         street_value = self._build_street_value()
@@ -781,9 +903,14 @@ class NominatimSearch:
                 f"AddressNumber={bool(house_number)}, StreetName={bool(street_value)}, "
                 f"PlaceName={bool(city_value)}"
             )
-            return
+            return None
+        return street_value, city_value
 
-        query_text = ", ".join([house_number, street_value, city_value])
+    def _fetch_reverse_states(
+        self, street_value: str, city_value: str
+    ) -> tuple[int, list[tuple[str, str]]] | None:
+        """Run one state lookup for (street, city) and cache it; None on request errors."""
+        query_text = ", ".join([street_value, city_value])
         params = {
             "q": query_text,
             "format": "json",
@@ -791,35 +918,78 @@ class NominatimSearch:
             "limit": 10,
             "countrycodes": "us",
         }
-        self.tag_metadata["reverse_for_state_searched"] = True
         self._log(f"reverse_for_state query={query_text!r}")
-
         try:
-            resp = requests.get(
-                self.base_url,
-                params=params,
-                timeout=self.timeout,
-                headers={"User-Agent": self.user_agent},
-            )
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._http_get(params)
         except requests_exceptions.Timeout:
             self._log("reverse_for_state timeout.")
-            return
+            return None
         except requests_exceptions.RequestException as exc:
             self._log(f"reverse_for_state request error: {exc}")
-            return
+            return None
 
         if not isinstance(data, list):
             data = []
-        self.tag_metadata["reverse_for_state_number_results"] = len(data)
-
         state_results: list[tuple[str, str]] = []
         for res in data:
             address = res.get("address") or {}
             state_name = (address.get("state") or "").strip()
             if state_name:
                 state_results.append((state_name, (res.get("display_name") or "").strip()))
+        result = (len(data), state_results)
+        with self._reverse_state_lock:
+            self._reverse_state_cache[self._reverse_state_key(street_value, city_value)] = result
+        return result
+
+    @classmethod
+    def _reverse_state_cached(cls, street_value: str, city_value: str) -> bool:
+        with cls._reverse_state_lock:
+            return cls._reverse_state_key(street_value, city_value) in cls._reverse_state_cache
+
+    def fetch_reverse_states_batch(self, lookups: list[tuple[str, str]]) -> int:
+        """
+        Resolve (street, city) state lookups not cached yet into the shared cache.
+
+        Nominatim has no multi-query endpoint, so lookups run one by one here.
+        Callers parallelize across chunks with one searcher per chunk (the
+        per-address log and timing counters are not thread-safe). Returns the
+        number fetched.
+        """
+        fetched = 0
+        seen: set[tuple[str, str]] = set()
+        for street_value, city_value in lookups:
+            key = self._reverse_state_key(street_value, city_value)
+            if key in seen or self._reverse_state_cached(street_value, city_value):
+                continue
+            seen.add(key)
+            if self._fetch_reverse_states(street_value, city_value) is not None:
+                fetched += 1
+        return fetched
+
+    def _reverse_for_state(self) -> None:
+        self.tag_metadata["reverse_for_state_searched"] = False
+        self.tag_metadata["reverse_for_state_included"] = False
+        self.tag_metadata["reverse_for_state_number_results"] = 0
+        self.tag_metadata["reverse_for_state_all_results_match"] = None
+        self.tag_metadata["revers_for_state_display_name"] = None
+
+        lookup = self._reverse_state_lookup()
+        if lookup is None:
+            return
+        street_value, city_value = lookup
+        self.tag_metadata["reverse_for_state_searched"] = True
+
+        with self._reverse_state_lock:
+            cached = self._reverse_state_cache.get(self._reverse_state_key(street_value, city_value))
+        self.tag_metadata["reverse_for_state_cached"] = cached is not None
+        if cached is None:
+            cached = self._fetch_reverse_states(street_value, city_value)
+            if cached is None:
+                return
+        else:
+            self._log(f"reverse_for_state cache hit for {street_value!r}, {city_value!r}")
+        number_results, state_results = cached
+        self.tag_metadata["reverse_for_state_number_results"] = number_results
 
         if not state_results:
             self.tag_metadata["reverse_for_state_all_results_match"] = None
@@ -893,14 +1063,7 @@ class NominatimSearch:
             "limit": 10,
         }
         try:
-            resp = requests.get(
-                self.base_url,
-                params=params,
-                timeout=self.timeout,
-                headers={"User-Agent": self.user_agent},
-            )
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._http_get(params)
             self.response = data
             returned_count = len(data) if data else 0
             self.search_metadata["nominatim_results_returned_total"] = (
@@ -1081,7 +1244,7 @@ class NominatimSearch:
         finally:
             search_detail["elapsed_ms"] = int((time.perf_counter() - started_at) * 1000)
 
-    def _find_postcode_geom_column(self, conn) -> str:
+    def _find_postcode_geom_column(self) -> str:
         sql = """
             SELECT column_name
             FROM information_schema.columns
@@ -1090,16 +1253,14 @@ class NominatimSearch:
             ORDER BY CASE column_name WHEN 'centroid' THEN 1 ELSE 2 END
             LIMIT 1;
         """
-        with conn.cursor() as cur:
-            cur.execute(sql)
-            row = cur.fetchone()
-            if not row:
-                raise RuntimeError(
-                    "location_postcode has neither centroid nor geometry column."
-                )
-            return row[0]
+        _, rows = self._db_fetch(sql)
+        if not rows:
+            raise RuntimeError(
+                "location_postcode has neither centroid nor geometry column."
+            )
+        return rows[0][0]
 
-    def _find_column_operator(self, conn, table: str, column: str) -> tuple[str, str]:
+    def _find_column_operator(self, table: str, column: str) -> tuple[str, str]:
         """
         Return the correct operator and cast for a column that may be hstore or json.
         - hstore: use '->' and cast to ::text
@@ -1112,116 +1273,297 @@ class NominatimSearch:
               AND column_name=%s
             LIMIT 1;
         """
-        with conn.cursor() as cur:
-            cur.execute(sql, (table, column))
-            row = cur.fetchone()
-            if not row:
-                return "->>", ""
-            data_type, udt_name = row[0], row[1]
-            if udt_name == "hstore":
-                return "->", "::text"
-            if data_type in ("json", "jsonb"):
-                return "->>", ""
+        _, rows = self._db_fetch(sql, (table, column))
+        if not rows:
+            return "->>", ""
+        data_type, udt_name = rows[0][0], rows[0][1]
+        if udt_name == "hstore":
+            return "->", "::text"
+        if data_type in ("json", "jsonb"):
+            return "->>", ""
         return "->>", ""
 
-    def _postcode_candidates(self, postcode: str) -> list[str]:
-        if not postcode:
-            return []
-        if psycopg is None:
-            self._log("psycopg is not available; skipping postcode DB lookup.")
-            self._postcode_lookup_error = "db_unavailable"
-            return []
-
-        dsn = (
-            f"host={self.db_host} port={self.db_port} dbname={self.db_name} "
-            f"user={self.db_user} password={self.db_pass}"
+    def _fallback_indexes(self) -> frozenset[str]:
+        """Supporting indexes created by nominatim_db_indexes.py, detected once per DB."""
+        try:
+            return detect_fallback_indexes(
+                lambda sql, params: self._db_fetch(sql, params)[1], cache_key=self._db_key()
+            )
+        except Exception as exc:
+            self._log(f"Fallback index detection failed: {exc}")
+            return frozenset()
+
+    def _db_key(self) -> str:
+        return f"{self.db_host}:{self.db_port}/{self.db_name}"
+
+    def _db_connection(self):
+        """Borrow a pooled connection (statement timeout already applied)."""
+        pool = get_db_pool(
+            self._db_dsn(),
+            connect_timeout=self.db_connect_timeout,
+            statement_timeout_ms=self.db_statement_timeout_ms,
+            max_size=self.db_pool_size,
         )
+        return pool.connection()
+
+    def _db_available(self) -> bool:
+        return self.transport is not None or psycopg is not None
+
+    def _db_fetch(
+        self, sql: str, params: Any = None, prepare: bool = False
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        """
+        Run one statement and return (column names, rows); all geocoder SQL goes through here.
+
+        `prepare=True` is for the hot per-address queries only; one-off
+        introspection would just fill the server's prepared-statement cache.
+        """
+        started_at = time.perf_counter()
+        outcome = "ok"
+        rows: list[tuple[Any, ...]] = []
+        try:
+            if self.transport is not None:
+                col_names, rows = self.transport.db_fetch(self, sql, params)
+            else:
+                col_names, rows = self._live_db_fetch(sql, params, prepare=prepare)
+            return col_names, rows
+        except Exception as exc:
+            outcome = type(exc).__name__
+            raise
+        finally:
+            elapsed_s = time.perf_counter() - started_at
+            self._db_elapsed_s += elapsed_s
+            self._db_queries += 1
+            if self.trace_writer is not None:
+                self._trace(
+                    "db",
+                    " ".join(sql.split())[:80],
+                    elapsed_s,
+                    outcome,
+                    {"rows": len(rows), "params": str(params)[:200]},
+                )
+
+    def _live_db_fetch(
+        self, sql: str, params: Any = None, prepare: bool = False
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        with self._db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params, prepare=prepare)
+                rows = cur.fetchall()
+                col_names = [desc.name for desc in cur.description or []]
+        return col_names, rows
+
+    def _http_get(self, params: Dict[str, Any]) -> Any:
+        """GET the /search endpoint and return the decoded JSON body."""
+        started_at = time.perf_counter()
+        outcome = "ok"
         try:
-            with psycopg.connect(dsn, connect_timeout=self.db_connect_timeout) as conn:
-                with conn.cursor() as cur:
-                    timeout_ms = int(self.db_statement_timeout_ms)
-                    cur.execute(f"SET statement_timeout = {timeout_ms};")
-                geom_col = self._find_postcode_geom_column(conn)
-                addr_op, addr_cast = self._find_column_operator(conn, "placex", "address")
-                name_op, name_cast = self._find_column_operator(conn, "placex", "name")
-                tiger_sql = f"""
+            if self.transport is not None:
+                return self.transport.http_get(self, params)
+            return self._live_http_get(params)
+        except Exception as exc:
+            outcome = type(exc).__name__
+            raise
+        finally:
+            elapsed_s = time.perf_counter() - started_at
+            self._http_elapsed_s += elapsed_s
+            self._http_requests += 1
+            self._trace("http", "search", elapsed_s, outcome, {"params": params})
+
+    def _live_http_get(self, params: Dict[str, Any]) -> Any:
+        resp = requests.get(
+            self.base_url,
+            params=params,
+            timeout=self.timeout,
+            headers={"User-Agent": self.user_agent},
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def _db_statements(self) -> dict[str, str]:
+        """Postcode-candidate SQL for this database, detected and formatted once."""
+        cache_key = (self._db_key(), self.db_radius_m)
+        with self._db_statements_lock:
+            cached = self._db_statements_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        geom_col = self._find_postcode_geom_column()
+        addr_op, addr_cast = self._find_column_operator("placex", "address")
+        name_op, name_cast = self._find_column_operator("placex", "name")
+        radius_pred = highway_radius_predicate(self._fallback_indexes(), self.db_radius_m)
+        road_name_coalesce = f"""
+                          COALESCE(
+                            p.name{name_op}'name'{name_cast},
+                            p.name{name_op}'name:en'{name_cast},
+                            p.name{name_op}'alt_name'{name_cast},
+                            p.name{name_op}'official_name'{name_cast},
+                            p.address{addr_op}'road'{addr_cast},
+                            p.address{addr_op}'pedestrian'{addr_cast},
+                            p.address{addr_op}'footway'{addr_cast},
+                            p.address{addr_op}'path'{addr_cast}
+                          )"""
+        statements = {
+            "postcode_tiger": f"""
                 WITH roads AS (
                   SELECT DISTINCT NULLIF(BTRIM(p.name{name_op}'name'{name_cast}), '') AS road_name
                   FROM location_property_tiger t
                   JOIN placex p ON p.place_id = t.parent_place_id
-                  WHERE t.postcode = %s
+                  WHERE t.postcode = %(postcode)s
                   UNION
                   SELECT DISTINCT NULLIF(BTRIM(p.name{name_op}'name:en'{name_cast}), '') AS road_name
                   FROM location_property_tiger t
                   JOIN placex p ON p.place_id = t.parent_place_id
-                  WHERE t.postcode = %s
+                  WHERE t.postcode = %(postcode)s
                   UNION
                   SELECT DISTINCT NULLIF(BTRIM(p.name{name_op}'alt_name'{name_cast}), '') AS road_name
                   FROM location_property_tiger t
                   JOIN placex p ON p.place_id = t.parent_place_id
-                  WHERE t.postcode = %s
+                  WHERE t.postcode = %(postcode)s
                   UNION
                   SELECT DISTINCT NULLIF(BTRIM(p.name{name_op}'official_name'{name_cast}), '') AS road_name
                   FROM location_property_tiger t
                   JOIN placex p ON p.place_id = t.parent_place_id
-                  WHERE t.postcode = %s
+                  WHERE t.postcode = %(postcode)s
                   UNION
                   SELECT DISTINCT NULLIF(BTRIM(p.address{addr_op}'road'{addr_cast}), '') AS road_name
                   FROM location_property_tiger t
                   JOIN placex p ON p.place_id = t.parent_place_id
-                  WHERE t.postcode = %s
+                  WHERE t.postcode = %(postcode)s
                 )
                 SELECT road_name
                 FROM roads
                 WHERE road_name IS NOT NULL
                 ORDER BY road_name;
-                """
-                with conn.cursor() as cur:
-                    cur.execute(tiger_sql, (postcode, postcode, postcode, postcode, postcode))
-                    rows = cur.fetchall()
+            """,
+            "postcode_geometry": f"""
+                WITH z AS (
+                  SELECT {geom_col}::geometry AS g
+                  FROM location_postcode
+                  WHERE country_code = %s AND postcode = %s
+                  LIMIT 1
+                ),
+                roads AS (
+                  SELECT DISTINCT
+                    NULLIF(BTRIM({road_name_coalesce}), '') AS road_name
+                  FROM placex p, z
+                  WHERE p.class = 'highway'
+                    AND p.geometry IS NOT NULL
+                    AND {radius_pred}
+                )
+                SELECT road_name
+                FROM roads
+                WHERE road_name IS NOT NULL
+                ORDER BY road_name;
+            """,
+            "postcode_tiger_batch": f"""
+                SELECT DISTINCT z.postcode, NULLIF(BTRIM(v.road_name), '') AS road_name
+                FROM unnest(%s::text[]) AS z(postcode)
+                JOIN location_property_tiger t ON t.postcode = z.postcode
+                JOIN placex p ON p.place_id = t.parent_place_id
+                CROSS JOIN LATERAL (VALUES
+                  (p.name{name_op}'name'{name_cast}),
+                  (p.name{name_op}'name:en'{name_cast}),
+                  (p.name{name_op}'alt_name'{name_cast}),
+                  (p.name{name_op}'official_name'{name_cast}),
+                  (p.address{addr_op}'road'{addr_cast})
+                ) AS v(road_name);
+            """,
+            "postcode_geometry_batch": f"""
+                WITH z AS (
+                  SELECT DISTINCT ON (postcode) postcode, {geom_col}::geometry AS g
+                  FROM location_postcode
+                  WHERE country_code = %s AND postcode = ANY(%s::text[])
+                  ORDER BY postcode
+                )
+                SELECT DISTINCT
+                  z.postcode,
+                  NULLIF(BTRIM({road_name_coalesce}), '') AS road_name
+                FROM z
+                JOIN placex p
+                  ON p.class = 'highway'
+                 AND p.geometry IS NOT NULL
+                 AND {radius_pred};
+            """,
+        }
+        with self._db_statements_lock:
+            self._db_statements_cache[cache_key] = statements
+        return statements
+
+    def _db_dsn(self) -> str:
+        return (
+            f"host={self.db_host} port={self.db_port} dbname={self.db_name} "
+            f"user={self.db_user} password={self.db_pass}"
+        )
+
+    @staticmethod
+    def _tiger_cache_key(zip_code: str, street_like: str) -> tuple[str, str]:
+        return (str(zip_code or "").strip(), str(street_like or "").strip().casefold())
+
+    @staticmethod
+    def _ilike_regex(pattern: str) -> re.Pattern[str]:
+        """Compile `'%' || pattern || '%'` ILIKE semantics (% and _ wildcards)."""
+        parts = []
+        for char in pattern:
+            if char == "%":
+                parts.append(".*")
+            elif char == "_":
+                parts.append(".")
+            else:
+                parts.append(re.escape(char))
+        return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+    def _cached_tiger_rows(self, zip_code: str, street_like: str) -> list[dict[str, Any]] | None:
+        """
+        TIGER rows for (zip, street) from the shared caches, or None if unknown.
+
+        A prefetched postcode is filtered in Python the way the SQL filters
+        `p.name::text ILIKE '%street%'`, and the result is cached per street.
+        """
+        key = self._tiger_cache_key(zip_code, street_like)
+        with self._db_result_lock:
+            rows = self._tiger_rows_cache.get(key)
+            if rows is not None:
+                return rows
+            zip_rows = self._tiger_zip_rows_cache.get(key[0])
+        if zip_rows is None:
+            return None
+        matcher = self._ilike_regex(str(street_like or "").strip())
+        rows = [row for row in zip_rows if matcher.search(str(row.get("road_name_text") or ""))]
+        with self._db_result_lock:
+            self._tiger_rows_cache[key] = rows
+        return rows
+
+    def _postcode_candidates(self, postcode: str) -> list[str]:
+        if not postcode:
+            return []
+        with self._db_result_lock:
+            cached = self._postcode_candidates_cache.get(postcode)
+        if cached is not None:
+            self._log(f"Postcode DB candidates found (cached): {len(cached)}")
+            return list(cached)
+        if not self._db_available():
+            self._log("psycopg is not available; skipping postcode DB lookup.")
+            self._postcode_lookup_error = "db_unavailable"
+            return []
+
+        try:
+            statements = self._db_statements()
+            _, rows = self._db_fetch(
+                statements["postcode_tiger"], {"postcode": postcode}, prepare=True
+            )
+            candidates = [r[0] for r in rows if r and r[0]]
+            if not candidates:
+                self._log("Tiger postcode search returned no candidates; falling back to geometry lookup.")
+                _, rows = self._db_fetch(
+                    statements["postcode_geometry"],
+                    (self.db_country_code, postcode, self.db_radius_m),
+                    prepare=True,
+                )
                 candidates = [r[0] for r in rows if r and r[0]]
-                if not candidates:
-                    self._log("Tiger postcode search returned no candidates; falling back to geometry lookup.")
-                    sql = f"""
-                    WITH z AS (
-                    SELECT {geom_col}::geometry AS g
-                    FROM location_postcode
-                    WHERE country_code = %s AND postcode = %s
-                    LIMIT 1
-                    ),
-                    roads AS (
-                    SELECT DISTINCT
-                        NULLIF(
-                        BTRIM(
-                            COALESCE(
-                            p.name{name_op}'name'{name_cast},
-                            p.name{name_op}'name:en'{name_cast},
-                            p.name{name_op}'alt_name'{name_cast},
-                            p.name{name_op}'official_name'{name_cast},
-                            p.address{addr_op}'road'{addr_cast},
-                            p.address{addr_op}'pedestrian'{addr_cast},
-                            p.address{addr_op}'footway'{addr_cast},
-                            p.address{addr_op}'path'{addr_cast}
-                            )
-                        ),
-                        ''
-                        ) AS road_name
-                    FROM placex p, z
-                    WHERE p.class = 'highway'
-                        AND p.geometry IS NOT NULL
-                        AND ST_DWithin(p.geometry::geography, z.g::geography, %s)
-                    )
-                    SELECT road_name
-                    FROM roads
-                    WHERE road_name IS NOT NULL
-                    ORDER BY road_name;
-                    """
-                    cur.execute(
-                        sql, (self.db_country_code, postcode, self.db_radius_m)
-                    )
-                    rows = cur.fetchall()
-                    candidates = [r[0] for r in rows if r and r[0]]
             unique = sorted(set(candidates))
+            with self._db_result_lock:
+                self._postcode_candidates_cache[postcode] = unique
             self._log(f"Postcode DB candidates found: {len(unique)}")
             #self._log(f"Candidates: {unique!r}")
             return unique
@@ -1288,6 +1630,129 @@ class NominatimSearch:
     def _lerp(start: float, end: float, fraction: float) -> float:
         return start + (end - start) * fraction
 
+    def _query_tiger_rows(self, zip_code: str, street_like: str) -> list[dict[str, Any]]:
+        col_names, db_rows = self._db_fetch(
+            self._TIGER_ROWS_SQL, (zip_code, street_like), prepare=True
+        )
+        return [
+            {col_names[i]: row[i] for i in range(len(col_names))}
+            for row in db_rows
+        ]
+
+    def fetch_tiger_rows_batch(
+        self, pending: list[tuple[str, str, str]]
+    ) -> dict[tuple[str, str], list[dict[str, Any]]]:
+        """
+        Resolve TIGER rows for many (zip, street, house_number) tuples in one query.
+
+        The SQL only depends on (zip, street); house numbers are applied later
+        in `_search_tiger_extrapolate_snap`. Pairs are sent as parallel
+        `unnest` arrays, results are split back out by ordinality and stored
+        in the shared TIGER cache so later searches skip the round trip.
+        """
+        keys: list[tuple[str, str]] = []
+        seen: set[tuple[str, str]] = set()
+        for zip_code, street_like, _ in pending:
+            key = self._tiger_cache_key(zip_code, street_like)
+            if not key[0] or not key[1] or key in seen:
+                continue
+            if self._cached_tiger_rows(zip_code, street_like) is not None:
+                continue
+            seen.add(key)
+            keys.append(key)
+        results: dict[tuple[str, str], list[dict[str, Any]]] = {key: [] for key in keys}
+        if not keys or not self._db_available():
+            return results
+
+        col_names, db_rows = self._db_fetch(
+            self._TIGER_ROWS_BATCH_SQL,
+            ([k[0] for k in keys], [k[1] for k in keys]),
+            prepare=True,
+        )
+        for row in db_rows:
+            record = {col_names[i]: row[i] for i in range(1, len(col_names))}
+            results[keys[int(row[0]) - 1]].append(record)
+        with self._db_result_lock:
+            for key, rows in results.items():
+                self._tiger_rows_cache[key] = rows
+        return results
+
+    def fetch_tiger_zip_rows_batch(self, postcodes: list[str]) -> dict[str, int]:
+        """
+        Load every TIGER segment for the given postcodes into the shared cache.
+
+        Later (zip, street) lookups for these postcodes are filtered in memory
+        (see `_cached_tiger_rows`). Returns postcode -> segment count.
+        """
+        wanted: list[str] = []
+        for postcode in postcodes:
+            postcode = str(postcode or "").strip()
+            if not postcode or postcode in wanted:
+                continue
+            with self._db_result_lock:
+                if postcode in self._tiger_zip_rows_cache:
+                    continue
+            wanted.append(postcode)
+        results: dict[str, list[dict[str, Any]]] = {postcode: [] for postcode in wanted}
+        if not wanted or not self._db_available():
+            return {postcode: 0 for postcode in wanted}
+
+        col_names, db_rows = self._db_fetch(
+            self._TIGER_ZIP_ROWS_BATCH_SQL, (wanted,), prepare=True
+        )
+        for row in db_rows:
+            record = {col_names[i]: row[i] for i in range(len(col_names))}
+            postcode = str(record.get("postcode") or "").strip()
+            if postcode in results:
+                results[postcode].append(record)
+        with self._db_result_lock:
+            self._tiger_zip_rows_cache.update(results)
+        return {postcode: len(rows) for postcode, rows in results.items()}
+
+    def fetch_postcode_candidates_batch(self, postcodes: list[str]) -> dict[str, list[str]]:
+        """
+        Resolve road-name candidates for many postcodes with set-based queries.
+
+        Postcodes with no TIGER roads fall back to the highway-within-radius
+        lookup, also batched. Results are stored in the shared postcode cache.
+        """
+        wanted: list[str] = []
+        for postcode in postcodes:
+            postcode = str(postcode or "").strip()
+            if not postcode or postcode in wanted:
+                continue
+            with self._db_result_lock:
+                if postcode in self._postcode_candidates_cache:
+                    continue
+            wanted.append(postcode)
+        results: dict[str, set[str]] = {postcode: set() for postcode in wanted}
+        if not wanted or not self._db_available():
+            return {postcode: [] for postcode in wanted}
+
+        statements = self._db_statements()
+        _, rows = self._db_fetch(
+            statements["postcode_tiger_batch"], (wanted,), prepare=True
+        )
+        for postcode, road_name in rows:
+            if road_name:
+                results[postcode].add(road_name)
+
+        missing = [postcode for postcode in wanted if not results[postcode]]
+        if missing:
+            _, rows = self._db_fetch(
+                statements["postcode_geometry_batch"],
+                (self.db_country_code, missing, self.db_radius_m),
+                prepare=True,
+            )
+            for postcode, road_name in rows:
+                if road_name:
+                    results[postcode].add(road_name)
+
+        final = {postcode: sorted(names) for postcode, names in results.items()}
+        with self._db_result_lock:
+            self._postcode_candidates_cache.update(final)
+        return final
+
     def _search_tiger_extrapolate_snap(
         self,
         zip_code: str,
@@ -1361,61 +1826,29 @@ class NominatimSearch:
             tiger_meta["error"] = reason
             return _finalize(False, self.error)
 
-        if psycopg is None:
-            self.error = "db_unavailable"
-            search_detail["result_status"] = "error"
-            search_detail["error"] = self.error
-            tiger_meta["error"] = self.error
-            return _finalize(False, self.error)
-
-        dsn = (
-            f"host={self.db_host} port={self.db_port} dbname={self.db_name} "
-            f"user={self.db_user} password={self.db_pass}"
-        )
-        sql = """
-            SELECT
-              t.place_id,
-              t.parent_place_id,
-              t.postcode,
-              t.startnumber::text AS startnumber_text,
-              t.endnumber::text   AS endnumber_text,
-              t.step::text        AS step_text,
-              p.name::text AS road_name_text,
-              p.class AS road_class,
-              p.type  AS road_type,
-              ST_X(ST_StartPoint(t.linegeo::geometry)) AS start_lon,
-              ST_Y(ST_StartPoint(t.linegeo::geometry)) AS start_lat,
-              ST_X(ST_EndPoint(t.linegeo::geometry))   AS end_lon,
-              ST_Y(ST_EndPoint(t.linegeo::geometry))   AS end_lat
-            FROM location_property_tiger t
-            JOIN placex p ON p.place_id = t.parent_place_id
-            WHERE t.postcode = %s
-              AND p.name::text ILIKE '%%' || %s || '%%'
-            ORDER BY
-              p.name::text,
-              LEAST(t.startnumber, t.endnumber),
-              GREATEST(t.startnumber, t.endnumber);
-        """
-
-        try:
-            with psycopg.connect(dsn, connect_timeout=self.db_connect_timeout) as conn:
-                with conn.cursor() as cur:
-                    timeout_ms = int(self.db_statement_timeout_ms)
-                    cur.execute(f"SET statement_timeout = {timeout_ms};")
-                    cur.execute(sql, (zip_code, fuzzy_street_name))
-                    db_rows = cur.fetchall()
-                    col_names = [desc.name for desc in cur.description]
-        except Exception as exc:
-            self.error = f"tiger_query_error:{exc}"
-            search_detail["result_status"] = "error"
-            search_detail["error"] = self.error
-            tiger_meta["error"] = self.error
-            return _finalize(False, self.error)
+        tiger_key = self._tiger_cache_key(zip_code, fuzzy_street_name)
+        cached_rows = self._cached_tiger_rows(zip_code, fuzzy_street_name)
+        if cached_rows is not None:
+            tiger_rows = [dict(row) for row in cached_rows]
+            tiger_meta["cached"] = True
+        else:
+            if not self._db_available():
+                self.error = "db_unavailable"
+                search_detail["result_status"] = "error"
+                search_detail["error"] = self.error
+                tiger_meta["error"] = self.error
+                return _finalize(False, self.error)
+            try:
+                tiger_rows = self._query_tiger_rows(zip_code, fuzzy_street_name)
+            except Exception as exc:
+                self.error = f"tiger_query_error:{exc}"
+                search_detail["result_status"] = "error"
+                search_detail["error"] = self.error
+                tiger_meta["error"] = self.error
+                return _finalize(False, self.error)
+            with self._db_result_lock:
+                self._tiger_rows_cache[tiger_key] = [dict(row) for row in tiger_rows]
 
-        tiger_rows: list[dict[str, Any]] = [
-            {col_names[i]: row[i] for i in range(len(col_names))}
-            for row in db_rows
-        ]
         search_detail["result_status"] = "returned"
         search_detail["number_results"] = len(tiger_rows)
         tiger_meta["rows_returned"] = len(tiger_rows)
@@ -1704,6 +2137,209 @@ class NominatimSearch:
         )
         return _finalize(True, "")
 
+    def _search_openaddress(
+        self,
+        expected_zip: str = "",
+        expected_town: str = "",
+        expected_state: str = "",
+    ) -> bool:
+        """Resolve the address from the local OpenAddresses index; True when found."""
+        search_name = "openaddress_index"
+        started_at = time.perf_counter()
+        number_value = self.address_tags_expanded.get("AddressNumber", "")
+        street_value = self._build_street_value()
+        query_text = (
+            f"number={number_value}; street={street_value}; "
+            f"zip={expected_zip}; city={expected_town}"
+        )
+        if not number_value or not street_value or not (expected_zip or expected_town):
+            self._append_search_detail(
+                self._build_skipped_search_detail(
+                    search_name=search_name,
+                    reason="missing_required_tags:AddressNumber_StreetName_and_ZipCode_or_PlaceName",
+                    query=query_text,
+                    expected_zip=expected_zip,
+                    expected_town=expected_town,
+                    expected_state=expected_state,
+                )
+            )
+            return False
+
+        search_detail: Dict[str, Any] = {
+            "search_name": search_name,
+            "attempted": True,
+            "result_status": "none_found",
+            "error": None,
+            "number_results": 0,
+            "result_check": "rejected",
+            "result_check_reason": "no_index_match",
+            "result_check_logic": None,
+            "elapsed_ms": 0,
+            "query": query_text,
+            "expected_zip": expected_zip or None,
+            "expected_town": expected_town or None,
+            "expected_state": expected_state or None,
+            "accepted_result_index": None,
+            "results": [],
+        }
+        try:
+            match = self.openaddress_index.lookup(
+                number_value, street_value, zip_code=expected_zip, city=expected_town
+            )
+        except Exception as exc:
+            match = None
+            search_detail["result_status"] = "error"
+            search_detail["error"] = f"openaddress_index_error:{exc}"
+            search_detail["result_check_reason"] = "index_error"
+        search_detail["elapsed_ms"] = int((time.perf_counter() - started_at) * 1000)
+        if match is None:
+            self._append_search_detail(search_detail)
+            self._log(f"{search_name}: no match for {query_text!r}")
+            return False
+
+        lat_text = f"{float(match['lat']):.7f}"
+        lon_text = f"{float(match['lon']):.7f}"
+        road = match.get("street_raw") or match.get("street") or street_value
+        zip5 = match.get("zip") or self._normalize_zip5(expected_zip)
+        display_name = ", ".join(
+            p for p in [match.get("number"), road, match.get("city"), zip5, "OpenAddresses"] if p
+        )
+        self.latitude = lat_text
+        self.longitude = lon_text
+        self.nominatim_address = display_name
+        self.method = search_name
+        self.query = query_text
+        self.error = ""
+        self.response = match
+        self.result_metadata = {
+            "search_name": search_name,
+            "search_query": query_text,
+            "search_number_results": 1,
+            "accepted_result_index": 0,
+            "osm_type": None,
+            "osm_id": None,
+            "place_id": None,
+            "lat": lat_text,
+            "lon": lon_text,
+            "place_rank": None,
+            "class": "place",
+            "type": "house",
+            "addresstype": search_name,
+            "importance": None,
+            "bbox_max_dim_m": None,
+            "display_name": display_name,
+            "addr_house_number": match.get("number"),
+            "addr_road": road,
+            "addr_postcode": zip5 or None,
+            "addr_city": match.get("city") or expected_town or None,
+            "addr_state": expected_state or None,
+            "checker_place_rank": None,
+            "checker_expected_zip5": self._normalize_zip5(expected_zip) or None,
+            "checker_result_zip5": zip5 or None,
+            "checker_zip_match": (
+                bool(zip5) and zip5 == self._normalize_zip5(expected_zip)
+                if expected_zip else None
+            ),
+            "checker_expected_town": expected_town or None,
+            "checker_expected_town_normalized": expected_town.casefold() if expected_town else None,
+            "checker_town_match": None,
+            "checker_town_match_keys": None,
+            "checker_reasons": None,
+            "openaddress_match": match.get("match"),
+            "openaddress_source_id": match.get("source_id") or None,
+        }
+        search_detail["result_status"] = "returned"
+        search_detail["number_results"] = 1
+        search_detail["result_check"] = "accepted"
+        search_detail["result_check_reason"] = match.get("match")
+        search_detail["result_check_logic"] = f"openaddress_index:{match.get('match')}"
+        search_detail["accepted_result_index"] = 0
+        self._append_search_detail(search_detail)
+        self._log(f"{search_name} success: match={match.get('match')}, lat={lat_text}, lon={lon_text}")
+        return True
+
+    def _finish_search(
+        self,
+        started_at: float,
+        return_metadata: bool,
+    ) -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
+        self.search_metadata["search_successful"] = bool(self.latitude and self.longitude)
+        self.search_metadata["search_method_accepted"] = (
+            self.method if self.search_metadata["search_successful"] and self.method else "none"
+        )
+        self.search_metadata["final_error"] = self.error or None
+        self.search_metadata["elapsed_ms"] = int((time.perf_counter() - started_at) * 1000)
+        self.search_metadata["db_elapsed_ms"] = int(self._db_elapsed_s * 1000)
+        self.search_metadata["db_queries"] = self._db_queries
+        self.search_metadata["http_elapsed_ms"] = int(self._http_elapsed_s * 1000)
+        self.search_metadata["http_requests"] = self._http_requests
+        self._refresh_process_metadata()
+        self._trace(
+            "address",
+            "address",
+            self.search_metadata["elapsed_ms"] / 1000.0,
+            "cache_hit" if self.search_metadata.get("address_cache_used")
+            else "found" if self.search_metadata["search_successful"] else "not_found",
+            {
+                "raw_address": self.raw_address,
+                "method": self.search_metadata["search_method_accepted"],
+                "db_queries": self._db_queries,
+                "http_requests": self._http_requests,
+            },
+        )
+        if (
+            self.save_address_cache
+            and self.raw_address
+            and (
+                not self.search_metadata.get("address_cache_used")
+                or self._cache_entry_missing_metadata
+            )
+        ):
+            self._save_address_cache_entry()
+        if return_metadata:
+            return self, self.tag_metadata, self.search_metadata
+        return self
+
+    def resume_tiger(
+        self,
+        return_metadata: bool = False,
+    ) -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
+        """
+        Finish a search that stopped at the TIGER step (`defer_tiger=True`).
+
+        Call after `fetch_tiger_rows_batch` has warmed the TIGER cache for
+        `pending_tiger`; the elapsed time excludes the wait for the batch.
+        """
+        pending = self.pending_tiger
+        if pending is None:
+            raise RuntimeError("resume_tiger() called without a deferred TIGER search.")
+        self.pending_tiger = None
+        started_at = time.perf_counter() - self._deferred_elapsed_s
+        tiger_ok, tiger_error, tiger_detail = self._search_tiger_extrapolate_snap(**pending)
+        self._append_search_detail(tiger_detail)
+        if not tiger_ok:
+            self.error = tiger_error or self.error
+        return self._finish_search(started_at, return_metadata)
+
+    def resume_reverse_state(
+        self,
+        return_metadata: bool = False,
+    ) -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
+        """
+        Continue a search that stopped before its state lookup
+        (`defer_reverse_state=True`).
+
+        Call after `fetch_reverse_states_batch` has warmed the shared cache for
+        `pending_reverse_state`; a lookup the batch missed is fetched inline.
+        The elapsed time excludes the wait for the batch.
+        """
+        if self.pending_reverse_state is None:
+            raise RuntimeError("resume_reverse_state() called without a deferred state lookup.")
+        self.pending_reverse_state = None
+        started_at = time.perf_counter() - self._deferred_elapsed_s
+        self._reverse_for_state()
+        return self._search_parsed(started_at, return_metadata)
+
     def search(
         self,
         raw_address: str,
@@ -1711,6 +2347,7 @@ class NominatimSearch:
     ) -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
         self.reset()
         started_at = time.perf_counter()
+        self.trace_id = f"{os.getpid()}-{next(self._trace_ids)}"
         self.raw_address = raw_address.strip()
         self.tag_metadata = {
             "raw_address": self.raw_address,
@@ -1724,6 +2361,7 @@ class NominatimSearch:
             "fix_town_directional": False,
             "fix_address_number_non_numeric": False,
             "reverse_for_state_searched": False,
+            "reverse_for_state_cached": False,
             "reverse_for_state_included": False,
             "reverse_for_state_number_results": 0,
             "reverse_for_state_all_results_match": None,
@@ -1766,25 +2404,7 @@ class NominatimSearch:
         self._refresh_process_metadata()
 
         def _finish() -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
-            self.search_metadata["search_successful"] = bool(self.latitude and self.longitude)
-            self.search_metadata["search_method_accepted"] = (
-                self.method if self.search_metadata["search_successful"] and self.method else "none"
-            )
-            self.search_metadata["final_error"] = self.error or None
-            self.search_metadata["elapsed_ms"] = int((time.perf_counter() - started_at) * 1000)
-            self._refresh_process_metadata()
-            if (
-                self.save_address_cache
-                and self.raw_address
-                and (
-                    not self.search_metadata.get("address_cache_used")
-                    or self._cache_entry_missing_metadata
-                )
-            ):
-                self._save_address_cache_entry()
-            if return_metadata:
-                return self, self.tag_metadata, self.search_metadata
-            return self
+            return self._finish_search(started_at, return_metadata)
 
         if not self.raw_address:
             self.error = "Empty address"
@@ -1809,7 +2429,38 @@ class NominatimSearch:
             return _finish()
 
         # Create Tags with usaddress 
-        self._parse_address(self.raw_address) # Dict in self.parsed_components in libpostal format
+        parse_started_at = time.perf_counter()
+        # Dict in self.parsed_components in libpostal format
+        self._parse_address(self.raw_address, reverse_for_state=not self.defer_reverse_state)
+        parse_elapsed_s = time.perf_counter() - parse_started_at
+        self.search_metadata["parse_elapsed_ms"] = int(parse_elapsed_s * 1000)
+        self._trace("parse", self.parser_backend, parse_elapsed_s, "ok")
+
+        if self.defer_reverse_state:
+            lookup = self._reverse_state_lookup()
+            if lookup is not None:
+                if not self._reverse_state_cached(*lookup):
+                    # Leave the state lookup to the caller's batch; see resume_reverse_state().
+                    self.pending_reverse_state = lookup
+                    self.search_metadata["reverse_state_deferred"] = True
+                    self._deferred_elapsed_s = time.perf_counter() - started_at
+                    self._log(f"reverse_for_state deferred for batch: {lookup!r}")
+                    if return_metadata:
+                        return self, self.tag_metadata, self.search_metadata
+                    return self
+                self._reverse_for_state()
+        return self._search_parsed(started_at, return_metadata)
+
+    def _search_parsed(
+        self,
+        started_at: float,
+        return_metadata: bool,
+    ) -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
+        """Run the search strategies for an address that has been parsed."""
+
+        def _finish() -> "NominatimSearch | tuple[NominatimSearch, Dict[str, Any], Dict[str, Any]]":
+            return self._finish_search(started_at, return_metadata)
+
         self.tag_metadata["address_repair"] = self.address_repaired
         self.tag_metadata["address_tags"] = dict(self.address_tags_raw)
         self.tag_metadata["address_tags_expanded"] = dict(self.address_tags_expanded)
@@ -1820,9 +2471,10 @@ class NominatimSearch:
         self.tag_metadata["missing_zip"] = not bool(self.address_tags_expanded.get("ZipCode"))
 
         # Search Flow:
-        # 0) repaired address
-        # 1) number, street, zip ;
-        # 2) number, street, city, state
+        # -) local OpenAddresses index, when configured (openaddress_index)
+        # 0) repaired address (address_reapaired)
+        # 1) number, street, zip (etags_nsz)
+        # 2) number, street, city, state (etags_nscs)
         # 3) number, fuzzy street, zip
         ####################################################################
 
@@ -1840,99 +2492,81 @@ class NominatimSearch:
                 )
         expected_state = self.address_tags_expanded.get("StateName", "")
 
-        # Search 0: repaired address
-        search_name = "address_reapaired"
-        repaired_query = (self.address_repaired or "").strip()
-        if repaired_query:
+        # Local OpenAddresses index: no network round trip when it matches.
+        if self.openaddress_index is not None and self._search_openaddress(
+            expected_zip, expected_town, expected_state
+        ):
+            return _finish()
+
+        def _run_http_strategy(search_name: str) -> bool:
+            nonlocal primary_error
+            if search_name == "address_reapaired":
+                query = (self.address_repaired or "").strip()
+                reason = "" if query else "missing_repaired_address"
+            else:
+                search_spec, required_tags = self.HTTP_STRATEGY_SPECS[search_name]
+                missing = [
+                    tag for tag in required_tags
+                    if not self.address_tags_expanded.get(tag)
+                ]
+                query = ", ".join(self._build_query(search_spec)) if not missing else ""
+                reason = f"missing_required_tags:{','.join(missing)}" if missing else ""
+            if reason:
+                self._log(f"{search_name}, skipped: {reason}")
+                self._append_search_detail(
+                    self._build_skipped_search_detail(
+                        search_name=search_name,
+                        reason=reason,
+                        query=query,
+                        expected_zip=expected_zip,
+                        expected_town=expected_town,
+                        expected_state=expected_state,
+                    )
+                )
+                return False
             ok, primary_error, search_detail = self._request(
-                repaired_query,
+                query,
                 search_name,
                 expected_zip=expected_zip,
                 expected_town=expected_town,
                 expected_state=expected_state,
             )
             self._append_search_detail(search_detail)
-            if ok:
-                return _finish()
-        else:
-            reason = "missing_repaired_address"
-            self._log(f"{search_name}, skipped: {reason}")
-            self._append_search_detail(
-                self._build_skipped_search_detail(
-                    search_name=search_name,
-                    reason=reason,
-                    query=repaired_query,
-                    expected_zip=expected_zip,
-                    expected_town=expected_town,
-                    expected_state=expected_state,
-                )
+            return ok
+
+        # Searches 0-2 run in the default order unless a strategy planner
+        # (learned from cache history) reorders or skips them for this
+        # address shape. Skipped strategies still run last on a small
+        # exploration fraction of addresses so their statistics stay current.
+        strategy_order = list(self.HTTP_STRATEGY_ORDER)
+        if self.strategy_planner is not None:
+            strategy_order, planner_skipped, planner_explored, shape = self.strategy_planner.plan(
+                self.tag_metadata, strategy_order
             )
-
-        # Search 1: number, street, zip
-        search_name = "etags_nsz"
-        search_spec = ["AddressNumber", "StreetName", "ZipCode"]
-        if all(self.address_tags_expanded.get(tag) for tag in ["StreetName", "ZipCode"]):
-            query_parts = self._build_query(search_spec)
-
-            ok, primary_error, search_detail = self._request(
-                ", ".join(query_parts),
-                search_name,
-                expected_zip=expected_zip,
-                expected_town=expected_town,
-                expected_state=expected_state,
+            self.search_metadata["strategy_plan"] = {
+                "shape": shape,
+                "order": list(strategy_order),
+                "skipped": list(planner_skipped),
+                "explored": list(planner_explored),
+            }
+            self._log(
+                f"Strategy planner: shape={shape!r} order={strategy_order!r} "
+                f"skipped={planner_skipped!r} explored={planner_explored!r}"
             )
-            self._append_search_detail(search_detail)
-            if ok:
-                return _finish()
-        else:
-            missing = [
-                tag for tag in ["StreetName", "ZipCode"]
-                if not self.address_tags_expanded.get(tag)
-            ]
-            reason = f"missing_required_tags:{','.join(missing)}"
-            self._log(f"{search_name}, skipped: {reason}")
-            self._append_search_detail(
-                self._build_skipped_search_detail(
-                    search_name=search_name,
-                    reason=reason,
-                    expected_zip=expected_zip,
-                    expected_town=expected_town,
-                    expected_state=expected_state,
+            for search_name in planner_skipped:
+                self._append_search_detail(
+                    self._build_skipped_search_detail(
+                        search_name=search_name,
+                        reason="strategy_planner_skip",
+                        expected_zip=expected_zip,
+                        expected_town=expected_town,
+                        expected_state=expected_state,
+                    )
                 )
-            )
-
-        # Search 2: number, street, city, state
-        search_name = "etags_nscs"
-        search_spec = ["AddressNumber", "StreetName", "PlaceName", "StateName"]
-        if all(self.address_tags_expanded.get(tag) for tag in ["StreetName", "PlaceName", "StateName"]):
-            query_parts = self._build_query(search_spec)
 
-            ok, primary_error, search_detail = self._request(
-                ", ".join(query_parts),
-                search_name,
-                expected_zip=expected_zip,
-                expected_town=expected_town,
-                expected_state=expected_state,
-            )
-            self._append_search_detail(search_detail)
-            if ok:
+        for search_name in strategy_order:
+            if _run_http_strategy(search_name):
                 return _finish()
-        else:
-            missing = [
-                tag for tag in ["StreetName", "PlaceName", "StateName"]
-                if not self.address_tags_expanded.get(tag)
-            ]
-            reason = f"missing_required_tags:{','.join(missing)}"
-            self._log(f"{search_name}, skipped: {reason}")
-            self._append_search_detail(
-                self._build_skipped_search_detail(
-                    search_name=search_name,
-                    reason=reason,
-                    expected_zip=expected_zip,
-                    expected_town=expected_town,
-                    expected_state=expected_state,
-                )
-            )
 
         # Search 3: number, fuzzy street, zip
         search_name = "zip_street_match_nsz"
@@ -2009,13 +2643,26 @@ class NominatimSearch:
                 return _finish()
 
             self.error = primary_error or self.error
-            tiger_ok, tiger_error, tiger_detail = self._search_tiger_extrapolate_snap(
-                zip_code=zip_value,
-                fuzzy_street_name=street_match,
-                address_number=number_value,
-                expected_town=expected_town,
-                expected_state=expected_state,
-            )
+            tiger_args = {
+                "zip_code": zip_value,
+                "fuzzy_street_name": street_match,
+                "address_number": number_value,
+                "expected_town": expected_town,
+                "expected_state": expected_state,
+            }
+            if self.defer_tiger:
+                if self._cached_tiger_rows(zip_value, street_match) is None:
+                    # Leave the TIGER query to the caller's batch; see resume_tiger().
+                    self.pending_tiger = tiger_args
+                    self.search_metadata["tiger_deferred"] = True
+                    self._deferred_elapsed_s = time.perf_counter() - started_at
+                    self._log(f"TIGER lookup deferred for batch: {tiger_args!r}")
+                    # Same shape as a finished search; the metadata is
+                    # completed by resume_tiger().
+                    if return_metadata:
+                        return self, self.tag_metadata, self.search_metadata
+                    return self
+            tiger_ok, tiger_error, tiger_detail = self._search_tiger_extrapolate_snap(**tiger_args)
             self._append_search_detail(tiger_detail)
             if not tiger_ok:
                 self.error = tiger_error or self.error
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Learn an HTTP search-strategy order per address shape from cache history.
+
+Every cache row's `search_metadata.search_attempts` records which strategies
+ran, how long each took and which one was accepted. This script groups rows
+by address shape (has ZIP, has unit, PO box, repaired ZIP, has city+state),
+estimates each strategy's success rate and mean latency per shape, and writes
+a plan that NominatimSearch uses to reorder (and, with enough evidence, skip)
+the first HTTP searches so fewer Nominatim calls are made per address.
+
+A skipped strategy is still run last on a small fraction of addresses
+(`explore_rate`), so its statistics keep getting fresh samples and a skip
+is dropped once the strategy starts succeeding again.
+
+Usage:
+    python search_strategy_planner.py --cache latest/geocode_address_cache.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import random
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+HTTP_STRATEGIES = ("address_reapaired", "etags_nsz", "etags_nscs")
+# Fuzzy street match issues one more /search call when it finds a road.
+FALLBACK_HTTP_STRATEGIES = ("zip_street_match_nsz",)
+
+DEFAULT_MIN_SAMPLES = 30
+DEFAULT_PRIOR_WEIGHT = 5.0
+DEFAULT_EXPLORE_RATE = 0.05
+
+
+def _parse_dict(value: str) -> dict[str, Any]:
+    if not value:
+        return {}
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def address_shape(tag_metadata: dict[str, Any]) -> str:
+    """Coarse address shape used to group strategy history."""
+    tags = tag_metadata.get("address_tags_expanded") or {}
+    if not isinstance(tags, dict):
+        tags = {}
+    has_zip = bool(tags.get("ZipCode"))
+    has_unit = any(
+        tags.get(key) for key in ("OccupancyType", "OccupancyIdentifier", "SubaddressType")
+    )
+    po_box = bool(tags.get("USPSBoxType") or tags.get("USPSBoxID"))
+    zip_repaired = bool(tag_metadata.get("fix_zip_repair"))
+    city_state = bool(tags.get("PlaceName") and tags.get("StateName"))
+    return (
+        f"zip={int(has_zip)}|unit={int(has_unit)}|pobox={int(po_box)}"
+        f"|zip_repaired={int(zip_repaired)}|city_state={int(city_state)}"
+    )
+
+
+def iter_history(cache_path: Path) -> Iterator[tuple[str, list[dict[str, Any]]]]:
+    """Yield (shape, search_attempts) for every cache row with search history."""
+    with cache_path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            tag_meta = _parse_dict(row.get("tag_metadata", ""))
+            search_meta = _parse_dict(row.get("search_metadata", ""))
+            if not tag_meta or not search_meta:
+                process_meta = _parse_dict(row.get("process_metadata", ""))
+                tag_meta = tag_meta or process_meta.get("tag_metadata") or {}
+                search_meta = search_meta or process_meta.get("search_metadata") or {}
+            attempts = search_meta.get("search_attempts")
+            if not isinstance(attempts, list) or not attempts:
+                continue
+            attempts = [a for a in attempts if isinstance(a, dict)]
+            yield address_shape(tag_meta), attempts
+
+
+class SearchStrategyPlanner:
+    """Per-shape success/latency statistics for the reorderable HTTP strategies."""
+
+    def __init__(
+        self,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        prior_weight: float = DEFAULT_PRIOR_WEIGHT,
+        explore_rate: float = DEFAULT_EXPLORE_RATE,
+    ) -> None:
+        self.min_samples = int(min_samples)
+        self.prior_weight = float(prior_weight)
+        self.explore_rate = float(explore_rate)
+        self._rng = random.Random()
+        # shape -> strategy -> {"attempted", "accepted", "elapsed_ms_total"}
+        self.shapes: dict[str, dict[str, dict[str, float]]] = {}
+        self.overall: dict[str, dict[str, float]] = {}
+
+    @staticmethod
+    def _empty() -> dict[str, float]:
+        return {"attempted": 0, "accepted": 0, "elapsed_ms_total": 0.0}
+
+    def fit(self, history: Iterator[tuple[str, list[dict[str, Any]]]]) -> "SearchStrategyPlanner":
+        shapes: dict[str, dict[str, dict[str, float]]] = defaultdict(
+            lambda: defaultdict(self._empty)
+        )
+        overall: dict[str, dict[str, float]] = defaultdict(self._empty)
+        for shape, attempts in history:
+            for attempt in attempts:
+                name = attempt.get("search_name")
+                if name not in HTTP_STRATEGIES or not attempt.get("attempted"):
+                    continue
+                accepted = attempt.get("result_check") == "accepted"
+                elapsed = float(attempt.get("elapsed_ms") or 0)
+                for bucket in (shapes[shape][name], overall[name]):
+                    bucket["attempted"] += 1
+                    bucket["accepted"] += int(accepted)
+                    bucket["elapsed_ms_total"] += elapsed
+        self.shapes = {shape: dict(stats) for shape, stats in shapes.items()}
+        self.overall = dict(overall)
+        return self
+
+    def success_rate(self, shape: str, strategy: str) -> float:
+        """Shape success rate, smoothed toward the overall rate for that strategy."""
+        overall = self.overall.get(strategy) or self._empty()
+        prior = (overall["accepted"] + 1.0) / (overall["attempted"] + 2.0)
+        stats = self.shapes.get(shape, {}).get(strategy) or self._empty()
+        return (stats["accepted"] + self.prior_weight * prior) / (
+            stats["attempted"] + self.prior_weight
+        )
+
+    def mean_elapsed_ms(self, shape: str, strategy: str) -> float:
+        stats = self.shapes.get(shape, {}).get(strategy)
+        if not stats or not stats["attempted"]:
+            stats = self.overall.get(strategy)
+        if not stats or not stats["attempted"]:
+            return 0.0
+        return stats["elapsed_ms_total"] / stats["attempted"]
+
+    def plan_for_shape(
+        self, shape: str, default_order: list[str]
+    ) -> tuple[list[str], list[str]]:
+        """Return (ordered strategies, skipped strategies) for one shape."""
+        skipped: list[str] = []
+        keep: list[str] = []
+        for name in default_order:
+            stats = self.shapes.get(shape, {}).get(name)
+            if stats and stats["attempted"] >= self.min_samples and stats["accepted"] == 0:
+                skipped.append(name)
+            else:
+                keep.append(name)
+        # Highest success probability first minimizes expected calls; latency
+        # breaks ties and the default position keeps the order stable.
+        position = {name: idx for idx, name in enumerate(default_order)}
+        keep.sort(
+            key=lambda name: (
+                -round(self.success_rate(shape, name), 3),
+                self.mean_elapsed_ms(shape, name),
+                position[name],
+            )
+        )
+        if not keep and skipped:
+            keep, skipped = skipped[:1], skipped[1:]
+        return keep, skipped
+
+    def plan(
+        self, tag_metadata: dict[str, Any], default_order: list[str]
+    ) -> tuple[list[str], list[str], list[str], str]:
+        """
+        Return (order, skipped, explored, shape) for one address.
+
+        With probability `explore_rate` the skipped strategies are run after
+        the planned ones instead (`explored`), so a skip is never permanent.
+        """
+        shape = address_shape(tag_metadata)
+        order, skipped = self.plan_for_shape(shape, default_order)
+        explored: list[str] = []
+        if skipped and self._rng.random() < self.explore_rate:
+            explored, skipped = skipped, []
+            order = order + explored
+        return order, skipped, explored, shape
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "min_samples": self.min_samples,
+            "prior_weight": self.prior_weight,
+            "explore_rate": self.explore_rate,
+            "overall": self.overall,
+            "shapes": self.shapes,
+        }
+
+    def save(self, path: Path) -> Path:
+        path.write_text(json.dumps(self.to_dict(), indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchStrategyPlanner":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        planner = cls(
+            min_samples=int(data.get("min_samples", DEFAULT_MIN_SAMPLES)),
+            prior_weight=float(data.get("prior_weight", DEFAULT_PRIOR_WEIGHT)),
+            explore_rate=float(data.get("explore_rate", DEFAULT_EXPLORE_RATE)),
+        )
+        planner.overall = data.get("overall") or {}
+        planner.shapes = data.get("shapes") or {}
+        return planner
+
+
+def simulate_calls(attempts: list[dict[str, Any]], order: list[str]) -> tuple[int, int]:
+    """
+    Return (calls before, estimated calls after) for one address's history.
+
+    A strategy that was never tried for this address (it came after the
+    accepted one) is counted as a failed call, so the estimate is an upper
+    bound for the planned order.
+    """
+    by_name = {a.get("search_name"): a for a in attempts}
+    before = sum(
+        1 for a in attempts
+        if a.get("attempted")
+        and a.get("search_name") in HTTP_STRATEGIES + FALLBACK_HTTP_STRATEGIES
+    )
+    fallback_calls = sum(
+        1 for a in attempts
+        if a.get("attempted") and a.get("search_name") in FALLBACK_HTTP_STRATEGIES
+    )
+
+    after = 0
+    for name in order:
+        attempt = by_name.get(name)
+        if attempt is not None and attempt.get("result_status") == "skipped":
+            continue
+        after += 1
+        if attempt is not None and attempt.get("result_check") == "accepted":
+            return before, after
+
+    accepted_http = any(
+        by_name.get(name, {}).get("result_check") == "accepted" for name in HTTP_STRATEGIES
+    )
+    if accepted_http:
+        # The accepted strategy was skipped by the planner; the address falls
+        # through to the fuzzy street match, counted as one more call.
+        return before, after + 1
+    return before, after + fallback_calls
+
+
+def build_report_lines(
+    cache_path: Path,
+    planner: SearchStrategyPlanner,
+    history: Iterator[tuple[str, list[dict[str, Any]]]],
+) -> list[str]:
+    calls_before: Counter[str] = Counter()
+    calls_after: Counter[str] = Counter()
+    rows_by_shape: Counter[str] = Counter()
+    for shape, attempts in history:
+        order, _ = planner.plan_for_shape(shape, list(HTTP_STRATEGIES))
+        before, after = simulate_calls(attempts, order)
+        rows_by_shape[shape] += 1
+        calls_before[shape] += before
+        calls_after[shape] += after
+
+    total_rows = sum(rows_by_shape.values())
+    total_before = sum(calls_before.values())
+    total_after = sum(calls_after.values())
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    lines = [
+        "Search Strategy Plan Report",
+        f"generated_at: {ts}",
+        f"cache_file: {cache_path}",
+        "",
+        f"rows_with_history: {total_rows}",
+        f"nominatim_calls_before: {total_before}",
+        f"nominatim_calls_after_estimate: {total_after}",
+        f"calls_per_address_before: {total_before / total_rows if total_rows else 0:.3f}",
+        f"calls_per_address_after_estimate: {total_after / total_rows if total_rows else 0:.3f}",
+        "",
+        "By shape (rows | calls/address before -> after | planned order | skipped):",
+    ]
+    for shape, count in rows_by_shape.most_common():
+        order, skipped = planner.plan_for_shape(shape, list(HTTP_STRATEGIES))
+        lines.append(
+            f"  {shape} | {count} | "
+            f"{calls_before[shape] / count:.3f} -> {calls_after[shape] / count:.3f} | "
+            f"{','.join(order)} | {','.join(skipped) or '-'}"
+        )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Learn per-address-shape search strategy order from geocode cache history."
+    )
+    parser.add_argument("--cache", type=Path, required=True, help="Path to geocode_address_cache.csv")
+    parser.add_argument(
+        "--plan",
+        type=Path,
+        default=None,
+        help="Output plan JSON (default: <cache_dir>/strategy_plan.json)",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Output report (default: <cache_dir>/strategy_plan_report.txt)",
+    )
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES)
+    parser.add_argument(
+        "--explore-rate",
+        type=float,
+        default=DEFAULT_EXPLORE_RATE,
+        help="Fraction of addresses that still run skipped strategies (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    planner = SearchStrategyPlanner(
+        min_samples=args.min_samples, explore_rate=args.explore_rate
+    ).fit(iter_history(args.cache))
+    plan_path = planner.save(args.plan or args.cache.parent / "strategy_plan.json")
+    report_lines = build_report_lines(args.cache, planner, iter_history(args.cache))
+    report_path = args.report or args.cache.parent / "strategy_plan_report.txt"
+    report_path.write_text("\n".join(report_lines) + "\n", encoding="utf-8")
+    print(f"plan_file: {plan_path}")
+    print(f"report_file: {report_path}")
+    for line in report_lines[4:9]:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
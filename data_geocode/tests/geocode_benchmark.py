@@ -0,0 +1,217 @@
+"""
+Geocoder benchmark on recorded responses (no Nominatim container or Postgres).
+
+record: run a test list against the live services and capture every /search
+        response and SQL result into a JSONL fixture file.
+bench:  replay the fixtures through a local stand-in HTTP server and a DB
+        shim, running the list like data_add_geocode (shared cache index,
+        thread pool), and report addresses/second, per-strategy latency
+        histograms and cache hit rates. The second pass hits the address cache.
+
+Usage:
+    python tests/geocode_benchmark.py record --addresses tests/nominatim_test_list.csv
+    python tests/geocode_benchmark.py bench --addresses tests/nominatim_test_list.csv --threads 4
+    python tests/geocode_benchmark.py bench --http-latency-ms 15 --db-latency-ms 40 --report bench.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GEOCODE_DIR = str(Path(ROOT_DIR).resolve().parents[0])
+if DATA_GEOCODE_DIR not in sys.path:
+    sys.path.append(DATA_GEOCODE_DIR)
+
+from data_add_geocode import _build_cache_row
+from nominatim_helpers.address_cache_index import AddressCacheIndex
+from nominatim_helpers.replay import (
+    FixtureStore,
+    RecordingTransport,
+    ReplayDbShim,
+    ReplayHttpServer,
+)
+from nominatim_helpers.run_stats import GeocodeRunStats
+from nominatim_search import NominatimSearch
+
+DEFAULT_ADDRESSES = os.path.join(ROOT_DIR, "nominatim_test_list.csv")
+FIXTURES_DIR = os.path.join(ROOT_DIR, "fixtures")
+LIVE_BASE_URL = "http://localhost:8080/search"
+HTTP_TIMEOUT_SECONDS = 20
+DB_STATEMENT_TIMEOUT_MS = 60000
+DB_CONNECT_TIMEOUT_SECONDS = 10
+
+
+def load_addresses(path: str, limit: int | None = None) -> list[str]:
+    addresses: list[str] = []
+    with open(path, newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        column = next(
+            (c for c in reader.fieldnames or [] if "address" in c.lower()), None
+        )
+        if column is None:
+            raise ValueError(f"No address column in {path}")
+        for row in reader:
+            raw = (row.get(column) or "").strip()
+            if raw:
+                addresses.append(raw)
+    return addresses[:limit] if limit else addresses
+
+
+def default_fixture_path(addresses_path: str) -> str:
+    return os.path.join(FIXTURES_DIR, f"{Path(addresses_path).stem}.jsonl")
+
+
+def clear_shared_caches() -> None:
+    with NominatimSearch._db_result_lock:
+        NominatimSearch._postcode_candidates_cache.clear()
+        NominatimSearch._tiger_rows_cache.clear()
+        NominatimSearch._tiger_zip_rows_cache.clear()
+    with NominatimSearch._reverse_state_lock:
+        NominatimSearch._reverse_state_cache.clear()
+
+
+def record(args: argparse.Namespace) -> None:
+    addresses = load_addresses(args.addresses, args.limit)
+    fixture_path = args.fixtures or default_fixture_path(args.addresses)
+    if os.path.exists(fixture_path):
+        os.remove(fixture_path)
+    store = FixtureStore(fixture_path)
+    NominatimSearch.transport = RecordingTransport(store)
+    clear_shared_caches()
+
+    def process(addr: str) -> None:
+        NominatimSearch(
+            base_url=LIVE_BASE_URL,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            db_statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+            db_connect_timeout=DB_CONNECT_TIMEOUT_SECONDS,
+            use_address_cache=False,
+            save_address_cache=False,
+        ).search(addr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            for f in as_completed([executor.submit(process, addr) for addr in addresses]):
+                f.result()
+    finally:
+        NominatimSearch.transport = None
+        store.close()
+    print(f"Recorded {len(store.http)} /search responses and {len(store.sql)} SQL results")
+    print(f"fixture_file: {fixture_path}")
+
+
+def run_pass(
+    addresses: list[str],
+    base_url: str,
+    cache_lookup: AddressCacheIndex,
+    threads: int,
+) -> GeocodeRunStats:
+    stats = GeocodeRunStats()
+    cache_lock = threading.RLock()
+
+    def process(addr: str) -> NominatimSearch:
+        searcher = NominatimSearch(
+            base_url=base_url,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            use_address_cache=True,
+            save_address_cache=False,
+            address_cache_path=cache_lookup.cache_path,
+            address_cache_data=cache_lookup,
+            address_cache_lock=cache_lock,
+        )
+        searcher.search(addr)
+        return searcher
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for f in as_completed([executor.submit(process, addr) for addr in addresses]):
+            searcher = f.result()
+            stats.record_search(searcher.search_metadata)
+            if not searcher.search_metadata.get("address_cache_used") and searcher.raw_address:
+                with cache_lock:
+                    cache_lookup.append(_build_cache_row(searcher))
+    stats.finish()
+    return stats
+
+
+def bench(args: argparse.Namespace) -> None:
+    addresses = load_addresses(args.addresses, args.limit)
+    fixture_path = args.fixtures or default_fixture_path(args.addresses)
+    store = FixtureStore.load(fixture_path)
+    server = ReplayHttpServer(
+        store, latency_ms=args.http_latency_ms, latency_scale=args.latency_scale
+    ).start()
+    shim = ReplayDbShim(store, latency_ms=args.db_latency_ms, latency_scale=args.latency_scale)
+    NominatimSearch.transport = shim
+    clear_shared_caches()
+
+    report: dict[str, object] = {
+        "addresses_file": args.addresses,
+        "fixture_file": fixture_path,
+        "threads": args.threads,
+        "http_latency_ms": args.http_latency_ms,
+        "db_latency_ms": args.db_latency_ms,
+        "latency_scale": args.latency_scale,
+        "passes": [],
+    }
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_lookup = AddressCacheIndex.load(os.path.join(tmp_dir, "geocode_address_cache.csv"))
+            try:
+                for pass_no in range(1, args.passes + 1):
+                    stats = run_pass(addresses, server.base_url, cache_lookup, args.threads)
+                    print(f"\n=== pass {pass_no} ===")
+                    for line in stats.summary_lines(histograms=not args.no_histograms):
+                        print(line)
+                    report["passes"].append(stats.to_dict())
+            finally:
+                cache_lookup.close()
+    finally:
+        NominatimSearch.transport = None
+        server.stop()
+
+    report["replay"] = {"http": dict(server.stats), "sql": dict(shim.stats)}
+    print(f"\nreplay http hits/misses: {server.stats['hits']}/{server.stats['misses']}")
+    print(f"replay sql hits/misses: {shim.stats['hits']}/{shim.stats['misses']}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"report_file: {args.report}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record/replay geocoder benchmark.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("record", "bench"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--addresses", default=DEFAULT_ADDRESSES, help="CSV with an address column")
+        cmd.add_argument("--fixtures", default=None, help="Fixture JSONL (default: tests/fixtures/<list>.jsonl)")
+        cmd.add_argument("--threads", type=int, default=4)
+        cmd.add_argument("--limit", type=int, default=None)
+    bench_cmd = sub.choices["bench"]
+    bench_cmd.add_argument(
+        "--http-latency-ms", type=float, default=None,
+        help="Fixed /search latency (default: recorded latency x --latency-scale)",
+    )
+    bench_cmd.add_argument(
+        "--db-latency-ms", type=float, default=None,
+        help="Fixed SQL latency (default: recorded latency x --latency-scale)",
+    )
+    bench_cmd.add_argument("--latency-scale", type=float, default=1.0)
+    bench_cmd.add_argument("--passes", type=int, default=2)
+    bench_cmd.add_argument("--no-histograms", action="store_true")
+    bench_cmd.add_argument("--report", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
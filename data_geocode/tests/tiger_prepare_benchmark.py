@@ -0,0 +1,143 @@
+"""
+Micro-benchmark for the TIGER query path: planning time saved by server-side
+prepared statements on pooled connections.
+
+Three modes run the geocoder's TIGER SQL for the same (zip, street) pairs:
+- connect:  new connection per address, text query (the old behaviour)
+- pooled:   pooled connection, text query (re-planned on every call)
+- prepared: pooled connection, `prepare=True` (planned once per connection)
+
+Planning time is read from EXPLAIN ANALYZE of the text query and of EXECUTE on
+an explicit PREPARE of the same statement after warm-up.
+
+Usage:
+    python tests/tiger_prepare_benchmark.py --pair 02886 "Post" --pair 02888 "Warwick" --rounds 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+def _find_data_geocode_dir(start: str) -> str:
+    current = Path(start).resolve()
+    for candidate in [current, *current.parents]:
+        if (candidate / "nominatim_search.py").exists():
+            return str(candidate)
+    raise RuntimeError(f"Could not locate nominatim_search.py from {start}")
+
+
+DATA_GEOCODE_DIR = _find_data_geocode_dir(os.path.dirname(os.path.abspath(__file__)))
+if DATA_GEOCODE_DIR not in sys.path:
+    sys.path.append(DATA_GEOCODE_DIR)
+
+import psycopg
+
+from nominatim_search import NominatimSearch
+
+DEFAULT_PAIRS = [("02886", "Post"), ("02888", "Warwick"), ("02909", "Delaine")]
+
+
+def _timed_ms(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def run_connect(searcher: NominatimSearch, pairs, rounds: int) -> list[float]:
+    timings = []
+    for _ in range(rounds):
+        for zip_code, street in pairs:
+            def query():
+                with psycopg.connect(
+                    searcher._db_dsn(), connect_timeout=searcher.db_connect_timeout
+                ) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(searcher._TIGER_ROWS_SQL, (zip_code, street), prepare=False)
+                        cur.fetchall()
+            timings.append(_timed_ms(query))
+    return timings
+
+
+def run_pooled(searcher: NominatimSearch, pairs, rounds: int, prepare: bool) -> list[float]:
+    timings = []
+    for _ in range(rounds):
+        for zip_code, street in pairs:
+            def query():
+                with searcher._db_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(searcher._TIGER_ROWS_SQL, (zip_code, street), prepare=prepare)
+                        cur.fetchall()
+            timings.append(_timed_ms(query))
+    return timings
+
+
+def planning_times(searcher: NominatimSearch, pairs) -> tuple[list[float], list[float]]:
+    """(text planning ms, prepared planning ms) per pair from EXPLAIN ANALYZE."""
+    text_sql = searcher._TIGER_ROWS_SQL.strip().rstrip(";")
+    prepared_sql = text_sql.replace("%s", "$1", 1).replace("%s", "$2", 1).replace("%%", "%")
+    text_ms: list[float] = []
+    prepared_ms: list[float] = []
+    # A dedicated connection keeps the explicit PREPARE away from the pool,
+    # whose connections hold psycopg-managed prepared statements.
+    with psycopg.connect(searcher._db_dsn(), connect_timeout=searcher.db_connect_timeout) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"PREPARE bench_tiger(text, text) AS {prepared_sql}")
+            for zip_code, street in pairs:
+                cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + text_sql, (zip_code, street))
+                text_ms.append(_planning_ms(cur.fetchone()[0]))
+                # Postgres switches to a cached generic plan after 5 custom plans.
+                for _ in range(6):
+                    cur.execute("EXECUTE bench_tiger(%s, %s)", (zip_code, street))
+                    cur.fetchall()
+                cur.execute(
+                    "EXPLAIN (ANALYZE, FORMAT JSON) EXECUTE bench_tiger(%s, %s)", (zip_code, street)
+                )
+                prepared_ms.append(_planning_ms(cur.fetchone()[0]))
+    return text_ms, prepared_ms
+
+
+def _planning_ms(plan) -> float:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0].get("Planning Time", 0.0))
+
+
+def _summary(label: str, timings: list[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (
+        f"{label:<9} n={len(ordered):<5} mean={statistics.fmean(ordered):8.2f}ms "
+        f"p50={statistics.median(ordered):8.2f}ms p95={p95:8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TIGER query prepared-statement micro-benchmark.")
+    parser.add_argument("--pair", nargs=2, action="append", metavar=("ZIP", "STREET"))
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    pairs = [tuple(p) for p in (args.pair or DEFAULT_PAIRS)]
+    searcher = NominatimSearch(use_address_cache=False, save_address_cache=False)
+
+    text_ms, prepared_ms = planning_times(searcher, pairs)
+    print("Planning time per TIGER query (EXPLAIN ANALYZE):")
+    for (zip_code, street), text, prepared in zip(pairs, text_ms, prepared_ms):
+        print(f"  {zip_code} {street!r:<14} text={text:7.3f}ms prepared={prepared:7.3f}ms")
+    saved = statistics.fmean(text_ms) - statistics.fmean(prepared_ms)
+    print(f"  planning saved per address: {saved:.3f}ms")
+
+    print("Round trip per TIGER query:")
+    print("  " + _summary("connect", run_connect(searcher, pairs, args.rounds)))
+    run_pooled(searcher, pairs, 1, prepare=True)  # open pool, prepare once
+    print("  " + _summary("pooled", run_pooled(searcher, pairs, args.rounds, prepare=False)))
+    print("  " + _summary("prepared", run_pooled(searcher, pairs, args.rounds, prepare=True)))
+
+
+if __name__ == "__main__":
+    main()
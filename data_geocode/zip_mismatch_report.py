@@ -6,15 +6,30 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import os
 import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 import usaddress
 
+from nominatim_helpers.address_cache_index import iter_csv_records
+
 COUNTRY_NAMES = {"usa", "u.s.a", "united states", "united states of america"}
+SIDECAR_COUNTERS = [
+    "rows_total",
+    "zip_match",
+    "zip_mismatch",
+    "missing_raw_zip",
+    "missing_result_zip",
+    "missing_both_zip",
+    "bad_result_metadata_json",
+    "bad_process_metadata_json",
+]
+SIDECAR_FIELDS = ["cache_offset", "cache_end_offset", *SIDECAR_COUNTERS]
 
 
 def normalize_zip(value: Any) -> str | None:
@@ -110,6 +125,16 @@ def extract_raw_zip(process_meta: dict[str, Any]) -> str | None:
     return normalize_zip(tags.get("ZipCode"))
 
 
+def classify_zip_pair(raw_zip: str | None, result_zip: str | None) -> str:
+    if raw_zip and result_zip:
+        return "zip_match" if raw_zip == result_zip else "zip_mismatch"
+    if raw_zip and not result_zip:
+        return "missing_result_zip"
+    if result_zip and not raw_zip:
+        return "missing_raw_zip"
+    return "missing_both_zip"
+
+
 def default_cache_path() -> Path:
     for candidate in (
         Path("data_geocode/geocode_address_cache.csv"),
@@ -143,45 +168,240 @@ def build_report_lines(cache_path: Path, stats: Counter[str]) -> list[str]:
     ]
 
 
+def classify_cache_row(row: dict[str, str]) -> Counter[str]:
+    """Per-row report counters (rows_total, one ZIP outcome, bad JSON flags)."""
+    stats: Counter[str] = Counter()
+    stats["rows_total"] += 1
+
+    result_meta = parse_json_obj(
+        row.get("result_metadata", ""),
+        stats,
+        "bad_result_metadata_json",
+    )
+    process_meta = parse_json_obj(
+        row.get("process_metadata", ""),
+        stats,
+        "bad_process_metadata_json",
+    )
+
+    raw_zip = extract_raw_zip(process_meta)
+    result_zip = extract_result_zip(row, result_meta)
+    stats[classify_zip_pair(raw_zip, result_zip)] += 1
+    return stats
+
+
+def default_sidecar_path(cache_path: Path) -> Path:
+    return cache_path.with_name(f"{cache_path.stem}_zip_stats.csv")
+
+
+def _resync_record_start(handle, position: int, field_count: int) -> int:
+    """
+    First record boundary at or after `position` (a raw byte offset).
+
+    Skips to the next line start, then accepts the first line that parses as
+    a complete record with the header's field count; a line that starts inside
+    a quoted multi-line field fails that check and is skipped.
+    """
+    handle.seek(max(0, position - 1))
+    if position > 0 and handle.read(1) != b"\n":
+        handle.readline()
+    candidate = handle.tell()
+    while True:
+        record = next(iter_csv_records(handle, start=candidate), None)
+        if record is None:
+            return handle.seek(0, os.SEEK_END)
+        if len(record[2]) == field_count:
+            return candidate
+        handle.seek(candidate)
+        if not handle.readline():
+            return candidate
+        candidate = handle.tell()
+
+
+def _chunk_cuts(cache_path: Path, body_start: int, chunks: int) -> list[tuple[int, int]]:
+    """Equal raw byte ranges of the cache body; workers resync them to record boundaries."""
+    size = cache_path.stat().st_size
+    target = max(1, (size - body_start) // max(1, chunks))
+    cuts = list(range(body_start, size, target)) + [size]
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def _classify_byte_range(
+    cache_path: Path, header: list[str], start: int, end: int | None
+) -> list[tuple[int, int, Counter[str]]]:
+    rows: list[tuple[int, int, Counter[str]]] = []
+    with cache_path.open("rb") as handle:
+        for offset, end_offset, fields in iter_csv_records(handle, start=start, end=end):
+            row = {name: (fields[i] if i < len(fields) else "") for i, name in enumerate(header)}
+            rows.append((offset, end_offset, classify_cache_row(row)))
+    return rows
+
+
+def _classify_byte_range_job(
+    args: tuple[str, list[str], int, int, int]
+) -> list[tuple[int, int, Counter[str]]]:
+    """Worker: classify the records that start inside raw byte range [cut_start, cut_end)."""
+    cache_path, header, body_start, cut_start, cut_end = args
+    with open(cache_path, "rb") as handle:
+        size = handle.seek(0, os.SEEK_END)
+        start = cut_start if cut_start <= body_start else _resync_record_start(handle, cut_start, len(header))
+        end = size if cut_end >= size else _resync_record_start(handle, cut_end, len(header))
+    if end <= start:
+        return []
+    return _classify_byte_range(Path(cache_path), header, start, end)
+
+
+class ZipStatsSidecar:
+    """
+    Per-row ZIP stats stored next to the cache so the report only has to
+    classify rows appended since the last run.
+
+    Each sidecar row records the cache byte span of one cache row and its
+    counters. `covered_end` is the cache offset up to which rows are
+    classified; rows beyond it are classified on `sync()`.
+    """
+
+    def __init__(self, cache_path: Path, sidecar_path: Path | None = None) -> None:
+        self.cache_path = cache_path
+        self.sidecar_path = sidecar_path or default_sidecar_path(cache_path)
+        self.stats: Counter[str] = Counter()
+        self.covered_end = 0
+        self._header: list[str] = []
+        self._body_start = 0
+
+    def _read_cache_header(self) -> None:
+        with self.cache_path.open("rb") as handle:
+            header = next(iter_csv_records(handle), None)
+        if header is None:
+            self._header, self._body_start = [], 0
+            return
+        self._header = [name.strip() for name in header[2]]
+        self._body_start = header[1]
+
+    def _load(self) -> bool:
+        """Load sidecar counters; return False if the sidecar no longer matches the cache."""
+        self.stats = Counter()
+        self.covered_end = self._body_start
+        if not self.sidecar_path.exists():
+            return False
+        first_offset: int | None = None
+        with self.sidecar_path.open(newline="", encoding="utf-8") as handle:
+            for row in csv.DictReader(handle):
+                try:
+                    offset = int(row["cache_offset"])
+                    end_offset = int(row["cache_end_offset"])
+                except (KeyError, TypeError, ValueError):
+                    return False
+                if first_offset is None:
+                    first_offset = offset
+                if offset != self.covered_end:
+                    return False
+                self.covered_end = end_offset
+                for key in SIDECAR_COUNTERS:
+                    self.stats[key] += int(row.get(key) or 0)
+        if first_offset is not None and first_offset != self._body_start:
+            return False
+        size = self.cache_path.stat().st_size
+        if self.covered_end > size:
+            return False
+        if self.covered_end > self._body_start:
+            with self.cache_path.open("rb") as handle:
+                handle.seek(self.covered_end - 1)
+                if handle.read(1) != b"\n":
+                    return False
+        return True
+
+    def _write_rows(self, rows: list[tuple[int, int, Counter[str]]], mode: str) -> None:
+        write_header = mode == "w" or not self.sidecar_path.exists()
+        with self.sidecar_path.open(mode, newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=SIDECAR_FIELDS)
+            if write_header:
+                writer.writeheader()
+            for offset, end_offset, row_stats in rows:
+                writer.writerow(
+                    {
+                        "cache_offset": offset,
+                        "cache_end_offset": end_offset,
+                        **{key: row_stats.get(key, 0) for key in SIDECAR_COUNTERS},
+                    }
+                )
+                self.stats.update(row_stats)
+                self.covered_end = end_offset
+
+    def rebuild(self, workers: int = 1) -> Counter[str]:
+        """Reclassify the whole cache, in parallel byte-range chunks when workers > 1."""
+        self._read_cache_header()
+        self.stats = Counter()
+        self.covered_end = self._body_start
+        if not self._header:
+            self._write_rows([], "w")
+            return self.stats
+        if workers <= 1:
+            rows = _classify_byte_range(self.cache_path, self._header, self._body_start, None)
+        else:
+            jobs = [
+                (str(self.cache_path), self._header, self._body_start, start, end)
+                for start, end in _chunk_cuts(self.cache_path, self._body_start, workers * 4)
+            ]
+            rows = []
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for chunk_rows in executor.map(_classify_byte_range_job, jobs):
+                    rows.extend(chunk_rows)
+        self._write_rows(rows, "w")
+        return self.stats
+
+    def sync(self, workers: int = 1) -> Counter[str]:
+        """Classify cache rows appended since the sidecar was last written."""
+        if not self.cache_path.exists():
+            raise FileNotFoundError(f"Cache file not found: {self.cache_path}")
+        self._read_cache_header()
+        if not self._load():
+            return self.rebuild(workers=workers)
+        tail = _classify_byte_range(self.cache_path, self._header, self.covered_end, None)
+        if tail:
+            self._write_rows(tail, "a")
+        return self.stats
+
+    def record(self, offset: int, end_offset: int, row_stats: Counter[str]) -> None:
+        """Record one freshly appended cache row; gaps are left for `sync()`."""
+        if not self._header:
+            # The cache did not exist (or was empty) at sync time; the first
+            # append has just written its header, so coverage starts after it.
+            self._read_cache_header()
+            self.stats = Counter()
+            self.covered_end = self._body_start
+            self._write_rows([], "w")
+        if offset != self.covered_end:
+            return
+        self._write_rows([(offset, end_offset, row_stats)], "a")
+
+    def write_report(self, report_path: Path | None = None) -> Path:
+        final_report_path = report_path or default_report_path(self.cache_path)
+        report_lines = build_report_lines(self.cache_path, self.stats)
+        final_report_path.write_text("\n".join(report_lines) + "\n", encoding="utf-8")
+        return final_report_path
+
+
 def generate_zip_mismatch_report(
     cache_path: Path,
     report_path: Path | None = None,
+    incremental: bool = False,
+    workers: int = 1,
 ) -> tuple[Path, Counter[str]]:
     if not cache_path.exists():
         raise FileNotFoundError(f"Cache file not found: {cache_path}")
 
+    if incremental or workers > 1:
+        sidecar = ZipStatsSidecar(cache_path)
+        stats = sidecar.sync(workers=workers) if incremental else sidecar.rebuild(workers=workers)
+        return sidecar.write_report(report_path), stats
+
     stats: Counter[str] = Counter()
 
     with cache_path.open(newline="", encoding="utf-8") as handle:
         reader = csv.DictReader(handle)
         for row in reader:
-            stats["rows_total"] += 1
-
-            result_meta = parse_json_obj(
-                row.get("result_metadata", ""),
-                stats,
-                "bad_result_metadata_json",
-            )
-            process_meta = parse_json_obj(
-                row.get("process_metadata", ""),
-                stats,
-                "bad_process_metadata_json",
-            )
-
-            raw_zip = extract_raw_zip(process_meta)
-            result_zip = extract_result_zip(row, result_meta)
-
-            if raw_zip and result_zip:
-                if raw_zip == result_zip:
-                    stats["zip_match"] += 1
-                else:
-                    stats["zip_mismatch"] += 1
-            elif raw_zip and not result_zip:
-                stats["missing_result_zip"] += 1
-            elif result_zip and not raw_zip:
-                stats["missing_raw_zip"] += 1
-            else:
-                stats["missing_both_zip"] += 1
+            stats.update(classify_cache_row(row))
 
     final_report_path = report_path or default_report_path(cache_path)
     report_lines = build_report_lines(cache_path, stats)
@@ -189,6 +409,34 @@ def generate_zip_mismatch_report(
     return final_report_path, stats
 
 
+def generate_zip_mismatch_report_from_parquet(
+    parquet_path: Path,
+    report_path: Path | None = None,
+) -> tuple[Path, Counter[str]]:
+    """Same report, computed from the promoted columns of a Parquet cache (no JSON parsing)."""
+    from geocode_cache_parquet import read_cache_columns
+
+    if not parquet_path.exists():
+        raise FileNotFoundError(f"Parquet cache not found: {parquet_path}")
+
+    table = read_cache_columns(
+        parquet_path,
+        ["raw_zip", "result_zip", "bad_result_metadata_json", "bad_process_metadata_json"],
+    )
+    columns = table.to_pydict()
+    stats: Counter[str] = Counter()
+    stats["rows_total"] = table.num_rows
+    for raw_zip, result_zip in zip(columns["raw_zip"], columns["result_zip"]):
+        stats[classify_zip_pair(raw_zip, result_zip)] += 1
+    stats["bad_result_metadata_json"] = sum(bool(v) for v in columns["bad_result_metadata_json"])
+    stats["bad_process_metadata_json"] = sum(bool(v) for v in columns["bad_process_metadata_json"])
+
+    final_report_path = report_path or default_report_path(parquet_path)
+    report_lines = build_report_lines(parquet_path, stats)
+    final_report_path.write_text("\n".join(report_lines) + "\n", encoding="utf-8")
+    return final_report_path, stats
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description=(
@@ -208,9 +456,36 @@ def main() -> None:
         default=None,
         help="Path to output txt report (default: <cache_dir>/zip_mismatch_report.txt)",
     )
+    parser.add_argument(
+        "--parquet",
+        type=Path,
+        default=None,
+        help="Read promoted columns from a Parquet cache (see geocode_cache_parquet.py) instead of the CSV",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Use the per-row stats sidecar and classify only rows appended since the last run",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for a full (re)build of the stats sidecar",
+    )
     args = parser.parse_args()
-    report_path, stats = generate_zip_mismatch_report(args.cache, args.report)
-    report_lines = build_report_lines(args.cache, stats)
+    if args.parquet is not None:
+        source_path = args.parquet
+        report_path, stats = generate_zip_mismatch_report_from_parquet(args.parquet, args.report)
+    else:
+        source_path = args.cache
+        report_path, stats = generate_zip_mismatch_report(
+            args.cache,
+            args.report,
+            incremental=args.incremental,
+            workers=args.workers,
+        )
+    report_lines = build_report_lines(source_path, stats)
     print(f"report_file: {report_path}")
     for line in report_lines[2:]:
         if line:
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Build the local OpenAddresses index used by the geocoder.
+
+Loads the state's OpenAddresses dump (same discovery as openaddress_search_ri),
+normalizes (number, street, ZIP, city) and writes a SQLite index that
+NominatimSearch consults before any HTTP search.
+
+Usage:
+    python openaddress/openaddress_build_index.py
+    python openaddress/openaddress_build_index.py --source openaddress/us/ri/statewide.geojson
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+BASE_DIR = SCRIPT_DIR.parent
+DATA_GEOCODE_DIR = BASE_DIR / "data_geocode"
+for path in (SCRIPT_DIR, DATA_GEOCODE_DIR):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from openaddress_search_ri import DATA_DIR, find_dataset_file, load_df
+from nominatim_helpers.openaddress_index import build_openaddress_index
+
+DEFAULT_INDEX_FILE = DATA_DIR / "openaddress_index.sqlite"
+
+
+def _lon_lat(row: dict[str, Any]) -> tuple[Any, Any]:
+    """Coordinates from LON/LAT columns or a GeoJSON point geometry."""
+    lower = {str(k).lower(): v for k, v in row.items()}
+    lon, lat = lower.get("lon"), lower.get("lat")
+    if lon not in (None, "") and lat not in (None, ""):
+        return lon, lat
+    geometry = lower.get("geometry")
+    if isinstance(geometry, str) and geometry.startswith("["):
+        try:
+            geometry = ast.literal_eval(geometry)
+        except (ValueError, SyntaxError):
+            return None, None
+    if isinstance(geometry, (list, tuple)) and len(geometry) >= 2:
+        return geometry[0], geometry[1]
+    return None, None
+
+
+def iter_index_records(df) -> Iterator[dict[str, Any]]:
+    col_map = {c.lower(): c for c in df.columns}
+    wanted = {key: col_map.get(key) for key in ("number", "street", "postcode", "city", "id")}
+    for row in df.to_dict("records"):
+        lon, lat = _lon_lat(row)
+        record = {key: (row.get(col, "") if col else "") for key, col in wanted.items()}
+        record["lon"] = lon
+        record["lat"] = lat
+        yield record
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the local OpenAddresses geocoder index.")
+    parser.add_argument("--source", type=Path, default=None, help="Dataset file (default: first under DATA_DIR)")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_FILE, help="Output SQLite index")
+    args = parser.parse_args()
+
+    source = args.source or find_dataset_file(DATA_DIR)
+    print(f"Using dataset: {source}")
+    started = time.perf_counter()
+    df = load_df(source)
+    print(f"Loaded {len(df):,} rows in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    count = build_openaddress_index(iter_index_records(df), str(args.index))
+    size_mb = args.index.stat().st_size / 1e6
+    print(f"Indexed {count:,} addresses in {time.perf_counter() - started:.1f}s ({size_mb:.1f} MB)")
+    print(f"index_file: {args.index}")
+
+
+if __name__ == "__main__":
+    main()
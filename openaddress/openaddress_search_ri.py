@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """Quick search helper for OpenAddresses RI data."""
-from pathlib import Path
+import json
+import re
 import sys
+from pathlib import Path
+from typing import Iterator
 
 # --- Search terms (edit these) ---
 STATE = "ri"
@@ -26,6 +29,22 @@ except ImportError:
     print("pandas is required. Install with: pip install pandas")
     sys.exit(1)
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+# --- GeoJSON streaming / cache ---
+# Properties kept from each feature; everything else is dropped while parsing.
+KEEP_PROPERTIES = ["id", "number", "street", "unit", "city", "district", "region", "postcode", "hash"]
+CHUNK_ROWS = 50000
+READ_CHUNK_CHARS = 1 << 20
+FEATURES_ARRAY_RE = re.compile(r'"features"\s*:\s*\[')
+# Outside DATA_DIR so find_dataset_file never picks a cache file as the source.
+CACHE_DIR = BASE_DIR / "openaddress" / "cache"
+
 
 def find_dataset_file(data_dir: Path) -> Path:
     if not data_dir.exists():
@@ -44,6 +63,170 @@ def find_dataset_file(data_dir: Path) -> Path:
     return candidates[0]
 
 
+def _features_from_json_value(obj) -> list[dict]:
+    if isinstance(obj, dict) and obj.get("type") == "FeatureCollection":
+        return [f for f in obj.get("features", []) if isinstance(f, dict)]
+    if isinstance(obj, dict):
+        return [obj]
+    return []
+
+
+def _iter_feature_array(handle, buf: str) -> Iterator[dict]:
+    """Decode Feature objects one at a time from inside a `"features": [` array."""
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf) - 1 and not eof:
+            chunk = handle.read(READ_CHUNK_CHARS)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        if pos >= len(buf) or buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = handle.read(READ_CHUNK_CHARS)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        pos = end
+        if pos > READ_CHUNK_CHARS:
+            buf = buf[pos:]
+            pos = 0
+
+
+def iter_geojson_features(path: Path) -> Iterator[dict]:
+    """
+    Stream features from a GeoJSON FeatureCollection or newline-delimited JSON.
+
+    A FeatureCollection is decoded feature by feature from its `features`
+    array, so the whole document is never held in memory.
+    """
+    with path.open("r", encoding="utf-8") as handle:
+        head = handle.read(READ_CHUNK_CHARS)
+        first_line = head.split("\n", 1)[0].strip()
+        try:
+            json.loads(first_line)
+            is_ndjson = True
+        except json.JSONDecodeError:
+            is_ndjson = False
+        match = None if is_ndjson else FEATURES_ARRAY_RE.search(head)
+        while not is_ndjson and match is None:
+            chunk = handle.read(READ_CHUNK_CHARS)
+            if not chunk:
+                break
+            head += chunk
+            match = FEATURES_ARRAY_RE.search(head)
+        if match is not None:
+            yield from _iter_feature_array(handle, head[match.end():])
+            return
+        handle.seek(0)
+        for line in handle:
+            line = line.strip().rstrip(",")
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield from _features_from_json_value(obj)
+
+
+def _feature_row(feature: dict) -> dict:
+    props = feature.get("properties")
+    if not isinstance(props, dict):
+        props = feature if feature.get("type") != "Feature" else {}
+    geom = feature.get("geometry") or {}
+    coords = geom.get("coordinates") if isinstance(geom, dict) else None
+    lon = lat = None
+    if isinstance(coords, (list, tuple)) and len(coords) >= 2 and not isinstance(coords[0], list):
+        lon, lat = coords[0], coords[1]
+    row = {key: ("" if props.get(key) is None else str(props.get(key))) for key in KEEP_PROPERTIES}
+    row["lon"] = lon
+    row["lat"] = lat
+    return row
+
+
+def iter_feature_chunks(path: Path, chunk_rows: int = CHUNK_ROWS) -> Iterator["pd.DataFrame"]:
+    """Yield DataFrames of KEEP_PROPERTIES (str) plus float lon/lat, chunk_rows at a time."""
+    rows: list[dict] = []
+    for feature in iter_geojson_features(path):
+        rows.append(_feature_row(feature))
+        if len(rows) >= chunk_rows:
+            yield _typed_frame(rows)
+            rows = []
+    if rows:
+        yield _typed_frame(rows)
+
+
+def _typed_frame(rows: list[dict]) -> "pd.DataFrame":
+    df = pd.DataFrame(rows, columns=[*KEEP_PROPERTIES, "lon", "lat"])
+    df["lon"] = pd.to_numeric(df["lon"], errors="coerce").astype("float64")
+    df["lat"] = pd.to_numeric(df["lat"], errors="coerce").astype("float64")
+    return df
+
+
+def geojson_cache_path(path: Path) -> Path:
+    return CACHE_DIR / f"{STATE}_{path.stem}.parquet"
+
+
+def _source_key(path: Path) -> dict[bytes, bytes]:
+    stat = path.stat()
+    return {
+        b"source_path": str(path.resolve()).encode("utf-8"),
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode("utf-8"),
+        b"source_size": str(stat.st_size).encode("utf-8"),
+    }
+
+
+def _cache_is_fresh(cache_path: Path, source_key: dict[bytes, bytes]) -> bool:
+    if not cache_path.exists():
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except Exception:
+        return False
+    return all(metadata.get(k) == v for k, v in source_key.items())
+
+
+def load_geojson_df(path: Path) -> "pd.DataFrame":
+    """
+    Load a GeoJSON/NDJSON dump through the streaming parser.
+
+    With pyarrow installed, chunks are also written to a Parquet cache keyed
+    on the source file's path, mtime and size; later runs read that instead.
+    """
+    if pq is None:
+        chunks = list(iter_feature_chunks(path))
+        return pd.concat(chunks, ignore_index=True) if chunks else _typed_frame([])
+
+    cache_path = geojson_cache_path(path)
+    source_key = _source_key(path)
+    if _cache_is_fresh(cache_path, source_key):
+        print(f"Using Parquet cache: {cache_path}")
+        return pd.read_parquet(cache_path)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".parquet.tmp")
+    schema = pa.Schema.from_pandas(_typed_frame([]), preserve_index=False).with_metadata(source_key)
+    with pq.ParquetWriter(str(tmp_path), schema, compression="zstd") as writer:
+        for chunk in iter_feature_chunks(path):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    tmp_path.replace(cache_path)
+    print(f"Wrote Parquet cache: {cache_path}")
+    return pd.read_parquet(cache_path)
+
+
 def load_zip_csv(path: Path) -> "pd.DataFrame":
     import zipfile
 
@@ -81,63 +264,7 @@ def load_df(path: Path) -> "pd.DataFrame":
             low_memory=False,
         )
     if ext in {".json", ".geojson"}:
-        import json
-        from json import JSONDecodeError
-
-        def features_to_df(features: list[dict]) -> "pd.DataFrame":
-            rows = []
-            for feature in features:
-                if not isinstance(feature, dict):
-                    continue
-                props = feature.get("properties") or {}
-                geom = feature.get("geometry") or {}
-                row = {}
-                if isinstance(props, dict):
-                    row.update(props)
-                if isinstance(geom, dict):
-                    row["geometry_type"] = geom.get("type", "")
-                    row["geometry"] = geom.get("coordinates", "")
-                rows.append(row)
-            return pd.DataFrame(rows).astype(str)
-
-        try:
-            with path.open("r", encoding="utf-8") as f:
-                obj = json.load(f)
-
-            # Handle GeoJSON FeatureCollection
-            if isinstance(obj, dict) and obj.get("type") == "FeatureCollection":
-                features = obj.get("features", [])
-                return features_to_df(features)
-
-            # Handle single Feature object
-            if isinstance(obj, dict) and obj.get("type") == "Feature":
-                return features_to_df([obj])
-
-            # Fallback to pandas for non-GeoJSON JSON
-            df = pd.read_json(path)
-            return df.astype(str)
-        except JSONDecodeError:
-            # Likely newline-delimited JSON (one Feature per line)
-            rows = []
-            with path.open("r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except JSONDecodeError:
-                        continue
-                    if isinstance(obj, dict) and obj.get("type") == "FeatureCollection":
-                        features = obj.get("features", [])
-                        rows.extend(features)
-                        continue
-                    if isinstance(obj, dict) and obj.get("type") == "Feature":
-                        rows.append(obj)
-                        continue
-                    if isinstance(obj, dict):
-                        rows.append(obj)
-            return features_to_df(rows)
+        return load_geojson_df(path)
 
     raise ValueError(f"Unsupported file type: {path}")
 
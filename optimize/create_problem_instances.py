@@ -11,8 +11,10 @@ Step-by-step:
 5. Compute lookback features (`stops_in_previous_7`, `stops_in_previous_30`).
 6. Add active BIN/routine stops with recent activity even if not in range
    (`visits_in_range` becomes 0 for those).
-7. Freeze stop order and query OSRM table API for pairwise travel matrices.
-8. Write a JSON payload to `problem_instance_YYYY_MM_DD.csv`.
+7. Freeze stop order and query OSRM table API for pairwise travel matrices
+   (pairs already in the SQLite matrix store are reused, see osrm_matrix_store).
+8. Write a JSON payload to `problem_instance_YYYY_MM_DD.csv`, or with
+   `--format npy` a binary instance directory (see problem_instance_io.py).
 
 OSRM unit notes:
 - Duration values are in seconds.
@@ -32,14 +34,13 @@ import argparse
 import ast
 import json
 import math
+import sys
 from datetime import timedelta
 from pathlib import Path
 from typing import Any
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError as exc:
     raise SystemExit(
@@ -47,6 +48,11 @@ except ImportError as exc:
         "./.venv/bin/python optimize/create_problem_instances.py"
     ) from exc
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "routing"))
+from osrm_client import get_osrm_client  # noqa: E402
+from osrm_matrix_store import MatrixStore  # noqa: E402
+from problem_instance_io import write_binary_instance, write_json_instance  # noqa: E402
+
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -59,7 +65,11 @@ DEFAULT_BINS_CSV = PROJECT_ROOT / "visualizations" / "data_bins.csv"
 DEFAULT_ROUTINE_CSV = PROJECT_ROOT / "visualizations" / "data_routine.csv"
 DEFAULT_OSRM_BASE_URL = "http://localhost:5000"
 DEFAULT_REQUEST_TIMEOUT_SECONDS = 30
-DEFAULT_TABLE_CHUNK_SIZE = 40
+DEFAULT_TABLE_CHUNK_SIZE = 0  # 0 = auto from DEFAULT_OSRM_MAX_TABLE_SIZE
+DEFAULT_OSRM_MAX_TABLE_SIZE = 100  # osrm-routed --max-table-size default
+DEFAULT_TABLE_WORKERS = 8
+DEFAULT_MATRIX_STORE = SCRIPT_DIR / "cache" / "osrm_matrix_store.sqlite"
+DEFAULT_OSRM_DATASET_ID = "default"  # change when the OSRM extract is rebuilt
 
 LOG_PREFIX = "[create_problem_instances]"
 DEPOT_DISPLAY_NAME = "DEPOT, OLD PLAINFEILD PIKE AND TUNK HILL ROAD"
@@ -287,50 +297,39 @@ def iter_chunks(indices: list[int], chunk_size: int) -> list[list[int]]:
 
 def fetch_osrm_submatrix(
     source_coords: list[tuple[float, float]],
-    dest_coords: list[tuple[float, float]],
+    dest_coords: list[tuple[float, float]] | None,
     osrm_base_url: str,
     request_timeout_seconds: int,
 ) -> tuple[list[list[float | None]], list[list[float | None]]]:
-    all_coords = source_coords + dest_coords
-    coord_segment = ";".join(f"{lon},{lat}" for lat, lon in all_coords)
-    source_indices = ";".join(str(i) for i in range(len(source_coords)))
-    dest_indices = ";".join(str(len(source_coords) + i) for i in range(len(dest_coords)))
-
-    query = urlencode(
-        {
-            "annotations": "duration,distance",
-            "sources": source_indices,
-            "destinations": dest_indices,
-        }
-    )
-    url = f"{osrm_base_url.rstrip('/')}/table/v1/driving/{coord_segment}?{query}"
+    client = get_osrm_client(osrm_base_url, request_timeout_seconds)
+    return client.table(source_coords, dest_coords)
 
-    try:
-        with urlopen(url, timeout=request_timeout_seconds) as response:
-            payload = json.load(response)
-    except HTTPError as exc:
-        raise RuntimeError(f"OSRM table request failed with status {exc.code}") from exc
-    except URLError as exc:
-        raise RuntimeError(
-            f"Could not connect to OSRM at {osrm_base_url}. "
-            "Make sure the OSRM Docker container is running."
-        ) from exc
-
-    if payload.get("code") != "Ok":
-        raise RuntimeError(f"OSRM table response error: {payload}")
 
-    durations_raw = payload.get("durations", [])
-    distances_raw = payload.get("distances", [])
+def auto_table_chunk_size(stop_count: int, max_table_size: int) -> int:
+    """Largest block that fits max-table-size: one square request, or half-size blocks."""
+    max_table_size = max(2, int(max_table_size))
+    if stop_count <= max_table_size:
+        return max(1, stop_count)
+    return max_table_size // 2
 
-    durations: list[list[float | None]] = []
-    for row in durations_raw:
-        durations.append([to_float_or_none(value) for value in row])
 
-    distances: list[list[float | None]] = []
-    for row in distances_raw:
-        distances.append([to_float_or_none(value) for value in row])
+def stops_covering_unknown_pairs(known: np.ndarray) -> list[int]:
+    """Stops whose rows and columns, fetched from OSRM, cover every unknown pair.
 
-    return durations, distances
+    Stops never seen before (unknown to themselves) are taken first; the rest
+    are picked greedily by how many unknown pairs they still touch.
+    """
+    unknown = ~known
+    selected = np.flatnonzero(np.diag(unknown))
+    unknown[selected, :] = False
+    unknown[:, selected] = False
+    picked = selected.tolist()
+    while unknown.any():
+        idx = int(np.argmax(unknown.sum(axis=0) + unknown.sum(axis=1)))
+        picked.append(idx)
+        unknown[idx, :] = False
+        unknown[:, idx] = False
+    return sorted(picked)
 
 
 def build_osrm_matrices(
@@ -339,27 +338,63 @@ def build_osrm_matrices(
     request_timeout_seconds: int,
     table_chunk_size: int,
     verbose: bool = True,
-) -> tuple[list[list[float | None]], list[list[float | None]]]:
+    max_table_size: int = DEFAULT_OSRM_MAX_TABLE_SIZE,
+    table_workers: int = DEFAULT_TABLE_WORKERS,
+    matrix_store: MatrixStore | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Duration (s) and distance (m) matrices, NaN where OSRM has no value.
+
+    Pairs already in matrix_store are reused; only stops with a missing pair
+    are requested (their rows against all stops, and the known stops' rows
+    against them). Blocks of the table are requested concurrently and written
+    straight into preallocated arrays. table_chunk_size <= 0 picks the chunk
+    size from max_table_size; an explicit chunk size is capped so every
+    request fits.
+    """
     stop_count = len(coords)
-    duration_matrix: list[list[float | None]] = [
-        [None for _ in range(stop_count)] for _ in range(stop_count)
-    ]
-    distance_matrix: list[list[float | None]] = [
-        [None for _ in range(stop_count)] for _ in range(stop_count)
-    ]
+    duration_matrix = np.full((stop_count, stop_count), np.nan)
+    distance_matrix = np.full((stop_count, stop_count), np.nan)
 
-    valid_indices = [idx for idx, coord in enumerate(coords) if coord is not None]
-    if not valid_indices:
+    valid_indices = np.array([idx for idx, coord in enumerate(coords) if coord is not None], dtype=np.intp)
+    if not len(valid_indices):
         log_debug("No stops with coordinates; OSRM matrices are all null.", verbose=verbose)
         return duration_matrix, distance_matrix
 
-    compact_coords = [coords[idx] for idx in valid_indices if coords[idx] is not None]
-    compact_chunks = iter_chunks(list(range(len(compact_coords))), max(1, table_chunk_size))
-    total_blocks = len(compact_chunks) * len(compact_chunks)
+    compact_coords = [coords[idx] for idx in valid_indices]
+    if matrix_store is not None:
+        compact_duration, compact_distance, known = matrix_store.lookup(compact_coords)
+    else:
+        compact_duration = np.full((len(compact_coords), len(compact_coords)), np.nan)
+        compact_distance = np.full((len(compact_coords), len(compact_coords)), np.nan)
+        known = np.zeros((len(compact_coords), len(compact_coords)), dtype=bool)
+    missing_stops = stops_covering_unknown_pairs(known)
+    known_stops = sorted(set(range(len(compact_coords))) - set(missing_stops))
+    if matrix_store is not None:
+        log_debug(
+            f"Matrix store {matrix_store.path} (dataset {matrix_store.dataset_id}): "
+            f"{int(known.sum())}/{known.size} pairs known, "
+            f"{len(missing_stops)}/{len(compact_coords)} stops need OSRM.",
+            verbose=verbose,
+        )
+
+    if table_chunk_size > 0:
+        chunk_size = known_chunk_size = min(table_chunk_size, max(1, max_table_size // 2))
+    elif known_stops:
+        # Missing x known blocks carry both chunks; give the known side the rest of the limit.
+        chunk_size = max(1, min(len(missing_stops), max_table_size // 2))
+        known_chunk_size = max(1, max_table_size - chunk_size)
+    else:
+        chunk_size = known_chunk_size = auto_table_chunk_size(len(missing_stops), max_table_size)
+    missing_chunks = iter_chunks(missing_stops, chunk_size)
+    known_chunks = iter_chunks(known_stops, known_chunk_size)
+    blocks = [(source_chunk, dest_chunk) for source_chunk in missing_chunks for dest_chunk in missing_chunks]
+    blocks += [(source_chunk, dest_chunk) for source_chunk in missing_chunks for dest_chunk in known_chunks]
+    blocks += [(source_chunk, dest_chunk) for source_chunk in known_chunks for dest_chunk in missing_chunks]
     log_debug(
         "Requesting OSRM table matrix "
         f"for {len(compact_coords)} stops with coordinates "
-        f"({len(compact_chunks)}x{len(compact_chunks)} = {total_blocks} block requests).",
+        f"({len(blocks)} block requests, chunk size {chunk_size}/{known_chunk_size}, "
+        f"{table_workers} workers).",
         verbose=verbose,
     )
     log_debug(
@@ -367,42 +402,39 @@ def build_osrm_matrices(
         verbose=verbose,
     )
 
-    compact_duration: list[list[float | None]] = [
-        [None for _ in range(len(compact_coords))] for _ in range(len(compact_coords))
-    ]
-    compact_distance: list[list[float | None]] = [
-        [None for _ in range(len(compact_coords))] for _ in range(len(compact_coords))
-    ]
-
-    block_number = 0
-    for source_chunk in compact_chunks:
+    def fetch_block(block: tuple[list[int], list[int]]) -> tuple[list[int], list[int]]:
+        source_chunk, dest_chunk = block
         source_coords = [compact_coords[idx] for idx in source_chunk]
-        for dest_chunk in compact_chunks:
-            block_number += 1
-            log_debug(
-                f"OSRM block {block_number}/{total_blocks} "
-                f"(sources={len(source_chunk)}, destinations={len(dest_chunk)})",
-                verbose=verbose,
-            )
-            dest_coords = [compact_coords[idx] for idx in dest_chunk]
-            sub_durations, sub_distances = fetch_osrm_submatrix(
-                source_coords=source_coords,
-                dest_coords=dest_coords,
-                osrm_base_url=osrm_base_url,
-                request_timeout_seconds=request_timeout_seconds,
-            )
-
-            for i_local, i_compact in enumerate(source_chunk):
-                for j_local, j_compact in enumerate(dest_chunk):
-                    compact_duration[i_compact][j_compact] = sub_durations[i_local][j_local]
-                    compact_distance[i_compact][j_compact] = sub_distances[i_local][j_local]
-
-    for i_compact, i_full in enumerate(valid_indices):
-        for j_compact, j_full in enumerate(valid_indices):
-            duration_matrix[i_full][j_full] = compact_duration[i_compact][j_compact]
-            distance_matrix[i_full][j_full] = compact_distance[i_compact][j_compact]
-
-    log_debug("Finished OSRM table matrix assembly.", verbose=verbose)
+        dest_coords = None if source_chunk is dest_chunk else [compact_coords[idx] for idx in dest_chunk]
+        sub_durations, sub_distances = fetch_osrm_submatrix(
+            source_coords=source_coords,
+            dest_coords=dest_coords,
+            osrm_base_url=osrm_base_url,
+            request_timeout_seconds=request_timeout_seconds,
+        )
+        # Blocks never overlap, so workers can write their cells without a lock.
+        cells = np.ix_(source_chunk, dest_chunk)
+        compact_duration[cells] = np.array(sub_durations, dtype=float)
+        compact_distance[cells] = np.array(sub_distances, dtype=float)
+        return block
+
+    client = get_osrm_client(osrm_base_url, request_timeout_seconds)
+    results = client.map_concurrent(fetch_block, blocks, max(1, table_workers))
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        raise failures[0]
+
+    if matrix_store is not None and missing_stops:
+        fetched = np.zeros_like(known)
+        fetched[missing_stops, :] = True
+        fetched[:, missing_stops] = True
+        saved = matrix_store.save(compact_coords, compact_duration, compact_distance, fetched)
+        log_debug(f"Saved {saved} pairs to the matrix store.", verbose=verbose)
+
+    cells = np.ix_(valid_indices, valid_indices)
+    duration_matrix[cells] = compact_duration
+    distance_matrix[cells] = compact_distance
+    log_debug(f"Finished OSRM table matrix assembly. {client.stats.summary()}", verbose=verbose)
     return duration_matrix, distance_matrix
 
 
@@ -419,6 +451,10 @@ def create_problem_instance(
     skip_osrm: bool,
     include_all_active: bool,
     verbose: bool = True,
+    max_table_size: int = DEFAULT_OSRM_MAX_TABLE_SIZE,
+    table_workers: int = DEFAULT_TABLE_WORKERS,
+    matrix_store: MatrixStore | None = None,
+    output_format: str = "json",
 ) -> dict[str, Any]:
     log_debug(f"Loading geocoded stops: {geocode_csv_path}", verbose=verbose)
     geocode_df = load_geocode_dataframe(geocode_csv_path)
@@ -637,15 +673,18 @@ def create_problem_instance(
             "Travel time units would be seconds and distance units would be meters.",
             verbose=verbose,
         )
-        travel_time_matrix_seconds = [[None for _ in stops] for _ in stops]
-        travel_distance_matrix_meters = [[None for _ in stops] for _ in stops]
+        travel_time_matrix = np.full((len(stops), len(stops)), np.nan)
+        travel_distance_matrix = np.full((len(stops), len(stops)), np.nan)
     else:
-        travel_time_matrix_seconds, travel_distance_matrix_meters = build_osrm_matrices(
+        travel_time_matrix, travel_distance_matrix = build_osrm_matrices(
             coords=coord_list,
             osrm_base_url=osrm_base_url,
             request_timeout_seconds=request_timeout_seconds,
             table_chunk_size=table_chunk_size,
             verbose=verbose,
+            max_table_size=max_table_size,
+            table_workers=table_workers,
+            matrix_store=matrix_store,
         )
 
     payload = {
@@ -655,13 +694,16 @@ def create_problem_instance(
         "travel_time_unit": "seconds",
         "travel_distance_unit": "meters",
         "stops": stops,
-        "travel_time_matrix_seconds": travel_time_matrix_seconds,
-        "travel_distance_matrix_meters": travel_distance_matrix_meters,
+        "travel_time_matrix_seconds": travel_time_matrix,
+        "travel_distance_matrix_meters": travel_distance_matrix,
     }
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
-    log_debug(f"Wrote output JSON payload: {output_path}", verbose=verbose)
+    if output_format == "npy":
+        write_binary_instance(output_path, payload)
+        log_debug(f"Wrote binary instance (instance.json + .npy matrices): {output_path}", verbose=verbose)
+    else:
+        write_json_instance(output_path, payload)
+        log_debug(f"Wrote output JSON payload: {output_path}", verbose=verbose)
 
     return payload
 
@@ -703,6 +745,15 @@ def main() -> None:
             "(JSON content in file)."
         ),
     )
+    parser.add_argument(
+        "--format",
+        choices=["json", "npy"],
+        default="json",
+        help=(
+            "Instance format: json (single file) or npy (directory with instance.json "
+            "and memory-mappable .npy matrices)."
+        ),
+    )
     parser.add_argument(
         "--osrm-base-url",
         default=DEFAULT_OSRM_BASE_URL,
@@ -718,7 +769,34 @@ def main() -> None:
         "--table-chunk-size",
         type=int,
         default=DEFAULT_TABLE_CHUNK_SIZE,
-        help="Chunk size used for OSRM table API block requests.",
+        help="Chunk size used for OSRM table API block requests (0 = auto from --osrm-max-table-size).",
+    )
+    parser.add_argument(
+        "--osrm-max-table-size",
+        type=int,
+        default=DEFAULT_OSRM_MAX_TABLE_SIZE,
+        help="The OSRM server's --max-table-size (coordinates per table request).",
+    )
+    parser.add_argument(
+        "--table-workers",
+        type=int,
+        default=DEFAULT_TABLE_WORKERS,
+        help="OSRM table block requests in flight.",
+    )
+    parser.add_argument(
+        "--matrix-store",
+        default=str(DEFAULT_MATRIX_STORE),
+        help="SQLite store of OSRM pairs reused across instances.",
+    )
+    parser.add_argument(
+        "--no-matrix-store",
+        action="store_true",
+        help="Always request the full OSRM table.",
+    )
+    parser.add_argument(
+        "--osrm-dataset-id",
+        default=DEFAULT_OSRM_DATASET_ID,
+        help="OSRM extract ID used in matrix store keys; change it after rebuilding the extract.",
     )
     parser.add_argument(
         "--skip-osrm",
@@ -759,7 +837,9 @@ def main() -> None:
     if args.output.strip():
         output_path = Path(args.output).expanduser().resolve()
     else:
-        output_name = f"problem_instance_{start_date.strftime('%Y_%m_%d')}.csv"
+        output_name = f"problem_instance_{start_date.strftime('%Y_%m_%d')}"
+        if args.format == "json":
+            output_name += ".csv"
         output_path = (SCRIPT_DIR / output_name).resolve()
 
     log_debug(
@@ -785,6 +865,10 @@ def main() -> None:
         if not path.exists():
             raise SystemExit(f"{label} not found: {path}")
 
+    matrix_store = None
+    if not args.skip_osrm and not args.no_matrix_store and str(args.matrix_store).strip():
+        matrix_store = MatrixStore(Path(args.matrix_store).expanduser(), args.osrm_dataset_id)
+
     payload = create_problem_instance(
         geocode_csv_path=geocode_csv_path,
         bins_csv_path=bins_csv_path,
@@ -794,11 +878,17 @@ def main() -> None:
         output_path=output_path,
         osrm_base_url=args.osrm_base_url,
         request_timeout_seconds=max(1, int(args.request_timeout_seconds)),
-        table_chunk_size=max(1, int(args.table_chunk_size)),
+        table_chunk_size=max(0, int(args.table_chunk_size)),
         skip_osrm=bool(args.skip_osrm),
         include_all_active=bool(args.include_all_active),
         verbose=verbose,
+        max_table_size=max(2, int(args.osrm_max_table_size)),
+        table_workers=max(1, int(args.table_workers)),
+        matrix_store=matrix_store,
+        output_format=args.format,
     )
+    if matrix_store is not None:
+        matrix_store.close()
 
     missing_coord_count = sum(
         1 for stop in payload["stops"] if stop.get("latitude") is None or stop.get("longitude") is None
@@ -812,6 +902,8 @@ def main() -> None:
         f"OSRM units: travel_time={payload['travel_time_unit']}, "
         f"travel_distance={payload['travel_distance_unit']}"
     )
+    if not args.skip_osrm:
+        print(get_osrm_client(args.osrm_base_url, max(1, int(args.request_timeout_seconds))).stats.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+"""
+Persistent pairwise OSRM travel-time/distance store for problem instances.
+
+Pairs are keyed by canonical stop coordinates (lat/lon rounded to
+COORD_DECIMALS) plus a dataset ID naming the OSRM extract. Daily instances
+share most stops (depot, BINs, routine donors, Savers), so build_osrm_matrices
+reads the known pairs from here and only sends the stops with missing pairs
+to OSRM.
+
+A stored pair with NULL values means OSRM returned no route; it is known,
+not missing.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+COORD_DECIMALS = 6
+DEFAULT_DATASET_ID = "default"
+
+
+def coord_key(coord: tuple[float, float]) -> str:
+    lat, lon = coord
+    return f"{float(lat):.{COORD_DECIMALS}f},{float(lon):.{COORD_DECIMALS}f}"
+
+
+def _nullable(value: float) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+class MatrixStore:
+    def __init__(self, path: str | Path, dataset_id: str = DEFAULT_DATASET_ID) -> None:
+        self.path = Path(path)
+        self.dataset_id = dataset_id or DEFAULT_DATASET_ID
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pairs ("
+            " dataset_id TEXT NOT NULL,"
+            " src TEXT NOT NULL,"
+            " dst TEXT NOT NULL,"
+            " duration_s REAL,"
+            " distance_m REAL,"
+            " PRIMARY KEY (dataset_id, src, dst)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def lookup(self, coords: list[tuple[float, float]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(durations, distances, known) for every ordered pair of coords."""
+        keys = [coord_key(coord) for coord in coords]
+        size = len(keys)
+        durations = np.full((size, size), np.nan)
+        distances = np.full((size, size), np.nan)
+        known = np.zeros((size, size), dtype=bool)
+        if not size:
+            return durations, distances, known
+
+        positions: dict[str, list[int]] = {}
+        for idx, key in enumerate(keys):
+            positions.setdefault(key, []).append(idx)
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (key TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM wanted")
+        self._conn.executemany("INSERT INTO wanted (key) VALUES (?)", [(key,) for key in positions])
+        rows = self._conn.execute(
+            "SELECT p.src, p.dst, p.duration_s, p.distance_m FROM pairs p"
+            " JOIN wanted a ON p.src = a.key JOIN wanted b ON p.dst = b.key"
+            " WHERE p.dataset_id = ?",
+            (self.dataset_id,),
+        )
+        for src, dst, duration_s, distance_m in rows:
+            rows_idx = positions[src]
+            cols_idx = positions[dst]
+            cells = np.ix_(rows_idx, cols_idx)
+            durations[cells] = np.nan if duration_s is None else duration_s
+            distances[cells] = np.nan if distance_m is None else distance_m
+            known[cells] = True
+        return durations, distances, known
+
+    def save(
+        self,
+        coords: list[tuple[float, float]],
+        durations: np.ndarray,
+        distances: np.ndarray,
+        cells: np.ndarray,
+    ) -> int:
+        """Store the pairs where `cells` is True; returns the number written."""
+        keys = [coord_key(coord) for coord in coords]
+        rows, cols = np.nonzero(cells)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO pairs (dataset_id, src, dst, duration_s, distance_m)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    self.dataset_id,
+                    keys[i],
+                    keys[j],
+                    _nullable(durations[i, j]),
+                    _nullable(distances[i, j]),
+                )
+                for i, j in zip(rows.tolist(), cols.tolist())
+            ),
+        )
+        self._conn.commit()
+        return len(rows)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Binary problem-instance format and converters to/from the JSON format.
+
+A binary instance is a directory:
+
+  problem_instance_YYYY_MM_DD/
+    instance.json                        header + stops (everything but the matrices)
+    travel_time_matrix_seconds.npy       float64 N x N, NaN = no value
+    travel_distance_matrix_meters.npy    float64 N x N, NaN = no value
+
+`instance.json` lists the matrix files under `"matrix_files"`. Matrices are
+loaded with `np.load(..., mmap_mode="r")`, so a solver or analysis only pages
+in what it reads. See problem_instance_format.md for the field semantics.
+
+Converters:
+  ./.venv/bin/python optimize/problem_instance_io.py to-npy \
+    optimize/problem_instance_2024_11_01.csv optimize/problem_instance_2024_11_01
+  ./.venv/bin/python optimize/problem_instance_io.py to-json \
+    optimize/problem_instance_2024_11_01 optimize/problem_instance_2024_11_01.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+FORMAT_NAME = "problem-instance-npy"
+FORMAT_VERSION = 1
+HEADER_FILE = "instance.json"
+MATRIX_FIELDS = ("travel_time_matrix_seconds", "travel_distance_matrix_meters")
+
+
+def matrix_to_rows(matrix: np.ndarray) -> list[list[float | None]]:
+    """NaN-for-missing matrix to JSON-ready rows with None."""
+    matrix = np.asarray(matrix, dtype=float)
+    rows = matrix.astype(object)
+    rows[np.isnan(matrix)] = None
+    return rows.tolist()
+
+
+def rows_to_matrix(rows: Any) -> np.ndarray:
+    """JSON rows (None/invalid = missing) to a float64 matrix with NaN."""
+    try:
+        return np.array(rows, dtype=float)
+    except (TypeError, ValueError):
+        def cell(value: Any) -> float:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+
+        return np.array([[cell(value) for value in row] for row in rows], dtype=float)
+
+
+def is_binary_instance(path: Path) -> bool:
+    path = Path(path)
+    return (path.is_dir() and (path / HEADER_FILE).exists()) or path.name == HEADER_FILE
+
+
+def write_binary_instance(output_dir: Path, payload: dict[str, Any]) -> Path:
+    """Write payload (matrices as arrays or rows) as a binary instance directory."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    header = {key: value for key, value in payload.items() if key not in MATRIX_FIELDS}
+    header["format"] = FORMAT_NAME
+    header["format_version"] = FORMAT_VERSION
+    header["matrix_files"] = {}
+    for field in MATRIX_FIELDS:
+        if field not in payload:
+            continue
+        matrix = payload[field]
+        if not isinstance(matrix, np.ndarray):
+            matrix = rows_to_matrix(matrix)
+        file_name = f"{field}.npy"
+        tmp_path = output_dir / f"{file_name}.tmp"
+        with open(tmp_path, "wb") as handle:
+            np.save(handle, np.ascontiguousarray(matrix, dtype=np.float64))
+        os.replace(tmp_path, output_dir / file_name)
+        header["matrix_files"][field] = file_name
+
+    header_path = output_dir / HEADER_FILE
+    tmp_path = output_dir / f"{HEADER_FILE}.tmp"
+    tmp_path.write_text(json.dumps(header, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, header_path)
+    return header_path
+
+
+def load_binary_instance(path: Path, mmap: bool = True) -> dict[str, Any]:
+    """Header fields plus matrices as (read-only, memory-mapped) float64 arrays."""
+    path = Path(path)
+    instance_dir = path.parent if path.name == HEADER_FILE else path
+    header = json.loads((instance_dir / HEADER_FILE).read_text(encoding="utf-8"))
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError(f"Not a binary problem instance: {instance_dir}")
+    instance = dict(header)
+    stop_count = int(header.get("stop_count", len(header.get("stops", []))))
+    for field, file_name in header.get("matrix_files", {}).items():
+        matrix = np.load(instance_dir / file_name, mmap_mode="r" if mmap else None)
+        if matrix.shape != (stop_count, stop_count):
+            raise ValueError(
+                f"{field} shape {matrix.shape} does not match stop_count={stop_count} in {instance_dir}"
+            )
+        instance[field] = matrix
+    return instance
+
+
+def load_json_instance(path: Path) -> dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def write_json_instance(output_path: Path, payload: dict[str, Any]) -> None:
+    document = {key: value for key, value in payload.items() if key not in ("format", "format_version", "matrix_files")}
+    for field in MATRIX_FIELDS:
+        if isinstance(document.get(field), np.ndarray):
+            document[field] = matrix_to_rows(document[field])
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(document, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert problem instances between JSON and binary (.npy) formats.")
+    parser.add_argument("direction", choices=["to-npy", "to-json"])
+    parser.add_argument("source", help="Source instance (JSON file for to-npy, directory for to-json).")
+    parser.add_argument("destination", help="Destination (directory for to-npy, JSON file for to-json).")
+    args = parser.parse_args()
+
+    source = Path(args.source).expanduser()
+    destination = Path(args.destination).expanduser()
+    if args.direction == "to-npy":
+        payload = load_json_instance(source)
+        for field in MATRIX_FIELDS:
+            if field in payload:
+                payload[field] = rows_to_matrix(payload[field])
+        header_path = write_binary_instance(destination, payload)
+        print(f"Wrote binary instance: {header_path.parent}")
+    else:
+        payload = load_binary_instance(source, mmap=False)
+        write_json_instance(destination, payload)
+        print(f"Wrote JSON instance: {destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 """Solve a problem instance with Google OR-Tools and produce map-ready route output.
 
 Purpose:
-- Read a problem-instance file (JSON content; often saved with `.csv` extension).
+- Read a problem-instance file (JSON content; often saved with `.csv` extension)
+  or a binary instance directory (`instance.json` + `.npy` matrices).
 - Solve a vehicle-routing problem (VRP) with OR-Tools using a selected cost matrix.
 - Write a solution CSV that matches the column structure used by
   `data_geocode/latest/data_geocode.csv`, so `visualizations/viz_map_routes_on_road.py`
@@ -58,6 +59,10 @@ except ModuleNotFoundError as exc:  # pragma: no cover - runtime dependency guar
         "./.venv/bin/pip install ortools"
     ) from exc
 
+import numpy as np
+
+from problem_instance_io import is_binary_instance, load_binary_instance, rows_to_matrix
+
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -155,42 +160,41 @@ def format_duration(value: Any) -> str:
     return f"{rounded:.3f}".rstrip("0").rstrip(".")
 
 
+def _to_float_array(values: list[Any]) -> np.ndarray:
+    """1-D float array; None and non-numeric values become NaN."""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        def cell(value: Any) -> float:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+
+        return np.array([cell(value) for value in values], dtype=float)
+
+
 def build_stop_service_seconds(
     stops: list[dict[str, Any]],
     depot_index: int,
 ) -> tuple[list[int], int]:
-    service_seconds: list[int] = []
-    missing_or_invalid_count = 0
-
-    for node_idx, stop in enumerate(stops):
-        if node_idx == depot_index:
-            service_seconds.append(0)
-            continue
-
-        value = stop.get("mean_stop_duration") if isinstance(stop, dict) else None
-        if value is None:
-            service_seconds.append(0)
-            missing_or_invalid_count += 1
-            continue
-
-        try:
-            minutes = float(value)
-        except (TypeError, ValueError):
-            service_seconds.append(0)
-            missing_or_invalid_count += 1
-            continue
-
-        if math.isnan(minutes) or minutes < 0:
-            service_seconds.append(0)
-            missing_or_invalid_count += 1
-            continue
-
-        service_seconds.append(max(0, int(round(minutes * 60.0))))
-
-    return service_seconds, missing_or_invalid_count
+    minutes = _to_float_array(
+        [stop.get("mean_stop_duration") if isinstance(stop, dict) else None for stop in stops]
+    )
+    with np.errstate(invalid="ignore"):
+        invalid = ~np.isfinite(minutes) | (minutes < 0)
+    invalid[depot_index] = False
+    service_seconds = np.where(invalid, 0.0, np.maximum(0.0, np.rint(minutes * 60.0)))
+    service_seconds[depot_index] = 0
+    return service_seconds.astype(np.int64).tolist(), int(invalid.sum())
 
 
 def load_instance(instance_path: Path) -> dict[str, Any]:
+    if is_binary_instance(instance_path):
+        try:
+            return load_binary_instance(instance_path)
+        except ValueError as exc:
+            raise SystemExit(str(exc)) from exc
     try:
         return json.loads(instance_path.read_text(encoding="utf-8"))
     except json.JSONDecodeError as exc:
@@ -416,65 +420,40 @@ def normalize_cost_matrix(
     stop_count: int,
     unreachable_penalty_arg: int | None,
 ) -> tuple[list[list[int]], int, int]:
-    if not isinstance(raw_matrix, list) or len(raw_matrix) != stop_count:
-        raise SystemExit(
-            f"Cost matrix shape mismatch: expected {stop_count} rows, got "
-            f"{len(raw_matrix) if isinstance(raw_matrix, list) else 'non-list'}."
-        )
-
-    finite_values: list[float] = []
-    for row in raw_matrix:
-        if not isinstance(row, list) or len(row) != stop_count:
+    """Integer cost rows: null/invalid/negative arcs -> penalty, diagonal -> 0, others >= 1."""
+    if isinstance(raw_matrix, np.ndarray):
+        if raw_matrix.shape != (stop_count, stop_count):
+            raise SystemExit(
+                f"Cost matrix shape mismatch: expected {stop_count} x {stop_count}, got {raw_matrix.shape}."
+            )
+        matrix = np.asarray(raw_matrix, dtype=float)
+    else:
+        if not isinstance(raw_matrix, list) or len(raw_matrix) != stop_count:
+            raise SystemExit(
+                f"Cost matrix shape mismatch: expected {stop_count} rows, got "
+                f"{len(raw_matrix) if isinstance(raw_matrix, list) else 'non-list'}."
+            )
+        if any(not isinstance(row, list) or len(row) != stop_count for row in raw_matrix):
             raise SystemExit("Cost matrix must be a square list of lists with shape N x N.")
-        for value in row:
-            if value is None:
-                continue
-            try:
-                number = float(value)
-            except (TypeError, ValueError):
-                continue
-            if math.isnan(number) or number < 0:
-                continue
-            finite_values.append(number)
+        matrix = rows_to_matrix(raw_matrix)
+
+    with np.errstate(invalid="ignore"):
+        valid = np.isfinite(matrix) & (matrix >= 0)
 
     if unreachable_penalty_arg is not None:
         unreachable_penalty = max(1, int(unreachable_penalty_arg))
     else:
-        max_finite = max(finite_values) if finite_values else 1000.0
+        max_finite = float(matrix[valid].max()) if valid.any() else 1000.0
         unreachable_penalty = int(max(100000.0, max_finite * 1000.0))
         unreachable_penalty = min(unreachable_penalty, 2_000_000_000)
 
-    normalized: list[list[int]] = []
-    unreachable_arc_count = 0
-
-    for i, row in enumerate(raw_matrix):
-        normalized_row: list[int] = []
-        for j, value in enumerate(row):
-            if i == j:
-                normalized_row.append(0)
-                continue
-
-            if value is None:
-                normalized_row.append(unreachable_penalty)
-                unreachable_arc_count += 1
-                continue
-
-            try:
-                number = float(value)
-            except (TypeError, ValueError):
-                normalized_row.append(unreachable_penalty)
-                unreachable_arc_count += 1
-                continue
-
-            if math.isnan(number) or number < 0:
-                normalized_row.append(unreachable_penalty)
-                unreachable_arc_count += 1
-                continue
-
-            normalized_row.append(max(1, int(round(number))))
-        normalized.append(normalized_row)
+    normalized = np.full(matrix.shape, unreachable_penalty, dtype=np.int64)
+    normalized[valid] = np.maximum(1, np.rint(matrix[valid])).astype(np.int64)
+    np.fill_diagonal(normalized, 0)
+    off_diagonal = ~np.eye(stop_count, dtype=bool)
+    unreachable_arc_count = int((~valid & off_diagonal).sum())
 
-    return normalized, unreachable_penalty, unreachable_arc_count
+    return normalized.tolist(), unreachable_penalty, unreachable_arc_count
 
 
 def solve_routes(
@@ -542,13 +521,17 @@ def solve_routes(
             )
 
         route_duration_limit = max(1, int(max_route_duration_seconds))
+        # Travel time plus the service time at the departure stop (none at the depot).
+        departure_service = np.array(stop_service_seconds, dtype=np.int64)
+        departure_service[depot_index] = 0
+        route_duration_matrix = (
+            np.array(route_time_matrix, dtype=np.int64) + departure_service[:, None]
+        ).tolist()
 
         def route_duration_callback(from_index: int, to_index: int) -> int:
             from_node = manager.IndexToNode(from_index)
             to_node = manager.IndexToNode(to_index)
-            travel_seconds = int(route_time_matrix[from_node][to_node])
-            service_seconds = 0 if from_node == depot_index else int(stop_service_seconds[from_node])
-            return travel_seconds + service_seconds
+            return route_duration_matrix[from_node][to_node]
 
         route_duration_idx = routing.RegisterTransitCallback(route_duration_callback)
         routing.AddDimension(
@@ -681,6 +664,8 @@ def run_visualization(
 
 
 def derive_default_paths(instance_path: Path) -> tuple[Path, Path]:
+    if instance_path.name == "instance.json":
+        instance_path = instance_path.parent
     stem = instance_path.stem
     if stem.startswith("problem_instance_"):
         suffix = stem.replace("problem_instance_", "", 1)
@@ -701,7 +686,10 @@ def main() -> None:
     )
     parser.add_argument(
         "instance",
-        help="Path to problem instance file (JSON content, typically .csv extension).",
+        help=(
+            "Path to problem instance file (JSON content, typically .csv extension) "
+            "or binary instance directory."
+        ),
     )
     parser.add_argument(
         "--output",
@@ -0,0 +1,495 @@
+"""
+Shared OSRM HTTP client for the routing, visualization and optimize scripts.
+
+- Keep-alive: one persistent HTTP connection per thread, reused across calls.
+- Bounded concurrency: at most `max_concurrency` requests in flight per client.
+- Retries with exponential backoff on connection errors, timeouts, HTTP 429
+  and 5xx responses.
+- Per-service request timing (count, retries, failures, total/max ms).
+- Optional persistent route cache (`client.route_cache`, see osrm_route_cache).
+- `route_via_legs`: multi-stop routes assembled from cached stop-to-stop legs.
+  Each run of consecutive uncached legs is sent to OSRM as one multi-waypoint
+  /route request and split into per-leg entries (`prefetch_legs` does this
+  for many routes at once).
+- `fetch_routes`: every distinct stop sequence of a batch (e.g. all driver-days
+  of a map), with failures kept per route; look results up with
+  `prefetched_route`.
+
+Usage from scripts outside routing/ (add routing/ to sys.path first):
+    from osrm_client import get_osrm_client
+    client = get_osrm_client("http://localhost:5000", timeout=25)
+    route = client.route([[lat1, lon1], [lat2, lon2]])
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, TypeVar
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_BASE_URL = "http://localhost:5000"
+DEFAULT_PROFILE = "driving"
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Legs per multi-waypoint /route request (OSRM's default max-viaroute-size is 500).
+MAX_LEGS_PER_REQUEST = 100
+
+T = TypeVar("T")
+R = TypeVar("R")
+LegKey = tuple[tuple[float, float], tuple[float, float]]
+RouteKey = tuple[tuple[float, float], ...]
+
+
+class OsrmError(RuntimeError):
+    """OSRM request failed or returned a non-Ok response."""
+
+
+def route_key(coords_lat_lon: Iterable[Iterable[float]]) -> RouteKey:
+    return tuple((lat, lon) for lat, lon in coords_lat_lon)
+
+
+def prefetched_route(
+    routes: dict[RouteKey, dict[str, Any] | BaseException], coords_lat_lon: list[list[float]]
+) -> dict[str, Any]:
+    """Look up a route fetched by OsrmClient.fetch_routes, raising its failure."""
+    result = routes[route_key(coords_lat_lon)]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def _to_float_or_none(value: Any) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class OsrmRequestStats:
+    """Thread-safe per-service request counters and timings."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.by_service: dict[str, dict[str, float]] = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+
+    def record(self, service: str, elapsed_ms: float, retries: int, failed: bool) -> None:
+        with self._lock:
+            entry = self.by_service[service]
+            entry["requests"] += 1
+            entry["retries"] += retries
+            entry["failures"] += int(failed)
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def to_dict(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                service: {
+                    **entry,
+                    "mean_ms": round(entry["total_ms"] / entry["requests"], 3) if entry["requests"] else 0.0,
+                    "total_ms": round(entry["total_ms"], 3),
+                    "max_ms": round(entry["max_ms"], 3),
+                }
+                for service, entry in sorted(self.by_service.items())
+            }
+
+    def summary(self) -> str:
+        parts = [
+            f"{service}: {int(s['requests'])} requests, {s['mean_ms']:.0f} ms mean, "
+            f"{s['max_ms']:.0f} ms max, {int(s['retries'])} retries, {int(s['failures'])} failed"
+            for service, s in self.to_dict().items()
+        ]
+        return "OSRM " + ("; ".join(parts) if parts else "no requests")
+
+
+class OsrmClient:
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: float = 25,
+        profile: str = DEFAULT_PROFILE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        parts = urlsplit(self.base_url)
+        self._scheme = parts.scheme or "http"
+        self._netloc = parts.netloc
+        self._path_prefix = parts.path.rstrip("/")
+        self.timeout = float(timeout)
+        self.profile = profile
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff_seconds = float(backoff_seconds)
+        self.stats = OsrmRequestStats()
+        self.route_cache: Any = None
+        self.leg_stats = {
+            "routes": 0,
+            "legs": 0,
+            "leg_cache_hits": 0,
+            "leg_requests": 0,
+            "route_requests": 0,
+        }
+        self._leg_memo: dict[LegKey, dict[str, Any]] = {}
+        self._leg_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn_cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            conn = conn_cls(self._netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _get_once(self, path: str) -> tuple[int, bytes]:
+        conn = self._connection()
+        try:
+            conn.request("GET", path, headers={"Connection": "keep-alive"})
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            self._drop_connection()
+            raise
+        if response.will_close:
+            self._drop_connection()
+        return response.status, body
+
+    def request(
+        self,
+        service: str,
+        coords_lat_lon: Iterable[Iterable[float]],
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """GET /{service}/v1/{profile}/{lon,lat;...} and return the decoded Ok payload."""
+        coord_segment = ";".join(f"{lon},{lat}" for lat, lon in coords_lat_lon)
+        path = f"{self._path_prefix}/{service}/v1/{self.profile}/{coord_segment}"
+        if params:
+            path = f"{path}?{urlencode(params)}"
+
+        started = time.perf_counter()
+        attempt = 0
+        failed = True
+        try:
+            while True:
+                try:
+                    with self._slots:
+                        status, body = self._get_once(path)
+                except (socket.timeout, http.client.HTTPException, OSError) as exc:
+                    if attempt >= self.retries:
+                        reason = getattr(exc, "reason", None) or exc
+                        raise OsrmError(f"OSRM connection failed to {self.base_url}: {reason}") from exc
+                else:
+                    if not (status in RETRY_STATUSES and attempt < self.retries):
+                        # OSRM reports bad queries / no route as 400 with a JSON code.
+                        if status not in (200, 400):
+                            raise OsrmError(f"OSRM {service} request failed with status {status}")
+                        try:
+                            payload = json.loads(body)
+                        except ValueError as exc:
+                            excerpt = body[:200].decode("utf-8", "replace")
+                            raise OsrmError(
+                                f"OSRM {service} returned status {status} with a non-JSON body: {excerpt!r}"
+                            ) from exc
+                        if payload.get("code") != "Ok":
+                            raise OsrmError(f"OSRM {service} response code: {payload.get('code')}")
+                        failed = False
+                        return payload
+                attempt += 1
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)))
+        finally:
+            self.stats.record(service, (time.perf_counter() - started) * 1000, attempt, failed)
+
+    def route(self, coords_lat_lon: list[list[float]]) -> dict[str, Any]:
+        """Full-geometry route through the stops: distance_m, duration_s, points_lat_lon."""
+        if self.route_cache is not None:
+            cached = self.route_cache.get(coords_lat_lon, self.profile)
+            if cached is not None:
+                return cached
+        result = self._fetch_route(coords_lat_lon)
+        if self.route_cache is not None:
+            self.route_cache.put(coords_lat_lon, self.profile, result)
+        return result
+
+    def _fetch_route(self, coords_lat_lon: list[list[float]]) -> dict[str, Any]:
+        payload = self.request(
+            "route",
+            coords_lat_lon,
+            {"overview": "full", "geometries": "geojson", "steps": "false"},
+        )
+        routes = payload.get("routes", [])
+        if not routes:
+            raise OsrmError("OSRM response did not include routes")
+        route = routes[0]
+        geometry = route.get("geometry", {}).get("coordinates", [])
+        if not geometry:
+            raise OsrmError("OSRM response route geometry is empty")
+        return {
+            "distance_m": float(route["distance"]),
+            "duration_s": float(route["duration"]),
+            "points_lat_lon": [[lat, lon] for lon, lat in geometry],
+        }
+
+    @staticmethod
+    def _leg_stops(coords_lat_lon: list[list[float]]) -> list[tuple[float, float]]:
+        return [(round(float(lat), 6), round(float(lon), 6)) for lat, lon in coords_lat_lon]
+
+    def _cached_leg(self, leg_key: LegKey) -> dict[str, Any] | None:
+        with self._leg_lock:
+            leg = self._leg_memo.get(leg_key)
+        if leg is None and self.route_cache is not None:
+            leg = self.route_cache.get([list(p) for p in leg_key], self.profile)
+            if leg is not None:
+                with self._leg_lock:
+                    self._leg_memo[leg_key] = leg
+        return leg
+
+    def _fetch_leg_run(self, waypoints: list[tuple[float, float]]) -> int:
+        """One /route request through `waypoints`; each of its legs[] is cached as a leg."""
+        payload = self.request(
+            "route",
+            [list(p) for p in waypoints],
+            {"overview": "false", "geometries": "geojson", "steps": "true"},
+        )
+        routes = payload.get("routes", [])
+        if not routes:
+            raise OsrmError("OSRM response did not include routes")
+        legs = routes[0].get("legs", [])
+        if len(legs) != len(waypoints) - 1:
+            raise OsrmError(f"OSRM returned {len(legs)} legs for {len(waypoints)} waypoints")
+        for leg_key, leg in zip(zip(waypoints, waypoints[1:]), legs):
+            # Step geometries share their end points; drop the repeats.
+            points: list[list[float]] = []
+            for step in leg.get("steps", []):
+                for lon, lat in step.get("geometry", {}).get("coordinates", []):
+                    if not points or points[-1] != [lat, lon]:
+                        points.append([lat, lon])
+            if not points:
+                raise OsrmError("OSRM response leg geometry is empty")
+            result = {
+                "distance_m": float(leg["distance"]),
+                "duration_s": float(leg["duration"]),
+                "points_lat_lon": points,
+            }
+            if self.route_cache is not None:
+                self.route_cache.put([list(p) for p in leg_key], self.profile, result)
+            with self._leg_lock:
+                self._leg_memo[leg_key] = result
+        return len(legs)
+
+    def prefetch_legs(
+        self,
+        routes: Iterable[list[list[float]]],
+        max_workers: int | None = None,
+    ) -> dict[LegKey, BaseException]:
+        """Fetch the uncached legs of every route, batched; return failed legs.
+
+        Legs are deduplicated across all routes. Each run of consecutive
+        uncached legs (up to MAX_LEGS_PER_REQUEST) becomes one multi-waypoint
+        /route request, and the requests run concurrently.
+        """
+        claimed: set[LegKey] = set()
+        runs: list[list[tuple[float, float]]] = []
+        route_count = leg_count = 0
+        for coords_lat_lon in routes:
+            stops = self._leg_stops(coords_lat_lon)
+            route_count += 1
+            leg_count += max(0, len(stops) - 1)
+            run: list[tuple[float, float]] = []
+            for leg_key in zip(stops, stops[1:]):
+                if leg_key[0] != leg_key[1] and leg_key not in claimed and self._cached_leg(leg_key) is None:
+                    claimed.add(leg_key)
+                    run = run or [leg_key[0]]
+                    run.append(leg_key[1])
+                    if len(run) > MAX_LEGS_PER_REQUEST:
+                        runs.append(run)
+                        run = []
+                elif run:
+                    runs.append(run)
+                    run = []
+            if run:
+                runs.append(run)
+
+        failures: dict[LegKey, BaseException] = {}
+        for run, result in zip(runs, self.map_concurrent(self._fetch_leg_run, runs, max_workers)):
+            if isinstance(result, BaseException):
+                failures.update((leg_key, result) for leg_key in zip(run, run[1:]))
+
+        with self._leg_lock:
+            self.leg_stats["routes"] += route_count
+            self.leg_stats["legs"] += leg_count
+            self.leg_stats["leg_cache_hits"] += leg_count - len(claimed)
+            self.leg_stats["leg_requests"] += len(claimed) - len(failures)
+            self.leg_stats["route_requests"] += len(runs)
+        return failures
+
+    def route_from_legs(
+        self,
+        coords_lat_lon: list[list[float]],
+        failures: dict[LegKey, BaseException] | None = None,
+    ) -> dict[str, Any]:
+        """Assemble a route from legs already fetched by prefetch_legs().
+
+        Repeated stops produce zero-length legs. A leg that is not available
+        raises its fetch failure (or OsrmError if it was never fetched).
+        """
+        if len(coords_lat_lon) < 2:
+            raise OsrmError("OSRM route needs at least two coordinates")
+        stops = self._leg_stops(coords_lat_lon)
+        leg_keys = list(zip(stops, stops[1:]))
+        legs: dict[LegKey, dict[str, Any]] = {}
+        for leg_key in dict.fromkeys(leg_keys):
+            if leg_key[0] == leg_key[1]:
+                legs[leg_key] = {"distance_m": 0.0, "duration_s": 0.0, "points_lat_lon": [list(leg_key[0])]}
+                continue
+            leg = self._cached_leg(leg_key)
+            if leg is None:
+                if failures and leg_key in failures:
+                    raise failures[leg_key]
+                raise OsrmError(f"OSRM leg {leg_key} was not fetched")
+            legs[leg_key] = leg
+
+        points: list[list[float]] = []
+        for leg_key in leg_keys:
+            leg_points = legs[leg_key]["points_lat_lon"]
+            points.extend(leg_points[1:] if points and leg_points[0] == points[-1] else leg_points)
+        return {
+            "distance_m": sum(legs[k]["distance_m"] for k in leg_keys),
+            "duration_s": sum(legs[k]["duration_s"] for k in leg_keys),
+            "points_lat_lon": points,
+        }
+
+    def route_via_legs(self, coords_lat_lon: list[list[float]], max_workers: int | None = None) -> dict[str, Any]:
+        """Like route(), but assembled from per-leg routes keyed by ordered stop pair.
+
+        Legs already in memory or in `route_cache` are reused; each run of
+        consecutive missing legs is fetched with one multi-waypoint request.
+        """
+        if len(coords_lat_lon) < 2:
+            raise OsrmError("OSRM route needs at least two coordinates")
+        failures = self.prefetch_legs([coords_lat_lon], max_workers)
+        return self.route_from_legs(coords_lat_lon, failures)
+
+    def fetch_routes(
+        self,
+        coord_lists: Iterable[list[list[float]]],
+        by_legs: bool = True,
+        concurrency: int | None = None,
+    ) -> dict[RouteKey, dict[str, Any] | BaseException]:
+        """
+        Fetch every distinct stop sequence; failures are kept as exceptions.
+
+        With by_legs the distinct legs of all routes are fetched first in one
+        pool (each leg once), then every route is assembled from them;
+        otherwise each route is one full /route request, run concurrently.
+        """
+        keys = list(dict.fromkeys(route_key(coords) for coords in coord_lists if len(coords) >= 2))
+        routes = [[list(point) for point in key] for key in keys]
+        if not by_legs:
+            return dict(zip(keys, self.map_concurrent(self.route, routes, concurrency)))
+
+        failures = self.prefetch_legs(routes, concurrency)
+        assembled: dict[RouteKey, dict[str, Any] | BaseException] = {}
+        for key, coords_lat_lon in zip(keys, routes):
+            try:
+                assembled[key] = self.route_from_legs(coords_lat_lon, failures)
+            except Exception as exc:
+                assembled[key] = exc
+        return assembled
+
+    def leg_summary(self) -> str:
+        with self._leg_lock:
+            stats = dict(self.leg_stats)
+        rate = (100.0 * stats["leg_cache_hits"] / stats["legs"]) if stats["legs"] else 0.0
+        return (
+            f"OSRM legs: {stats['routes']} routes from {stats['legs']} legs, "
+            f"{stats['leg_cache_hits']} cached ({rate:.1f}%), {stats['leg_requests']} legs fetched "
+            f"in {stats['route_requests']} OSRM route requests"
+        )
+
+    def table(
+        self,
+        source_coords: list[tuple[float, float]],
+        dest_coords: list[tuple[float, float]] | None = None,
+    ) -> tuple[list[list[float | None]], list[list[float | None]]]:
+        """Duration (s) and distance (m) rows for sources x destinations.
+
+        With dest_coords=None the table is square over source_coords, which are
+        sent once (a request then uses len(source_coords) of max-table-size).
+        """
+        if dest_coords is None:
+            payload = self.request("table", source_coords, {"annotations": "duration,distance"})
+        else:
+            source_indices = ";".join(str(i) for i in range(len(source_coords)))
+            dest_indices = ";".join(str(len(source_coords) + i) for i in range(len(dest_coords)))
+            payload = self.request(
+                "table",
+                list(source_coords) + list(dest_coords),
+                {
+                    "annotations": "duration,distance",
+                    "sources": source_indices,
+                    "destinations": dest_indices,
+                },
+            )
+        durations = [[_to_float_or_none(v) for v in row] for row in payload.get("durations", [])]
+        distances = [[_to_float_or_none(v) for v in row] for row in payload.get("distances", [])]
+        return durations, distances
+
+    def map_concurrent(
+        self,
+        fn: Callable[[T], R],
+        items: Iterable[T],
+        max_workers: int | None = None,
+    ) -> list[R | BaseException]:
+        """Run fn over items in threads (in order); failures are returned, not raised."""
+        def _call(item: T) -> R | BaseException:
+            try:
+                return fn(item)
+            except Exception as exc:
+                return exc
+
+        items = list(items)
+        if not items:
+            return []
+        workers = max(1, min(max_workers or self.max_concurrency, len(items)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_call, items))
+
+
+_clients: dict[tuple[Any, ...], OsrmClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_osrm_client(
+    base_url: str = DEFAULT_BASE_URL,
+    timeout: float = 25,
+    profile: str = DEFAULT_PROFILE,
+    **kwargs: Any,
+) -> OsrmClient:
+    """Process-wide client per (base_url, timeout, profile, client options)."""
+    key = (base_url.rstrip("/"), float(timeout), profile, tuple(sorted(kwargs.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OsrmClient(base_url, timeout, profile, **kwargs)
+        return client
@@ -7,12 +7,12 @@ import html
 import json
 from pathlib import Path
 from typing import Any
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
 
 import pandas as pd
 
+from osrm_client import OsrmClient, get_osrm_client
+from osrm_route_cache import RouteCache
+
 # ---- Config (edit these) ----
 CSV_PATH = Path("data_geocode/data_geocode.csv")
 TARGET_DATE = "2024-11-01"  # YYYY-MM-DD; set to "" to use latest date in CSV
@@ -20,6 +20,9 @@ OUTPUT_HTML = Path(__file__).with_name("osrm_day_routes_map.html")
 SAVERS_CSV = Path("visualizations/data_savers_addresses.csv")  # set to None to skip
 OSRM_BASE_URL = "http://localhost:5000"
 REQUEST_TIMEOUT_SECONDS = 25
+ROUTE_CACHE_PATH = Path(__file__).with_name("cache") / "osrm_route_cache.sqlite"  # set to None to skip
+OSRM_DATASET_ID = "default"  # change when the OSRM extract is rebuilt
+ROUTE_BY_LEGS = True  # assemble routes from cached stop-to-stop legs
 # -----------------------------
 
 COL_DRIVER = "Driver"
@@ -68,44 +71,18 @@ def _fmt_duration(duration_s: float | None) -> str:
     return f"{hours}h {minutes}m"
 
 
-def fetch_osrm_route(coords_lat_lon: list[list[float]]) -> dict[str, Any]:
-    coords_lon_lat = [f"{lon},{lat}" for lat, lon in coords_lat_lon]
-    coord_segment = ";".join(coords_lon_lat)
-    query = urlencode(
-        {
-            "overview": "full",
-            "geometries": "geojson",
-            "steps": "false",
-        }
-    )
-    url = f"{OSRM_BASE_URL.rstrip('/')}/route/v1/driving/{coord_segment}?{query}"
-
-    try:
-        with urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
-            payload = json.load(response)
-    except HTTPError as exc:
-        raise RuntimeError(f"OSRM request failed with status {exc.code}") from exc
-    except URLError as exc:
-        raise RuntimeError(f"OSRM connection failed to {OSRM_BASE_URL}") from exc
+def _osrm_client() -> OsrmClient:
+    client = get_osrm_client(OSRM_BASE_URL, REQUEST_TIMEOUT_SECONDS)
+    if ROUTE_CACHE_PATH is not None and client.route_cache is None:
+        client.route_cache = RouteCache(ROUTE_CACHE_PATH, OSRM_DATASET_ID)
+    return client
 
-    if payload.get("code") != "Ok":
-        raise RuntimeError(f"OSRM response code: {payload.get('code')}")
 
-    routes = payload.get("routes", [])
-    if not routes:
-        raise RuntimeError("OSRM response did not include routes")
-
-    route = routes[0]
-    geometry = route.get("geometry", {}).get("coordinates", [])
-    if not geometry:
-        raise RuntimeError("OSRM response route geometry is empty")
-
-    points_lat_lon = [[lat, lon] for lon, lat in geometry]
-    return {
-        "distance_m": float(route["distance"]),
-        "duration_s": float(route["duration"]),
-        "points_lat_lon": points_lat_lon,
-    }
+def fetch_osrm_route(coords_lat_lon: list[list[float]]) -> dict[str, Any]:
+    client = _osrm_client()
+    if ROUTE_BY_LEGS:
+        return client.route_via_legs(coords_lat_lon)
+    return client.route(coords_lat_lon)
 
 
 def load_savers_points() -> list[dict[str, Any]]:
@@ -518,6 +495,12 @@ def main() -> None:
     )
     OUTPUT_HTML.write_text(html_doc, encoding="utf-8")
     print(f"Saved map: {OUTPUT_HTML}")
+    client = _osrm_client()
+    print(client.stats.summary())
+    if ROUTE_BY_LEGS:
+        print(client.leg_summary())
+    if client.route_cache is not None:
+        print(client.route_cache.summary())
 
 
 if __name__ == "__main__":
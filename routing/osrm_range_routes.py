@@ -7,12 +7,12 @@ import html
 import json
 from pathlib import Path
 from typing import Any
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
 
 import pandas as pd
 
+from osrm_client import OsrmClient, get_osrm_client, prefetched_route
+from osrm_route_cache import RouteCache
+
 # ---- Config (edit these) ----
 CSV_PATH = Path("data_geocode/latest/data_geocode.csv")
 START_DATE = "2021-06-01"  # YYYY-MM-DD; leave blank to auto-pick range
@@ -22,6 +22,10 @@ OUTPUT_HTML = Path(__file__).with_name("osrm_range_routes_map.html")
 SAVERS_CSV = Path("visualizations/data_savers_addresses.csv")  # set to None to skip
 OSRM_BASE_URL = "http://localhost:5000"
 REQUEST_TIMEOUT_SECONDS = 25
+ROUTE_CACHE_PATH = Path(__file__).with_name("cache") / "osrm_route_cache.sqlite"  # set to None to skip
+OSRM_DATASET_ID = "default"  # change when the OSRM extract is rebuilt
+ROUTE_BY_LEGS = True  # assemble routes from cached stop-to-stop legs
+OSRM_CONCURRENCY = 8  # OSRM requests (routes or leg batches) in parallel
 # -----------------------------
 
 COL_DRIVER = "Driver"
@@ -70,44 +74,30 @@ def _fmt_duration(duration_s: float | None) -> str:
     return f"{hours}h {minutes}m"
 
 
-def fetch_osrm_route(coords_lat_lon: list[list[float]]) -> dict[str, Any]:
-    coords_lon_lat = [f"{lon},{lat}" for lat, lon in coords_lat_lon]
-    coord_segment = ";".join(coords_lon_lat)
-    query = urlencode(
-        {
-            "overview": "full",
-            "geometries": "geojson",
-            "steps": "false",
-        }
-    )
-    url = f"{OSRM_BASE_URL.rstrip('/')}/route/v1/driving/{coord_segment}?{query}"
+def _osrm_client() -> OsrmClient:
+    client = get_osrm_client(OSRM_BASE_URL, REQUEST_TIMEOUT_SECONDS, max_concurrency=OSRM_CONCURRENCY)
+    if ROUTE_CACHE_PATH is not None and client.route_cache is None:
+        client.route_cache = RouteCache(ROUTE_CACHE_PATH, OSRM_DATASET_ID)
+    return client
 
-    try:
-        with urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
-            payload = json.load(response)
-    except HTTPError as exc:
-        raise RuntimeError(f"OSRM request failed with status {exc.code}") from exc
-    except URLError as exc:
-        raise RuntimeError(f"OSRM connection failed to {OSRM_BASE_URL}") from exc
 
-    if payload.get("code") != "Ok":
-        raise RuntimeError(f"OSRM response code: {payload.get('code')}")
+def fetch_osrm_route(coords_lat_lon: list[list[float]]) -> dict[str, Any]:
+    client = _osrm_client()
+    if ROUTE_BY_LEGS:
+        return client.route_via_legs(coords_lat_lon)
+    return client.route(coords_lat_lon)
+
 
-    routes = payload.get("routes", [])
-    if not routes:
-        raise RuntimeError("OSRM response did not include routes")
+def driver_route_frame(date_df: pd.DataFrame, driver: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    driver_df = date_df[date_df[COL_DRIVER] == driver].copy()
+    driver_valid = driver_df.dropna(subset=[COL_LAT, COL_LON]).sort_values(
+        COL_STOP, na_position="last"
+    )
+    return driver_df, driver_valid
 
-    route = routes[0]
-    geometry = route.get("geometry", {}).get("coordinates", [])
-    if not geometry:
-        raise RuntimeError("OSRM response route geometry is empty")
 
-    points_lat_lon = [[lat, lon] for lon, lat in geometry]
-    return {
-        "distance_m": float(route["distance"]),
-        "duration_s": float(route["duration"]),
-        "points_lat_lon": points_lat_lon,
-    }
+def driver_route_coords(driver_valid: pd.DataFrame) -> list[list[float]]:
+    return [[float(row[COL_LAT]), float(row[COL_LON])] for _, row in driver_valid.iterrows()]
 
 
 def load_savers_points() -> list[dict[str, Any]]:
@@ -551,6 +541,15 @@ def main() -> None:
     print(f"Days in range with routes: {len(dates)}")
     print(f"Savers locations: {len(savers_points)}")
 
+    # Fetch every driver-day route up front, concurrently; the loop below only assembles.
+    route_coords = []
+    for date in dates:
+        date_df = df_range[df_range["_date_str"] == date]
+        for driver in sorted(date_df[COL_DRIVER].unique()):
+            route_coords.append(driver_route_coords(driver_route_frame(date_df, driver)[1]))
+    routes = _osrm_client().fetch_routes(route_coords, ROUTE_BY_LEGS, OSRM_CONCURRENCY)
+    print(f"OSRM routes fetched: {len(routes)} (concurrency {OSRM_CONCURRENCY})")
+
     for date in dates:
         date_df = df_range[df_range["_date_str"] == date].copy()
         missing_mask = date_df[COL_LAT].isna() | date_df[COL_LON].isna()
@@ -567,22 +566,15 @@ def main() -> None:
 
         for idx, driver in enumerate(drivers):
             color = COLORS[idx % len(COLORS)]
-            driver_df = date_df[date_df[COL_DRIVER] == driver].copy()
-            driver_valid = (
-                driver_df.dropna(subset=[COL_LAT, COL_LON]).sort_values(
-                    COL_STOP, na_position="last"
-                )
-            )
+            driver_df, driver_valid = driver_route_frame(date_df, driver)
 
             missing_stops = int((driver_df[COL_LAT].isna() | driver_df[COL_LON].isna()).sum())
-            coords_lat_lon = [
-                [float(row[COL_LAT]), float(row[COL_LON])] for _, row in driver_valid.iterrows()
-            ]
+            coords_lat_lon = driver_route_coords(driver_valid)
 
             osrm_error = ""
             if len(coords_lat_lon) >= 2:
                 try:
-                    osrm_result = fetch_osrm_route(coords_lat_lon)
+                    osrm_result = prefetched_route(routes, coords_lat_lon)
                     route_points = osrm_result["points_lat_lon"]
                     distance_m = float(osrm_result["distance_m"])
                     duration_s = float(osrm_result["duration_s"])
@@ -685,6 +677,12 @@ def main() -> None:
     )
     OUTPUT_HTML.write_text(html_doc, encoding="utf-8")
     print(f"Saved map: {OUTPUT_HTML}")
+    client = _osrm_client()
+    print(client.stats.summary())
+    if ROUTE_BY_LEGS:
+        print(client.leg_summary())
+    if client.route_cache is not None:
+        print(client.route_cache.summary())
 
 
 if __name__ == "__main__":
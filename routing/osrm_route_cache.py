@@ -0,0 +1,140 @@
+"""
+Persistent on-disk cache of OSRM route results.
+
+Entries are content-addressed: the key is a hash of the OSRM profile, a
+dataset ID naming the OSRM extract, and the stop sequence rounded to
+COORD_DECIMALS places. Historical driver-days therefore hit the cache on
+every re-render until the extract (dataset ID) changes.
+
+Each entry stores distance, duration and the full geometry as zlib-compressed
+int32 deltas of micro-degrees, in a single SQLite file.
+
+Usage:
+    from osrm_client import get_osrm_client
+    from osrm_route_cache import RouteCache
+    client = get_osrm_client("http://localhost:5000", 25)
+    client.route_cache = RouteCache("routing/cache/osrm_route_cache.sqlite", "ri-2024-01")
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any
+
+COORD_DECIMALS = 5  # ~1 m; keys ignore jitter below that
+GEOMETRY_SCALE = 1_000_000  # OSRM geojson coordinates carry 6 decimals
+DEFAULT_DATASET_ID = "default"
+
+
+def route_cache_key(coords_lat_lon: list[list[float]], profile: str, dataset_id: str) -> str:
+    coord_text = ";".join(
+        f"{round(float(lat), COORD_DECIMALS):.{COORD_DECIMALS}f},"
+        f"{round(float(lon), COORD_DECIMALS):.{COORD_DECIMALS}f}"
+        for lat, lon in coords_lat_lon
+    )
+    return hashlib.sha256(f"{profile}|{dataset_id}|{coord_text}".encode("utf-8")).hexdigest()
+
+
+def encode_geometry(points_lat_lon: list[list[float]]) -> bytes:
+    deltas = array("i")
+    prev_lat = prev_lon = 0
+    for lat, lon in points_lat_lon:
+        lat_i = round(float(lat) * GEOMETRY_SCALE)
+        lon_i = round(float(lon) * GEOMETRY_SCALE)
+        deltas.append(lat_i - prev_lat)
+        deltas.append(lon_i - prev_lon)
+        prev_lat, prev_lon = lat_i, lon_i
+    return zlib.compress(deltas.tobytes(), 6)
+
+
+def decode_geometry(blob: bytes) -> list[list[float]]:
+    deltas = array("i")
+    deltas.frombytes(zlib.decompress(blob))
+    points = []
+    lat_i = lon_i = 0
+    for i in range(0, len(deltas), 2):
+        lat_i += deltas[i]
+        lon_i += deltas[i + 1]
+        points.append([lat_i / GEOMETRY_SCALE, lon_i / GEOMETRY_SCALE])
+    return points
+
+
+class RouteCache:
+    """SQLite-backed route cache, safe to share between threads."""
+
+    def __init__(self, path: str | Path, dataset_id: str = DEFAULT_DATASET_ID) -> None:
+        self.path = Path(path)
+        self.dataset_id = dataset_id or DEFAULT_DATASET_ID
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            " key TEXT PRIMARY KEY,"
+            " profile TEXT NOT NULL,"
+            " dataset_id TEXT NOT NULL,"
+            " stop_count INTEGER NOT NULL,"
+            " distance_m REAL NOT NULL,"
+            " duration_s REAL NOT NULL,"
+            " geometry BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def get(self, coords_lat_lon: list[list[float]], profile: str) -> dict[str, Any] | None:
+        key = route_cache_key(coords_lat_lon, profile, self.dataset_id)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT distance_m, duration_s, geometry FROM routes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        distance_m, duration_s, geometry = row
+        return {
+            "distance_m": float(distance_m),
+            "duration_s": float(duration_s),
+            "points_lat_lon": decode_geometry(geometry),
+        }
+
+    def put(self, coords_lat_lon: list[list[float]], profile: str, route: dict[str, Any]) -> None:
+        key = route_cache_key(coords_lat_lon, profile, self.dataset_id)
+        geometry = encode_geometry(route["points_lat_lon"])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes"
+                " (key, profile, dataset_id, stop_count, distance_m, duration_s, geometry)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    profile,
+                    self.dataset_id,
+                    len(coords_lat_lon),
+                    float(route["distance_m"]),
+                    float(route["duration_s"]),
+                    geometry,
+                ),
+            )
+            self._conn.commit()
+            self.stored += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return (
+            f"Route cache ({self.path}, dataset {self.dataset_id}): "
+            f"{self.hits}/{lookups} hits ({rate:.1f}%), {self.stored} stored"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
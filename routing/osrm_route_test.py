@@ -5,9 +5,8 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
+
+from osrm_client import get_osrm_client
 
 # Edit these two points for quick route checks.
 START_LAT, START_LON = (41.4505770,-71.4862690) # South County YMCA
@@ -19,48 +18,13 @@ REQUEST_TIMEOUT_SECONDS = 20
 
 
 def fetch_route() -> dict:
-    coords = f"{START_LON},{START_LAT};{END_LON},{END_LAT}"
-    query = urlencode(
-        {
-            "overview": "full",
-            "geometries": "geojson",
-            "steps": "false",
-        }
+    client = get_osrm_client(OSRM_BASE_URL, REQUEST_TIMEOUT_SECONDS)
+    route_data = client.route([[START_LAT, START_LON], [END_LAT, END_LON]])
+    route_data["request_url"] = (
+        f"{client.base_url}/route/v1/{client.profile}/"
+        f"{START_LON},{START_LAT};{END_LON},{END_LAT}?overview=full&geometries=geojson&steps=false"
     )
-    url = f"{OSRM_BASE_URL.rstrip('/')}/route/v1/driving/{coords}?{query}"
-
-    try:
-        with urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
-            payload = json.load(response)
-    except HTTPError as exc:
-        raise RuntimeError(f"OSRM request failed with status {exc.code}: {url}") from exc
-    except URLError as exc:
-        raise RuntimeError(
-            "Could not connect to OSRM at "
-            f"{OSRM_BASE_URL}. Make sure the Docker container is running."
-        ) from exc
-
-    if payload.get("code") != "Ok":
-        raise RuntimeError(f"OSRM response error: {payload}")
-
-    routes = payload.get("routes", [])
-    if not routes:
-        raise RuntimeError("OSRM response did not include any routes.")
-
-    route = routes[0]
-    geometry = route.get("geometry", {}).get("coordinates", [])
-    if not geometry:
-        raise RuntimeError("OSRM route geometry is empty.")
-
-    # OSRM returns [lon, lat], Leaflet expects [lat, lon].
-    points_lat_lon = [[lat, lon] for lon, lat in geometry]
-
-    return {
-        "distance_m": float(route["distance"]),
-        "duration_s": float(route["duration"]),
-        "points_lat_lon": points_lat_lon,
-        "request_url": url,
-    }
+    return route_data
 
 
 def build_html(route_data: dict) -> str:
@@ -7,18 +7,20 @@ import argparse
 import ast
 import html
 import json
+import sys
 from colorsys import hsv_to_rgb
 from pathlib import Path
 from typing import Any
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
 
 try:
     import pandas as pd
 except ModuleNotFoundError:  # pragma: no cover - runtime dependency guard
     pd = None
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "routing"))
+from osrm_client import OsrmClient, get_osrm_client, prefetched_route  # noqa: E402
+from osrm_route_cache import RouteCache  # noqa: E402
+
 # ---- Config (edit these) ----
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -35,6 +37,10 @@ ACTIVE_BINS_CSV = SCRIPT_DIR / "data_active_bins.csv"  # set to None to skip
 ACTIVE_ROUTINE_CSV = SCRIPT_DIR / "data_active_routine.csv"  # set to None to skip
 OSRM_BASE_URL = "http://localhost:5000"
 REQUEST_TIMEOUT_SECONDS = 25
+ROUTE_CACHE_PATH = PROJECT_ROOT / "routing" / "cache" / "osrm_route_cache.sqlite"  # set to None to skip
+OSRM_DATASET_ID = "default"  # change when the OSRM extract is rebuilt
+ROUTE_BY_LEGS = True  # assemble routes from cached stop-to-stop legs
+OSRM_CONCURRENCY = 8  # OSRM requests (routes or leg batches) in parallel
 ALLOW_STRAIGHT_LINE_FALLBACK = False
 # -----------------------------
 
@@ -259,49 +265,54 @@ def _parse_duration_minutes(value: Any) -> float:
     return minutes
 
 
+def _osrm_client() -> OsrmClient:
+    client = get_osrm_client(OSRM_BASE_URL, REQUEST_TIMEOUT_SECONDS, max_concurrency=OSRM_CONCURRENCY)
+    if ROUTE_CACHE_PATH is not None and client.route_cache is None:
+        client.route_cache = RouteCache(ROUTE_CACHE_PATH, OSRM_DATASET_ID)
+    return client
+
+
 def fetch_osrm_route(coords_lat_lon: list[list[float]]) -> dict[str, Any]:
-    coords_lon_lat = [f"{lon},{lat}" for lat, lon in coords_lat_lon]
-    coord_segment = ";".join(coords_lon_lat)
-    query = urlencode(
-        {
-            "overview": "full",
-            "geometries": "geojson",
-            "steps": "false",
-        }
+    client = _osrm_client()
+    if ROUTE_BY_LEGS:
+        return client.route_via_legs(coords_lat_lon)
+    return client.route(coords_lat_lon)
+
+
+def driver_route_frame(date_df: Any, driver: str) -> tuple[Any, Any]:
+    driver_df = date_df[date_df[COL_DRIVER] == driver].copy()
+    driver_valid = driver_df.dropna(subset=[COL_LAT, COL_LON]).sort_values(
+        COL_STOP, na_position="last"
     )
-    url = f"{OSRM_BASE_URL.rstrip('/')}/route/v1/driving/{coord_segment}?{query}"
+    return driver_df, driver_valid
 
-    try:
-        with urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
-            payload = json.load(response)
-    except HTTPError as exc:
-        raise RuntimeError(f"OSRM request failed with status {exc.code}") from exc
-    except URLError as exc:
-        reason = getattr(exc, "reason", None)
-        if reason:
-            raise RuntimeError(
-                f"OSRM connection failed to {OSRM_BASE_URL}: {reason}"
-            ) from exc
-        raise RuntimeError(f"OSRM connection failed to {OSRM_BASE_URL}") from exc
-
-    if payload.get("code") != "Ok":
-        raise RuntimeError(f"OSRM response code: {payload.get('code')}")
-
-    routes = payload.get("routes", [])
-    if not routes:
-        raise RuntimeError("OSRM response did not include routes")
-
-    route = routes[0]
-    geometry = route.get("geometry", {}).get("coordinates", [])
-    if not geometry:
-        raise RuntimeError("OSRM response route geometry is empty")
-
-    points_lat_lon = [[lat, lon] for lon, lat in geometry]
-    return {
-        "distance_m": float(route["distance"]),
-        "duration_s": float(route["duration"]),
-        "points_lat_lon": points_lat_lon,
-    }
+
+def depot_boundary_inserts(stop_keys: list[str], depot_display_name_key: str) -> tuple[bool, bool]:
+    """Whether the depot must be added before the first / after the last stop."""
+    if not stop_keys or not depot_display_name_key:
+        return False, False
+    return (
+        stop_keys[0].strip() != depot_display_name_key,
+        stop_keys[-1].strip() != depot_display_name_key,
+    )
+
+
+def driver_route_coords(
+    driver_valid: Any, depot_point: dict[str, Any] | None, depot_display_name_key: str
+) -> list[list[float]]:
+    """Stop sequence sent to OSRM for one driver-day (matches the stops built in main)."""
+    coords = [[float(row[COL_LAT]), float(row[COL_LON])] for _, row in driver_valid.iterrows()]
+    if depot_point:
+        stop_keys = [
+            _normalize_display_name(row.get(COL_OSM_DISPLAY_NAME)) for _, row in driver_valid.iterrows()
+        ]
+        insert_start, insert_end = depot_boundary_inserts(stop_keys, depot_display_name_key)
+        depot_coords = [float(depot_point["lat"]), float(depot_point["lon"])]
+        if insert_start:
+            coords.insert(0, depot_coords)
+        if insert_end:
+            coords.append(list(depot_coords))
+    return coords
 
 
 def load_savers_points() -> list[dict[str, Any]]:
@@ -1488,6 +1499,10 @@ def main(argv: list[str] | None = None) -> None:
     global ACTIVE_BINS_CSV
     global ACTIVE_ROUTINE_CSV
     global OSRM_BASE_URL
+    global ROUTE_CACHE_PATH
+    global OSRM_DATASET_ID
+    global ROUTE_BY_LEGS
+    global OSRM_CONCURRENCY
     global ALLOW_STRAIGHT_LINE_FALLBACK
 
     parser = argparse.ArgumentParser(
@@ -1519,6 +1534,32 @@ def main(argv: list[str] | None = None) -> None:
         default=OSRM_BASE_URL,
         help="OSRM base URL (for example: http://localhost:5000)",
     )
+    parser.add_argument(
+        "--route-cache",
+        default=str(ROUTE_CACHE_PATH or ""),
+        help="On-disk OSRM route cache (SQLite) path",
+    )
+    parser.add_argument(
+        "--no-route-cache",
+        action="store_true",
+        help="Always request routes from OSRM",
+    )
+    parser.add_argument(
+        "--osrm-dataset-id",
+        default=OSRM_DATASET_ID,
+        help="OSRM extract ID used in route cache keys; change it after rebuilding the extract",
+    )
+    parser.add_argument(
+        "--full-route-requests",
+        action="store_true",
+        help="Request each driver-day as one OSRM route instead of assembling cached legs",
+    )
+    parser.add_argument(
+        "--osrm-concurrency",
+        type=int,
+        default=OSRM_CONCURRENCY,
+        help="Maximum OSRM route requests in flight",
+    )
     parser.add_argument(
         "--savers-csv",
         default=str(SAVERS_CSV),
@@ -1595,6 +1636,13 @@ def main(argv: list[str] | None = None) -> None:
         END_DATE = args.end_date
     DEFAULT_RANGE_DAYS = max(int(args.default_range_days), 1)
     OSRM_BASE_URL = args.osrm_base_url
+    if args.no_route_cache or not str(args.route_cache).strip():
+        ROUTE_CACHE_PATH = None
+    else:
+        ROUTE_CACHE_PATH = Path(args.route_cache).expanduser()
+    OSRM_DATASET_ID = args.osrm_dataset_id
+    ROUTE_BY_LEGS = not args.full_route_requests
+    OSRM_CONCURRENCY = max(int(args.osrm_concurrency), 1)
     ALLOW_STRAIGHT_LINE_FALLBACK = bool(args.allow_straight_line_fallback)
     if args.no_savers or not str(args.savers_csv).strip():
         SAVERS_CSV = None
@@ -1763,6 +1811,20 @@ def main(argv: list[str] | None = None) -> None:
     )
     print(f"Unique drivers in range: {len(driver_color_map)}")
 
+    depot_display_name_key = (
+        str(depot_point.get("display_name_key", "")).strip() if depot_point else ""
+    )
+
+    # Fetch every driver-day route up front, concurrently; the loop below only assembles.
+    route_coords = []
+    for date in dates:
+        date_df = df_range[df_range["_date_str"] == date]
+        for driver in sorted(date_df[COL_DRIVER].unique()):
+            driver_valid = driver_route_frame(date_df, driver)[1]
+            route_coords.append(driver_route_coords(driver_valid, depot_point, depot_display_name_key))
+    routes = _osrm_client().fetch_routes(route_coords, ROUTE_BY_LEGS, OSRM_CONCURRENCY)
+    print(f"OSRM routes fetched: {len(routes)} (concurrency {OSRM_CONCURRENCY})")
+
     for date in dates:
         date_df = df_range[df_range["_date_str"] == date].copy()
         missing_mask = date_df[COL_LAT].isna() | date_df[COL_LON].isna()
@@ -1868,18 +1930,10 @@ def main(argv: list[str] | None = None) -> None:
             f"Active BIN markers: {len(active_bin_markers)} | "
             f"Active routine markers: {len(active_routine_markers)}"
         )
-        depot_display_name_key = (
-            str(depot_point.get("display_name_key", "")).strip() if depot_point else ""
-        )
 
         for driver in drivers:
             color = driver_color_map.get(driver, COLORS[0])
-            driver_df = date_df[date_df[COL_DRIVER] == driver].copy()
-            driver_valid = (
-                driver_df.dropna(subset=[COL_LAT, COL_LON]).sort_values(
-                    COL_STOP, na_position="last"
-                )
-            )
+            driver_df, driver_valid = driver_route_frame(date_df, driver)
 
             missing_stops = int((driver_df[COL_LAT].isna() | driver_df[COL_LON].isna()).sum())
             if COL_ACTUAL_DURATION in driver_df.columns:
@@ -1973,20 +2027,20 @@ def main(argv: list[str] | None = None) -> None:
 
             depot_inserted_start = False
             depot_inserted_end = False
-            if depot_point and stops:
-                if depot_display_name_key:
-                    if str(stops[0].get("display_name_key", "")).strip() != depot_display_name_key:
-                        stops.insert(0, make_depot_stop_payload(depot_point))
-                        depot_inserted_start = True
-                    if str(stops[-1].get("display_name_key", "")).strip() != depot_display_name_key:
-                        stops.append(make_depot_stop_payload(depot_point))
-                        depot_inserted_end = True
+            if depot_point:
+                depot_inserted_start, depot_inserted_end = depot_boundary_inserts(
+                    [str(stop.get("display_name_key", "")) for stop in stops], depot_display_name_key
+                )
+                if depot_inserted_start:
+                    stops.insert(0, make_depot_stop_payload(depot_point))
+                if depot_inserted_end:
+                    stops.append(make_depot_stop_payload(depot_point))
 
             coords_lat_lon = [[float(stop["lat"]), float(stop["lon"])] for stop in stops]
             osrm_error = ""
             if len(coords_lat_lon) >= 2:
                 try:
-                    osrm_result = fetch_osrm_route(coords_lat_lon)
+                    osrm_result = prefetched_route(routes, coords_lat_lon)
                     route_points = osrm_result["points_lat_lon"]
                     distance_m = float(osrm_result["distance_m"])
                     drive_duration_s = float(osrm_result["duration_s"])
@@ -2114,6 +2168,12 @@ def main(argv: list[str] | None = None) -> None:
     OUTPUT_HTML.parent.mkdir(parents=True, exist_ok=True)
     OUTPUT_HTML.write_text(html_doc, encoding="utf-8")
     print(f"Saved map: {OUTPUT_HTML}")
+    client = _osrm_client()
+    print(client.stats.summary())
+    if ROUTE_BY_LEGS:
+        print(client.leg_summary())
+    if client.route_cache is not None:
+        print(client.route_cache.summary())
 
 
 if __name__ == "__main__":